@@ -1,49 +1,67 @@
+import time
+_import_started = time.perf_counter()
+
 import os
 import logging
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
-from minio import Minio
 
-db = SQLAlchemy()
-migrate = Migrate()
+from app import database, startup
+
+db = SQLAlchemy(session_options={"class_": database.RoutingSession})
 jwt = JWTManager()
 
-def create_app():
+_import_ms = (time.perf_counter() - _import_started) * 1000
+
+def create_app(config=None):
+    """`config` (a dict) overrides app.config.Config, e.g. for benchmarks."""
+    global _import_ms
+    # the import cost belongs to the first app of the process only
+    timer, _import_ms = startup.StartupTimer(_import_ms), None
+
     app = Flask(__name__)
     app.logger.setLevel(logging.INFO)
     logging.getLogger('werkzeug').setLevel(logging.INFO)
     app.config.from_object("app.config.Config")
+    if config:
+        app.config.update(config)
+    app.extensions["startup"] = timer
+    app.logger.debug(
+        f"MinIO {app.config['MINIO_ENDPOINT']} bucket={app.config['MINIO_BUCKET']} "
+        f"secure={app.config['MINIO_SECURE']} user={app.config['MINIO_ROOT_USER']} "
+        f"password={'******' if app.config['MINIO_ROOT_PASSWORD'] else 'MISSING'}"
+    )
+    timer.mark("config")
 
-    app.logger.info(f"MINIO_ENDPOINT={app.config['MINIO_ENDPOINT']}")
-    app.logger.info(f"MINIO_ROOT_USER={app.config['MINIO_ROOT_USER']}")
-    app.logger.info(f"MINIO_ROOT_PASSWORD={'******' if app.config['MINIO_ROOT_PASSWORD'] else 'MISSING'}")
-    app.logger.info(f"MINIO_BUCKET={app.config['MINIO_BUCKET']}")
-    app.logger.info(f"MINIO_SECURE={app.config['MINIO_SECURE']}")
-
+    database.configure(app)
     db.init_app(app)
-    migrate.init_app(app, db)
+    with app.app_context():
+        engines = list(db.engines.values())
+    database.install_sqlite_pragmas(app, engines)
+    database.dispose_after_fork(engines)
+    # Flask-Migrate pulls in alembic; only the `flask` command (flask db ...) needs it
+    if os.environ.get("FLASK_RUN_FROM_CLI"):
+        from flask_migrate import Migrate
+        Migrate(app, db)
     jwt.init_app(app)
     CORS(app, resources={r"/api/*": {"origins": ["http://localhost:8888"]}})
+    timer.mark("database")
 
     # --- MinIO setup ---
-    try:
-        minio_client = Minio(
-            endpoint=app.config["MINIO_ENDPOINT"],
-            access_key=app.config["MINIO_ROOT_USER"],
-            secret_key=app.config["MINIO_ROOT_PASSWORD"],
-            secure=app.config["MINIO_SECURE"]
-        )
-        # only try bucket ops if credentials worked
-        bucket = app.config["MINIO_BUCKET"]
-        if not minio_client.bucket_exists(bucket):
-            minio_client.make_bucket(bucket)
-        app.logger.info(f"MinIO bucket '{bucket}' is ready.")
-        app.minio_client = minio_client
-    except Exception as e:
-        app.logger.error(f"MinIO setup failed: {e}")
+    # the client is created on first use and the bucket is checked in the
+    # background, so worker boot never waits on the object store
+    from app.storage import LazyMinio
+    app.minio_client = LazyMinio(app)
+
+    from app import cache, metrics, querywatch, ratelimit, responses
+    cache.init_app(app)
+    metrics.init_app(app)
+    querywatch.init_app(app)
+    ratelimit.init_app(app)
+    responses.init_app(app)     # after metrics, so response sizes are on the wire
+    timer.mark("extensions")
 
     # register blueprints
     from app.auth.routes      import auth_bp
@@ -52,6 +70,14 @@ def create_app():
     from app.forms.routes     import forms_bp
     from app.uploads.routes   import uploads_bp
     from app.workflows.routes import workflows_bp
+    from app.health.routes    import health_bp
+    from app.authz.routes     import authz_bp
+    from app.catalog.routes   import catalog_bp
+    from app.schedules.routes import schedules_bp
+    from app.events.routes    import events_bp
+    from app.reports.routes   import reports_bp
+    from app.jobs.routes      import jobs_bp
+    timer.mark("imports")
 
     app.register_blueprint(auth_bp,      url_prefix="/api/auth")
     app.register_blueprint(roles_bp,     url_prefix="/api/roles")
@@ -59,5 +85,16 @@ def create_app():
     app.register_blueprint(forms_bp,     url_prefix="/api/forms")
     app.register_blueprint(uploads_bp,   url_prefix="/api/uploads")
     app.register_blueprint(workflows_bp, url_prefix="/api/workflows")
+    app.register_blueprint(health_bp,    url_prefix="/api/health")
+    app.register_blueprint(authz_bp,     url_prefix="/api/authz")
+    app.register_blueprint(catalog_bp,   url_prefix="/api/catalog")
+    app.register_blueprint(schedules_bp, url_prefix="/api/schedules")
+    app.register_blueprint(events_bp,    url_prefix="/api/events")
+    app.register_blueprint(reports_bp,   url_prefix="/api/reports")
+    app.register_blueprint(jobs_bp,      url_prefix="/api/jobs")
+    app.cli.add_command(startup.startup_command)
+    timer.mark("blueprints")
 
-    return app
\ No newline at end of file
+    if app.config["STARTUP_TIMING"]:
+        app.logger.info(timer.summary())
+    return app
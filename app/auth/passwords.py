@@ -0,0 +1,195 @@
+"""
+Password hashing off the request thread.
+
+Hashes are computed with werkzeug's generate_password_hash /
+check_password_hash, but inside a small per-process pool of worker
+processes (PASSWORD_HASH_WORKERS, 0 = inline). At most
+PASSWORD_HASH_MAX_PENDING hashes per app process may be queued; beyond that,
+or when a hash is not done within PASSWORD_HASH_TIMEOUT, callers get
+`HashingBusy` instead of piling up behind the pool (answered with 503 and
+Retry-After by the auth blueprint's app-wide error handler). Workers
+are started with "spawn" (never fork a threaded server), so standalone
+scripts that hash passwords need the usual `if __name__ == "__main__":`
+guard.
+
+PASSWORD_HASH_METHOD selects the algorithm and cost (werkzeug syntax, e.g.
+"scrypt", werkzeug's default, or "pbkdf2:sha256:600000"). Stored hashes made
+with other parameters still verify, and `needs_rehash` tells login to
+upgrade them. A pool whose worker died (BrokenProcessPool) is dropped and
+rebuilt, so one crash costs a retry rather than every later login.
+"""
+import os
+import threading
+import time
+from concurrent.futures import TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+_pending = None
+_canonical = {}
+
+
+class HashingBusy(Exception):
+    """Too many hashes are already queued in this process."""
+
+
+def _process_pool(workers):
+    # multiprocessing is only imported once a pool is needed, not at boot
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _get_pool():
+    global _pool, _pool_pid, _pending
+    cfg = current_app.config
+    workers = cfg["PASSWORD_HASH_WORKERS"]
+    if not workers:
+        return None
+    # pools do not survive fork: build one per process, on first use
+    if _pool is None or _pool_pid != os.getpid():
+        with _lock:
+            if _pool_pid != os.getpid():
+                _pool = None
+                _pending = threading.BoundedSemaphore(cfg["PASSWORD_HASH_MAX_PENDING"])
+            if _pool is None:
+                _pool = _process_pool(workers)
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def _discard(pool):
+    """Forget `pool` once a worker died in it; the next _get_pool builds a new one."""
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _run(fn, *args):
+    pool = _get_pool()
+    if pool is None:
+        return fn(*args)
+    timeout = current_app.config["PASSWORD_HASH_TIMEOUT"]
+    pending = _pending
+    if not pending.acquire(timeout=timeout):
+        raise HashingBusy()
+    try:
+        for attempt in range(2):
+            try:
+                future = pool.submit(fn, *args)
+                return future.result(timeout=timeout)
+            except FuturesTimeout:
+                future.cancel()     # still queued: do not spend a worker on it
+                raise HashingBusy()
+            except BrokenProcessPool:
+                _discard(pool)
+                if attempt:
+                    raise
+                pool = _get_pool()
+    finally:
+        pending.release()
+
+
+def hash_password(password):
+    cfg = current_app.config
+    return _run(
+        generate_password_hash, password,
+        cfg["PASSWORD_HASH_METHOD"], cfg["PASSWORD_SALT_LENGTH"]
+    )
+
+
+def verify_password(pwhash, password):
+    return _run(check_password_hash, pwhash, password)
+
+
+@contextmanager
+def batch_pool(workers):
+    """
+    A dedicated pool of `workers` processes for `hash_many`, shut down on
+    exit. Open it once per import: each pool pays interpreter startup.
+    Yields None (use the shared pool) when `workers` is 0/None.
+    """
+    if not workers:
+        yield None
+        return
+    with _process_pool(workers) as pool:
+        yield pool
+
+
+def hash_many(passwords, pool=None, chunksize=16):
+    """Hash a batch of passwords (bulk imports), in `pool` or the shared one."""
+    cfg = current_app.config
+    method, salt_length = cfg["PASSWORD_HASH_METHOD"], cfg["PASSWORD_SALT_LENGTH"]
+    passwords = list(passwords)
+    if not passwords:
+        return []
+    n = len(passwords)
+    shared = pool is None
+    pool = pool or _get_pool()
+    if pool is None:
+        return [generate_password_hash(pw, method, salt_length) for pw in passwords]
+    try:
+        return list(pool.map(
+            generate_password_hash, passwords, [method] * n, [salt_length] * n,
+            chunksize=chunksize
+        ))
+    except BrokenProcessPool:
+        if shared:
+            _discard(pool)
+        raise
+
+
+def canonical_method(method):
+    """werkzeug expands e.g. "pbkdf2" to "pbkdf2:sha256:600000" in the hash."""
+    if method not in _canonical:
+        _canonical[method] = generate_password_hash("", method, 1).split("$", 1)[0]
+    return _canonical[method]
+
+
+def needs_rehash(pwhash):
+    method = current_app.config["PASSWORD_HASH_METHOD"]
+    return pwhash.split("$", 1)[0] != canonical_method(method)
+
+
+def benchmark(methods, seconds=2.0):
+    """
+    Measure check_password_hash for each method on one core and through
+    the pool. Returns a list of result dicts (logins/sec).
+    """
+    results = []
+    workers = current_app.config["PASSWORD_HASH_WORKERS"] or 1
+    for method in methods:
+        pwhash = generate_password_hash("correct horse", method)
+
+        n, started = 0, time.perf_counter()
+        while time.perf_counter() - started < seconds:
+            check_password_hash(pwhash, "correct horse")
+            n += 1
+        single = n / (time.perf_counter() - started)
+
+        pooled = None
+        pool = _get_pool()
+        if pool is not None:
+            batch = max(workers * 4, int(single * workers * seconds))
+            started = time.perf_counter()
+            list(pool.map(check_password_hash, [pwhash] * batch, ["correct horse"] * batch))
+            pooled = batch / (time.perf_counter() - started)
+
+        results.append({
+            "method": canonical_method(method),
+            "hash_length": len(pwhash),
+            "ms_per_login": round(1000 / single, 2),
+            "logins_per_sec_per_core": round(single, 1),
+            "pool_workers": workers if pooled is not None else 0,
+            "pool_logins_per_sec": round(pooled, 1) if pooled is not None else None
+        })
+    return results
@@ -0,0 +1,164 @@
+"""
+Token revocation list and per-user role cache.
+
+Every revocation is a `TokenRevocation` row; its id is a monotonically
+increasing generation. Tokens carry the `gen` their user had when they were
+issued, so "revoke everything this user holds" is one insert and the check
+is a dict lookup:
+
+* scope 'access' - role changes: access tokens older than the row stop
+                   working, refresh tokens stay valid and mint new claims;
+* scope 'all'    - deletion / password change: every token goes;
+* scope 'jti'    - a single token (logout).
+
+Each worker starts from every user's latest generation in the database and
+then pulls new rows at most every TOKEN_REVOCATION_SYNC_SECONDS; the worker
+doing the write syncs at once. Login and refresh stamp whatever generation
+the worker has, without forcing a sync: a token minted from a view that
+missed a revocation carries a generation below the new one, so it is
+rejected everywhere once the workers catch up, within the same interval
+that bounds every other revocation check. The role cache is keyed by the
+same generation, so `refresh` only reads roles from the DB when they may
+have changed.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import func
+
+from app import db, jwt
+from app.database import primary_reads
+from app.models import TokenRevocation, Role, roles_users
+
+
+class RevocationList:
+    def __init__(self):
+        self.jtis = set()
+        self.access_gen = {}   # uid -> generation invalidating access tokens
+        self.all_gen = {}      # uid -> generation invalidating every token
+        self.last_id = 0
+        self.last_sync = 0.0
+        self._lock = threading.Lock()
+
+    def sync(self, force=False):
+        interval = current_app.config["TOKEN_REVOCATION_SYNC_SECONDS"]
+        if not force and time.monotonic() - self.last_sync < interval:
+            return
+        # revocations must not wait for replication
+        with self._lock, primary_reads():
+            if not self.last_id:
+                self._load()
+            q = TokenRevocation.query.filter(TokenRevocation.id > self.last_id)
+            for row in q.order_by(TokenRevocation.id):
+                if row.scope == "jti":
+                    self.jtis.add(row.jti)
+                elif row.scope == "all":
+                    self.all_gen[row.user_id] = row.id
+                else:
+                    self.access_gen[row.user_id] = row.id
+                self.last_id = row.id
+            self.last_sync = time.monotonic()
+
+    def _load(self):
+        """
+        First sync: every user's current generations, however old, so all
+        workers stamp and check the same `gen`. Only the single-token rows
+        are limited to those whose tokens may still be unexpired.
+        """
+        top = db.session.query(func.max(TokenRevocation.id)).scalar()
+        if top is None:
+            return
+        generations = (
+            db.session.query(TokenRevocation.scope, TokenRevocation.user_id, func.max(TokenRevocation.id))
+                      .filter(TokenRevocation.scope != "jti", TokenRevocation.id <= top)
+                      .group_by(TokenRevocation.scope, TokenRevocation.user_id)
+        )
+        for scope, uid, gen in generations:
+            (self.all_gen if scope == "all" else self.access_gen)[uid] = gen
+        horizon = datetime.utcnow() - current_app.config["JWT_REFRESH_TOKEN_EXPIRES"]
+        self.jtis.update(
+            jti for (jti,) in db.session.query(TokenRevocation.jti)
+                                        .filter(TokenRevocation.scope == "jti",
+                                                TokenRevocation.id <= top,
+                                                TokenRevocation.created_at >= horizon)
+        )
+        self.last_id = top
+
+    def generation(self, uid):
+        """Generation a token issued for `uid` right now must carry."""
+        return max(self.access_gen.get(uid, 0), self.all_gen.get(uid, 0))
+
+    def is_revoked(self, payload):
+        self.sync()
+        if payload.get("jti") in self.jtis:
+            return True
+        uid = payload.get("sub")
+        gen = payload.get("gen", 0)
+        if payload.get("type") == "refresh":
+            return gen < self.all_gen.get(uid, 0)
+        return gen < self.generation(uid)
+
+
+class RoleCache:
+    """LRU of uid -> (generation, role names)."""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, uid):
+        revocations.sync()
+        gen = revocations.generation(uid)
+        with self._lock:
+            entry = self._data.get(uid)
+            if entry and entry[0] == gen:
+                self._data.move_to_end(uid)
+                return entry[1]
+        with primary_reads():   # cached per generation, so never from a lagging replica
+            roles = [
+                name for (name,) in db.session.query(Role.name)
+                                              .join(roles_users, roles_users.c.role_id == Role.id)
+                                              .filter(roles_users.c.user_id == uid)
+            ]
+        with self._lock:
+            self._data[uid] = (gen, roles)
+            self._data.move_to_end(uid)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return roles
+
+
+revocations = RevocationList()
+role_cache = RoleCache()
+
+
+def revoke_users(uids, scope="access"):
+    """
+    Bump the generation of every user in `uids` (one bulk insert). Call
+    `db.session.commit()` and then `revocations.sync(force=True)`.
+    """
+    if not uids:
+        return
+    now = datetime.utcnow()
+    db.session.execute(
+        TokenRevocation.__table__.insert(),
+        [{"user_id": uid, "scope": scope, "created_at": now} for uid in uids]
+    )
+
+
+def revoke_token(jti, uid):
+    db.session.add(TokenRevocation(user_id=uid, jti=jti, scope="jti"))
+
+
+@jwt.additional_claims_loader
+def add_generation_claim(identity):
+    return {"gen": revocations.generation(identity)}
+
+
+@jwt.token_in_blocklist_loader
+def check_if_token_revoked(jwt_header, jwt_payload):
+    return revocations.is_revoked(jwt_payload)
@@ -1,11 +1,32 @@
+import json
+import click
 from flask import Blueprint, request, jsonify
 from app import db
+from app.auth.passwords import HashingBusy, benchmark
 from app.models import User, Role
-from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, create_refresh_token, get_jwt_identity, get_jwt
+from app.authz.policy import policy
+from app.ratelimit import rate_limit
+from app.auth.revocation import revocations, role_cache, revoke_token
 
 auth_bp = Blueprint("auth", __name__)
 
+def _attempted_username():
+    # login has no JWT yet: limit guesses per account as well as per IP. The
+    # account bucket is per IP too, or anyone could lock a victim out by
+    # spending their tokens.
+    data = request.get_json(silent=True) or {}
+    name = data.get("username")
+    return f"name:{request.remote_addr}:{name}" if isinstance(name, str) else None
+
+@auth_bp.app_errorhandler(HashingBusy)
+def hashing_busy(e):
+    # register, login, create_user and update_user all hash passwords
+    db.session.rollback()
+    return jsonify(msg="Too many password checks in progress, retry shortly"), 503, {"Retry-After": "1"}
+
 @auth_bp.route("/register", methods=["POST"])
+@rate_limit(5)
 def register():
     data = request.get_json()
     if not data or "username" not in data or "password" not in data:
@@ -42,12 +63,20 @@ def register():
     return jsonify(msg=role_assigned_msg), 201
 
 @auth_bp.route("/login", methods=["POST"])
+@rate_limit(5, key=_attempted_username)
 def login():
     data = request.get_json()
     user = User.query.filter_by(username=data["username"]).first()
     if not user or not user.check_password(data["password"]):
         return jsonify(msg="Bad credentials"), 401
+    # transparently upgrade hashes made with old parameters
+    if user.password_needs_rehash():
+        user.set_password(data["password"])
+        db.session.commit()
 
+    # a generation at most TOKEN_REVOCATION_SYNC_SECONDS old is safe to stamp:
+    # once this worker catches up, a token carrying it is rejected, not trusted
+    revocations.sync()
     additional = {
         "roles": [r.name for r in user.roles],
         "username": user.username
@@ -57,10 +86,31 @@ def login():
     return jsonify(access_token=access, refresh_token=refresh), 200
 
 @auth_bp.route("/refresh", methods=["POST"])
-@jwt_required(refresh=True)
+@policy(refresh=True)
 def refresh():
     uid = get_jwt_identity()
-    user = User.query.get(uid)
-    additional = {"roles": [r.name for r in user.roles]}
+    # checking the refresh token already ran the interval sync; roles are
+    # cached per generation, so no DB round trip unless they changed
+    # deleted users have had their refresh tokens revoked, so no User lookup
+    additional = {"roles": role_cache.get(uid)}
     access = create_access_token(identity=uid, additional_claims=additional)
     return jsonify(access_token=access), 200
+
+@auth_bp.route("/logout", methods=["POST"])
+@policy(verify_type=False)
+def logout():
+    """Revoke the presented token (send the access and the refresh token)."""
+    claims = get_jwt()
+    revoke_token(claims["jti"], get_jwt_identity())
+    db.session.commit()
+    revocations.sync(force=True)
+    return jsonify(msg="Token revoked"), 200
+
+@auth_bp.cli.command("hash-bench")
+@click.option("--method", "methods", multiple=True,
+              default=["pbkdf2:sha256:600000", "pbkdf2:sha256:260000", "scrypt:32768:8:1"],
+              show_default=True, help="werkzeug hash method, repeatable.")
+@click.option("--seconds", default=2.0, show_default=True, help="Time spent per method.")
+def hash_bench_command(methods, seconds):
+    """Report logins/second/core for each password hash setting."""
+    click.echo(json.dumps(benchmark(methods, seconds), indent=2))
@@ -0,0 +1,20 @@
+from flask import Blueprint, jsonify, current_app
+from app.authz.policy import admin_required
+
+authz_bp = Blueprint("authz", __name__)
+
+# GET /api/authz/policies - effective policy of every route
+@authz_bp.route("/policies", methods=["GET"])
+@admin_required
+def list_policies():
+    routes = []
+    for rule in sorted(current_app.url_map.iter_rules(), key=lambda r: r.rule):
+        view = current_app.view_functions.get(rule.endpoint)
+        compiled = getattr(view, "__policy__", None)
+        routes.append({
+            "rule":     rule.rule,
+            "endpoint": rule.endpoint,
+            "methods":  sorted(rule.methods - {"HEAD", "OPTIONS"}),
+            "policy":   compiled.describe() if compiled else {"public": True}
+        })
+    return jsonify(routes=routes), 200
@@ -0,0 +1,445 @@
+"""
+Two-tier cache with tag-based invalidation.
+
+Entries carry tags (e.g. "portfolio:12", "form:3"). Models register a
+tagger that maps a changed instance to tags; on commit every tag touched by
+the flushed instances is invalidated, so cached documents are dropped as
+soon as one of their source rows changes:
+
+    register_tagger(Award, lambda award: {f"portfolio:{award.recipient_id}"})
+
+Bulk statements (Query.delete/update, Core inserts) do not go through the
+unit of work and must call `invalidate_after_commit` (or, outside a
+transaction, `cache.invalidate_tags`) themselves.
+
+`cache` is a per-process LRU (LocalCache) in front of an optional SQLite
+file shared by every worker on the host (SharedCache, CACHE_SHARED_PATH).
+Invalidating a tag deletes the shared entries and appends the tag to an
+invalidation log; each process replays the log into its local tier before
+reading (a `PRAGMA data_version` check when nothing changed), so a write
+handled by one worker is seen by all of them. Values in the shared tier
+are pickled.
+
+Fill from the database with a token taken before the read, so a document
+built from rows that changed meanwhile is not stored:
+
+    token = cache.token()
+    doc = build()
+    cache.set(key, doc, tags={...}, since=token)
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+MISSING = object()
+INVALIDATION_RETENTION = 3600   # seconds of invalidation log kept in the shared file
+PRUNE_EVERY = 256               # shared-tier writes between expiry/size sweeps
+
+
+class LocalCache:
+    def __init__(self, maxsize=4096, ttl=600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()      # key -> (expires, value, tags)
+        self._by_tag = {}               # tag -> set(keys)
+        self._lock = threading.Lock()
+        self._seq = 0                   # bumped by every invalidation
+        self._invalidated = {}          # tag -> seq of its last invalidation
+        self._floor = 0                 # tokens older than this are refused
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def token(self):
+        return self._seq
+
+    def set(self, key, value, tags=(), ttl=None, since=None):
+        expires = time.monotonic() + (ttl or self.ttl)
+        with self._lock:
+            if since is not None and self._stale(tags, since):
+                return False
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (expires, value, frozenset(tags))
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+        return True
+
+    def _stale(self, tags, since):
+        if since < self._floor:
+            return True
+        return any(self._invalidated.get(tag, 0) > since for tag in tags)
+
+    def invalidate_tags(self, *tags):
+        with self._lock:
+            self._seq += 1
+            if len(self._invalidated) > self.maxsize:
+                self._invalidated.clear()
+                self._floor = self._seq
+            for tag in tags:
+                self._invalidated[tag] = self._seq
+                for key in self._by_tag.pop(tag, ()):
+                    self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._by_tag.clear()
+            self._seq += 1
+            self._invalidated.clear()
+            self._floor = self._seq
+
+    def _drop(self, key):
+        _, _, tags = self._data.pop(key)
+        for tag in tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+class SharedCache:
+    """Entries in a SQLite file, shared by every process that opens it."""
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS cache_entry ("
+        " key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS cache_tag ("
+        " tag TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (tag, key)) WITHOUT ROWID",
+        "CREATE INDEX IF NOT EXISTS ix_cache_tag_key ON cache_tag (key)",
+        "CREATE TABLE IF NOT EXISTS cache_invalidation ("
+        " seq INTEGER PRIMARY KEY AUTOINCREMENT, tag TEXT NOT NULL, at REAL NOT NULL)",
+    )
+
+    def __init__(self, path, maxsize=100000, ttl=600):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = self.misses = self.evictions = 0
+        conn = self._conn()
+        with conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def _conn(self):
+        # one connection per thread, and never one inherited across fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")    # a lost cache write is only a miss
+            self._local.conn, self._local.pid, self._local.version = conn, os.getpid(), None
+        return conn
+
+    def get(self, key):
+        """(value, tags, seconds left) or None."""
+        conn = self._conn()
+        row = conn.execute("SELECT value, expires FROM cache_entry WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] < time.time():
+            with self._lock:
+                self.misses += 1
+            return None
+        tags = [t for (t,) in conn.execute("SELECT tag FROM cache_tag WHERE key = ?", (key,))]
+        with self._lock:
+            self.hits += 1
+        return pickle.loads(row[0]), tags, row[1] - time.time()
+
+    def token(self):
+        row = self._conn().execute("SELECT max(seq) FROM cache_invalidation").fetchone()
+        return row[0] or 0
+
+    def set(self, key, value, tags=(), ttl=None, since=None):
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if since is not None and tags and self._invalidated_since(conn, tags, since):
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entry (key, value, expires) VALUES (?, ?, ?)",
+                (key, blob, time.time() + (ttl or self.ttl))
+            )
+            conn.execute("DELETE FROM cache_tag WHERE key = ?", (key,))
+            conn.executemany("INSERT INTO cache_tag (tag, key) VALUES (?, ?)", [(t, key) for t in set(tags)])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+        return True
+
+    def _invalidated_since(self, conn, tags, since):
+        tags = list(tags)
+        placeholders = ",".join("?" * len(tags))
+        return conn.execute(
+            f"SELECT 1 FROM cache_invalidation WHERE seq > ? AND tag IN ({placeholders}) LIMIT 1",
+            (since, *tags)
+        ).fetchone() is not None
+
+    def invalidate_tags(self, *tags):
+        if not tags:
+            return
+        placeholders = ",".join("?" * len(tags))
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                f"DELETE FROM cache_entry WHERE key IN "
+                f"(SELECT key FROM cache_tag WHERE tag IN ({placeholders}))", tags
+            )
+            conn.execute(f"DELETE FROM cache_tag WHERE key NOT IN (SELECT key FROM cache_entry) "
+                         f"AND tag IN ({placeholders})", tags)
+            now = time.time()
+            conn.executemany("INSERT INTO cache_invalidation (tag, at) VALUES (?, ?)", [(t, now) for t in tags])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def changes(self, after):
+        """
+        Tags invalidated after seq `after`: (tags, last seq, complete).
+        `complete` is False when part of the log was already pruned.
+        """
+        conn = self._conn()
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._local.version:
+            return [], after, True      # nobody else wrote since our last look
+        rows = conn.execute(
+            "SELECT seq, tag FROM cache_invalidation WHERE seq > ? ORDER BY seq", (after,)
+        ).fetchall()
+        complete = True
+        if rows and rows[0][0] != after + 1:
+            first = conn.execute("SELECT min(seq) FROM cache_invalidation").fetchone()[0]
+            complete = first is None or first <= after + 1
+        self._local.version = version
+        return [tag for _, tag in rows], rows[-1][0] if rows else after, complete
+
+    def prune(self):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM cache_entry WHERE expires < ?", (now,))
+            (size,) = conn.execute("SELECT count(*) FROM cache_entry").fetchone()
+            evicted = max(0, size - self.maxsize)
+            if evicted:
+                conn.execute(
+                    "DELETE FROM cache_entry WHERE key IN "
+                    "(SELECT key FROM cache_entry ORDER BY expires LIMIT ?)", (evicted,)
+                )
+            conn.execute("DELETE FROM cache_tag WHERE key NOT IN (SELECT key FROM cache_entry)")
+            # keep the newest row so the seq never goes back to 0
+            conn.execute(
+                "DELETE FROM cache_invalidation WHERE at < ? "
+                "AND seq < (SELECT max(seq) FROM cache_invalidation)",
+                (now - INVALIDATION_RETENTION,)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        with self._lock:
+            self.evictions += evicted
+
+    def clear(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM cache_entry")
+        conn.execute("DELETE FROM cache_tag")
+        # a wildcard row: every reader drops its whole local tier
+        conn.execute("INSERT INTO cache_invalidation (tag, at) VALUES ('*', ?)", (time.time(),))
+        conn.execute("COMMIT")
+
+    def stats(self):
+        (size,) = self._conn().execute("SELECT count(*) FROM cache_entry").fetchone()
+        return {
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+class TieredCache:
+    """LocalCache in front of an optional SharedCache; see the module docstring."""
+
+    def __init__(self):
+        self.local = LocalCache()
+        self.shared = None
+        self.sync_seconds = 0.0
+        self.invalidations = 0          # tags applied from other workers
+        self._seen = 0
+        self._next_sync = 0.0
+        self._sync_lock = threading.Lock()
+
+    def configure(self, maxsize=4096, ttl=600, shared_path=None, shared_maxsize=100000, sync_seconds=0.0):
+        self.local = LocalCache(maxsize, ttl)
+        self.shared = SharedCache(shared_path, shared_maxsize, ttl) if shared_path else None
+        self.sync_seconds = sync_seconds
+        self._seen = self.shared.token() if self.shared else 0
+
+    def _sync(self):
+        if self.shared is None:
+            return
+        now = time.monotonic()
+        if now < self._next_sync:
+            return
+        self._next_sync = now + self.sync_seconds
+        with self._sync_lock:
+            tags, seen, complete = self.shared.changes(self._seen)
+            if not complete or "*" in tags:
+                self.local.clear()
+            elif tags:
+                self.local.invalidate_tags(*tags)
+            self.invalidations += len(tags)
+            self._seen = seen
+
+    def get(self, key, default=MISSING):
+        self._sync()
+        value = self.local.get(key)
+        if value is not MISSING:
+            return value
+        if self.shared is not None:
+            found = self.shared.get(key)
+            if found is not None:
+                value, tags, left = found
+                self.local.set(key, value, tags, ttl=min(left, self.local.ttl))
+                return value
+        return default
+
+    def token(self):
+        return self.shared.token() if self.shared else self.local.token()
+
+    def set(self, key, value, tags=(), ttl=None, since=None):
+        if self.shared is not None:
+            if not self.shared.set(key, value, tags, ttl, since):
+                return False
+            return self.local.set(key, value, tags, ttl)
+        return self.local.set(key, value, tags, ttl, since)
+
+    def invalidate_tags(self, *tags):
+        if self.shared is not None:
+            self.shared.invalidate_tags(*tags)
+        self.local.invalidate_tags(*tags)
+
+    def clear(self):
+        if self.shared is not None:
+            self.shared.clear()
+        self.local.clear()
+
+    def stats(self):
+        return {
+            "local": self.local.stats(),
+            "shared": self.shared.stats() if self.shared else None,
+            "invalidations_applied": self.invalidations
+        }
+
+
+cache = TieredCache()
+
+_taggers = {}
+
+
+def register_tagger(model, fn):
+    _taggers.setdefault(model, []).append(fn)
+
+
+def previous_values(obj, attr):
+    """Current and pre-change values of `attr` (e.g. an owner that moved)."""
+    hist = inspect(obj).attrs[attr].history
+    return {v for v in (*hist.unchanged, *hist.added, *hist.deleted) if v is not None}
+
+
+def invalidate_after_commit(session, *tags):
+    """Invalidate `tags` when `session` commits (for bulk statements)."""
+    session.info.setdefault("cache_tags", set()).update(tags)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_tags(session, flush_context):
+    pending = session.info.setdefault("cache_tags", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        for tagger in _taggers.get(type(obj), ()):
+            pending.update(tagger(obj))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate(session):
+    tags = session.info.pop("cache_tags", None)
+    if tags:
+        cache.invalidate_tags(*tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop("cache_tags", None)
+
+
+cache_cli = AppGroup("cache", help="Inspect or clear the shared cache.")
+
+
+@cache_cli.command("stats")
+def stats_command():
+    import json
+    click.echo(json.dumps(cache.stats(), indent=2))
+
+
+@cache_cli.command("clear")
+def clear_command():
+    cache.clear()
+    click.echo("Cache cleared.")
+
+
+def init_app(app):
+    cfg = app.config
+    path = cfg["CACHE_SHARED_PATH"]
+    if path is None:
+        os.makedirs(app.instance_path, exist_ok=True)
+        path = os.path.join(app.instance_path, "cache.sqlite3")
+    cache.configure(
+        maxsize=cfg["CACHE_LOCAL_SIZE"],
+        ttl=cfg["CACHE_TTL"],
+        shared_path=path or None,
+        shared_maxsize=cfg["CACHE_SHARED_SIZE"],
+        sync_seconds=cfg["CACHE_SYNC_SECONDS"]
+    )
+    app.cli.add_command(cache_cli)
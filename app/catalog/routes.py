@@ -0,0 +1,374 @@
+from datetime import date
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.querywatch import query_budget
+from app.authz.policy import policy, is_admin
+from app.cache import cache, register_tagger
+from app.models import ResearchPaper, Patent, StaffProfile, MediaFile
+
+catalog_bp = Blueprint("catalog", __name__)
+
+FACET_TTL = 300
+
+def _year(col):
+    if db.engine.dialect.name == "sqlite":
+        return db.cast(db.func.strftime("%Y", col), db.Integer)
+    return db.cast(db.extract("year", col), db.Integer)
+
+def _departments():
+    # one department per owner, so facet counts never double count
+    return (
+        db.select(StaffProfile.user_id, db.func.min(StaffProfile.department).label("department"))
+          .group_by(StaffProfile.user_id)
+          .subquery()
+    )
+
+def _normalize_doi(doi):
+    """Lower-case DOI (they are case-insensitive), None when blank."""
+    if doi is None:
+        return None
+    if not isinstance(doi, str):
+        raise ValueError("doi must be a string")
+    return doi.strip().lower() or None
+
+def _patent_number(value):
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError("patent_number must be a non-empty string")
+    return value.strip()
+
+def _parse_date(value, field):
+    """ISO date or None; raises ValueError naming `field`."""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be an ISO date (YYYY-MM-DD)") from None
+
+def _integrity_error(model, column, value, exclude_id, duplicate_msg):
+    """
+    Answer a failed commit: 409 when `value` is taken by another row,
+    otherwise a bad reference (owner_id / file_id), 400.
+    """
+    db.session.rollback()
+    if value is not None:
+        q = model.query.filter(column == value)
+        if exclude_id is not None:
+            q = q.filter(model.id != exclude_id)
+        if db.session.query(q.exists()).scalar():
+            return jsonify(msg=duplicate_msg), 409
+    return jsonify(msg="owner_id or file_id does not exist"), 400
+
+def _file_denied(file_id):
+    """
+    Response refusing `file_id`, or None. Uploads are private to their
+    uploader (see users.portfolio), so only they or an admin may attach
+    one to a catalog entry, where its URL becomes public.
+    """
+    if file_id is None:
+        return None
+    if isinstance(file_id, bool) or not isinstance(file_id, int):
+        return jsonify(msg="file_id must be an integer"), 400
+    uploaded_by = db.session.query(MediaFile.uploaded_by).filter(MediaFile.id == file_id).first()
+    if uploaded_by is None:
+        return jsonify(msg="file_id does not exist"), 400
+    if uploaded_by[0] != get_jwt_identity() and not is_admin():
+        return jsonify(msg="Forbidden"), 403
+    return None
+
+def _page_args():
+    cursor = request.args.get("cursor", type=int)
+    limit = min(max(request.args.get("limit", 50, type=int), 1), 200)
+    return cursor, limit
+
+def _page(query, model, cursor, limit, serialize):
+    # keyset pagination, newest first
+    if cursor:
+        query = query.filter(model.id < cursor)
+    rows = query.order_by(model.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return jsonify(items=[serialize(r) for r in rows],
+                   next_cursor=rows[-1].id if has_more else None), 200
+
+def _filters(query, model, date_col):
+    year = request.args.get("year", type=int)
+    owner = request.args.get("owner", type=int)
+    department = request.args.get("department")
+    if year:
+        query = query.filter(date_col >= date(year, 1, 1), date_col < date(year + 1, 1, 1))
+    if owner:
+        query = query.filter(model.owner_id == owner)
+    if department:
+        query = query.filter(model.owner_id.in_(
+            db.select(StaffProfile.user_id).where(StaffProfile.department == department)
+        ))
+    return query
+
+def _facets(model, date_col, extra=()):
+    """Counts per year, per extra column and per owner department in one GROUP BY."""
+    dept = _departments()
+    year = _year(date_col).label("year")
+    cols = [year, *extra, dept.c.department]
+    query = (
+        db.session.query(*cols, db.func.count(model.id))
+                  .select_from(model)
+                  .outerjoin(dept, dept.c.user_id == model.owner_id)
+    )
+    query = _filters(query, model, date_col).group_by(*cols)
+    names = ["year", *(c.key for c in extra), "department"]
+    facets = {name: {} for name in names}
+    for row in query:
+        *keys, count = row
+        for name, key in zip(names, keys):
+            key = "unknown" if key is None else str(key)
+            facets[name][key] = facets[name].get(key, 0) + count
+    return facets
+
+def _can_edit(item):
+    return item.owner_id == get_jwt_identity() or is_admin()
+
+# --- papers ---
+
+def _paper_json(p):
+    return {
+        "id": p.id,
+        "title": p.title,
+        "authors": p.authors,
+        "abstract": p.abstract,
+        "publication_date": p.publication_date.isoformat() if p.publication_date else None,
+        "journal": p.journal,
+        "doi": p.doi,
+        "owner_id": p.owner_id,
+        "file_id": p.file_id
+    }
+
+# GET /api/catalog/papers?year=2024&journal=...&owner=3&department=...&cursor=...&limit=50
+@catalog_bp.route("/papers", methods=["GET"])
+@query_budget(2)
+@policy()
+def list_papers():
+    cursor, limit = _page_args()
+    q = _filters(ResearchPaper.query, ResearchPaper, ResearchPaper.publication_date)
+    journal = request.args.get("journal")
+    if journal:
+        q = q.filter(ResearchPaper.journal == journal)
+    return _page(q, ResearchPaper, cursor, limit, _paper_json)
+
+# GET /api/catalog/papers/facets?department=...
+@catalog_bp.route("/papers/facets", methods=["GET"])
+@policy()
+def paper_facets():
+    key = f"catalog:papers:facets:{sorted(request.args.items())}"
+    facets = cache.get(key, None)
+    if facets is None:
+        token = cache.token()
+        facets = _facets(ResearchPaper, ResearchPaper.publication_date, extra=[ResearchPaper.journal])
+        cache.set(key, facets, tags={"catalog:papers"}, ttl=FACET_TTL, since=token)
+    return jsonify(facets), 200
+
+# GET /api/catalog/papers/doi/10.1000/xyz123
+@catalog_bp.route("/papers/doi/<path:doi>", methods=["GET"])
+@policy()
+def get_paper_by_doi(doi):
+    p = ResearchPaper.query.filter_by(doi=_normalize_doi(doi)).first_or_404()
+    return jsonify(_paper_json(p)), 200
+
+@catalog_bp.route("/papers", methods=["POST"])
+@policy()
+def create_paper():
+    data = request.get_json() or {}
+    if not data.get("title"):
+        return jsonify(msg="title is required"), 400
+    try:
+        publication_date = _parse_date(data.get("publication_date"), "publication_date")
+        doi = _normalize_doi(data.get("doi"))
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
+    denied = _file_denied(data.get("file_id"))
+    if denied:
+        return denied
+    owner = data.get("owner_id", get_jwt_identity()) if is_admin() else get_jwt_identity()
+    p = ResearchPaper(
+        title=data["title"],
+        authors=data.get("authors"),
+        abstract=data.get("abstract"),
+        publication_date=publication_date,
+        journal=data.get("journal"),
+        doi=doi,
+        owner_id=owner,
+        file_id=data.get("file_id")
+    )
+    db.session.add(p)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        return _integrity_error(ResearchPaper, ResearchPaper.doi, doi, None,
+                                "A paper with this DOI already exists")
+    return jsonify(id=p.id), 201
+
+@catalog_bp.route("/papers/<int:pid>", methods=["PUT"])
+@policy()
+def update_paper(pid):
+    p = ResearchPaper.query.get_or_404(pid)
+    if not _can_edit(p):
+        return jsonify(msg="Forbidden"), 403
+    data = request.get_json() or {}
+    # before any change is pending: the lookup would autoflush it
+    if "file_id" in data and data["file_id"] != p.file_id:
+        denied = _file_denied(data["file_id"])
+        if denied:
+            return denied
+    try:
+        if "publication_date" in data:
+            p.publication_date = _parse_date(data["publication_date"], "publication_date")
+        if "doi" in data:
+            p.doi = _normalize_doi(data["doi"])
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify(msg=str(e)), 400
+    for field in ("title", "authors", "abstract", "journal", "file_id"):
+        if field in data:
+            setattr(p, field, data[field])
+    if "owner_id" in data and is_admin():
+        p.owner_id = data["owner_id"]
+    doi = p.doi
+    try:
+        db.session.commit()
+    except IntegrityError:
+        return _integrity_error(ResearchPaper, ResearchPaper.doi, doi, pid,
+                                "A paper with this DOI already exists")
+    return jsonify(msg="Updated"), 200
+
+@catalog_bp.route("/papers/<int:pid>", methods=["DELETE"])
+@policy()
+def delete_paper(pid):
+    p = ResearchPaper.query.get_or_404(pid)
+    if not _can_edit(p):
+        return jsonify(msg="Forbidden"), 403
+    db.session.delete(p)
+    db.session.commit()
+    return jsonify(msg="Deleted"), 200
+
+# --- patents ---
+
+def _patent_json(p):
+    return {
+        "id": p.id,
+        "title": p.title,
+        "inventors": p.inventors,
+        "patent_number": p.patent_number,
+        "date": p.date.isoformat() if p.date else None,
+        "abstract": p.abstract,
+        "owner_id": p.owner_id,
+        "file_id": p.file_id
+    }
+
+# GET /api/catalog/patents?year=2024&owner=3&department=...&cursor=...&limit=50
+@catalog_bp.route("/patents", methods=["GET"])
+@query_budget(2)
+@policy()
+def list_patents():
+    cursor, limit = _page_args()
+    q = _filters(Patent.query, Patent, Patent.date)
+    return _page(q, Patent, cursor, limit, _patent_json)
+
+@catalog_bp.route("/patents/facets", methods=["GET"])
+@policy()
+def patent_facets():
+    key = f"catalog:patents:facets:{sorted(request.args.items())}"
+    facets = cache.get(key, None)
+    if facets is None:
+        token = cache.token()
+        facets = _facets(Patent, Patent.date)
+        cache.set(key, facets, tags={"catalog:patents"}, ttl=FACET_TTL, since=token)
+    return jsonify(facets), 200
+
+# GET /api/catalog/patents/number/US1234567B2
+@catalog_bp.route("/patents/number/<path:number>", methods=["GET"])
+@policy()
+def get_patent_by_number(number):
+    p = Patent.query.filter_by(patent_number=number.strip()).first_or_404()
+    return jsonify(_patent_json(p)), 200
+
+@catalog_bp.route("/patents", methods=["POST"])
+@policy()
+def create_patent():
+    data = request.get_json() or {}
+    if not data.get("title") or not data.get("patent_number"):
+        return jsonify(msg="title and patent_number are required"), 400
+    try:
+        patent_date = _parse_date(data.get("date"), "date")
+        number = _patent_number(data["patent_number"])
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
+    denied = _file_denied(data.get("file_id"))
+    if denied:
+        return denied
+    owner = data.get("owner_id", get_jwt_identity()) if is_admin() else get_jwt_identity()
+    p = Patent(
+        title=data["title"],
+        inventors=data.get("inventors"),
+        patent_number=number,
+        date=patent_date,
+        abstract=data.get("abstract"),
+        owner_id=owner,
+        file_id=data.get("file_id")
+    )
+    db.session.add(p)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        return _integrity_error(Patent, Patent.patent_number, number, None,
+                                "A patent with this number already exists")
+    return jsonify(id=p.id), 201
+
+@catalog_bp.route("/patents/<int:pid>", methods=["PUT"])
+@policy()
+def update_patent(pid):
+    p = Patent.query.get_or_404(pid)
+    if not _can_edit(p):
+        return jsonify(msg="Forbidden"), 403
+    data = request.get_json() or {}
+    # before any change is pending: the lookup would autoflush it
+    if "file_id" in data and data["file_id"] != p.file_id:
+        denied = _file_denied(data["file_id"])
+        if denied:
+            return denied
+    try:
+        if "patent_number" in data:
+            p.patent_number = _patent_number(data["patent_number"])
+        if "date" in data:
+            p.date = _parse_date(data["date"], "date")
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify(msg=str(e)), 400
+    for field in ("title", "inventors", "abstract", "file_id"):
+        if field in data:
+            setattr(p, field, data[field])
+    if "owner_id" in data and is_admin():
+        p.owner_id = data["owner_id"]
+    number = p.patent_number
+    try:
+        db.session.commit()
+    except IntegrityError:
+        return _integrity_error(Patent, Patent.patent_number, number, pid,
+                                "A patent with this number already exists")
+    return jsonify(msg="Updated"), 200
+
+@catalog_bp.route("/patents/<int:pid>", methods=["DELETE"])
+@policy()
+def delete_patent(pid):
+    p = Patent.query.get_or_404(pid)
+    if not _can_edit(p):
+        return jsonify(msg="Forbidden"), 403
+    db.session.delete(p)
+    db.session.commit()
+    return jsonify(msg="Deleted"), 200
+
+# facet caches follow every write to the catalog or to departments
+register_tagger(ResearchPaper, lambda p: {"catalog:papers"})
+register_tagger(Patent, lambda p: {"catalog:patents"})
+register_tagger(StaffProfile, lambda s: {"catalog:papers", "catalog:patents"})
@@ -8,13 +8,84 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "docc-app")
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URI", "sqlite:///docc.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # read replica for GET handlers (see app.database); unset = primary only
+    DATABASE_REPLICA_URI = os.getenv("DATABASE_REPLICA_URI")
+    # engine profile: pool settings apply to server databases, pragmas to SQLite
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))                 # seconds
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "True").lower() in ("true","1","yes")
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "docc-app")
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=15)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=7)
     JWT_VERIFY_SUB = False
+    TOKEN_REVOCATION_SYNC_SECONDS = float(os.getenv("TOKEN_REVOCATION_SYNC_SECONDS", "5"))
+    # Password hashing (werkzeug method syntax); hashes made with other
+    # parameters are upgraded on the next successful login. "scrypt" is
+    # werkzeug's default (scrypt:32768:8:1), which existing hashes use.
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+    PASSWORD_SALT_LENGTH = int(os.getenv("PASSWORD_SALT_LENGTH", "16"))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))        # 0 = hash inline
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))
+    # hashing processes per POST /api/users/import (at most the core count);
+    # 0 = the shared PASSWORD_HASH_WORKERS pool
+    USER_IMPORT_HASH_WORKERS = int(os.getenv("USER_IMPORT_HASH_WORKERS", "2"))
+    # Metrics: GET /metrics (Prometheus) and the slow-request log
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() in ("true","1","yes")
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")                                  # bearer token for /metrics; unset = loopback only
+    SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))               # 0 = off
+    SLOW_REQUEST_LOG_SIZE = int(os.getenv("SLOW_REQUEST_LOG_SIZE", "100"))
+    # N+1 / query budget checks: "off", "warn" (log) or "strict" (raise)
+    QUERY_WATCH = os.getenv("QUERY_WATCH", "off").lower()
+    QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", "5"))
+    # Background jobs (flask jobs worker)
+    JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))               # idle wait between claims
+    JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "900"))             # running longer = worker died
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+    JOB_BACKOFF_SECONDS = float(os.getenv("JOB_BACKOFF_SECONDS", "5"))         # doubled per attempt
+    JOB_BACKOFF_MAX = float(os.getenv("JOB_BACKOFF_MAX", "900"))
+    REPORT_EXPORT_TTL_HOURS = int(os.getenv("REPORT_EXPORT_TTL_HOURS", "72"))  # XLSX exports, see flask reports prune-exports
+    # Responses: JSON provider ("auto" = orjson when installed, "orjson", "default")
+    # and gzip/brotli compression of bodies of at least COMPRESS_MIN_BYTES (0 = off)
+    JSON_PROVIDER = os.getenv("JSON_PROVIDER", "auto").lower()
+    COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+    COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "4"))
+    # Rate limiting: token buckets per IP and per user, shared by the workers
+    # on a host (default <instance>/ratelimit.sqlite3; "" = per process)
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True").lower() in ("true","1","yes")
+    RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH")
+    RATE_LIMIT_USER_CAPACITY = float(os.getenv("RATE_LIMIT_USER_CAPACITY", "60"))    # tokens (burst)
+    RATE_LIMIT_USER_RATE = float(os.getenv("RATE_LIMIT_USER_RATE", "1"))             # tokens per second
+    RATE_LIMIT_IP_CAPACITY = float(os.getenv("RATE_LIMIT_IP_CAPACITY", "300"))       # campus NAT: keep generous
+    RATE_LIMIT_IP_RATE = float(os.getenv("RATE_LIMIT_IP_RATE", "5"))
+    UPLOAD_MAX_CONCURRENT = int(os.getenv("UPLOAD_MAX_CONCURRENT", "4"))             # per worker, 0 = unbounded
+    UPLOAD_SLOT_TIMEOUT = float(os.getenv("UPLOAD_SLOT_TIMEOUT", "1"))               # wait before 429
+    # PATCH of a draft entry within this many seconds of its last write gets
+    # 429 + Retry-After; the client folds the delta into its next save (0 = off)
+    FORM_AUTOSAVE_WINDOW = float(os.getenv("FORM_AUTOSAVE_WINDOW", "2"))
+    # Cache: per-process LRU plus a SQLite file shared by the workers on a host
+    # (default <instance>/cache.sqlite3; set CACHE_SHARED_PATH="" to disable)
+    CACHE_LOCAL_SIZE = int(os.getenv("CACHE_LOCAL_SIZE", "4096"))
+    CACHE_SHARED_SIZE = int(os.getenv("CACHE_SHARED_SIZE", "100000"))
+    CACHE_SHARED_PATH = os.getenv("CACHE_SHARED_PATH")
+    CACHE_TTL = int(os.getenv("CACHE_TTL", "600"))                             # seconds
+    CACHE_SYNC_SECONDS = float(os.getenv("CACHE_SYNC_SECONDS", "0"))           # 0 = check on every read
+    # log "Started in N ms: phase times" on every worker boot (see `flask startup`)
+    STARTUP_TIMING = os.getenv("STARTUP_TIMING", "False").lower() in ("true","1","yes")
     # MinIO Config
     MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "localhost:9000")
     MINIO_ROOT_USER = os.getenv("MINIO_ROOT_USER")
     MINIO_ROOT_PASSWORD = os.getenv("MINIO_ROOT_PASSWORD")
     MINIO_BUCKET = os.getenv("MINIO_BUCKET", "docc-files")
     MINIO_SECURE = os.getenv("MINIO_SECURE", "False").lower() in ("true","1","yes")
+    MINIO_POOL_SIZE = int(os.getenv("MINIO_POOL_SIZE", "10"))
+    MINIO_CONNECT_TIMEOUT = float(os.getenv("MINIO_CONNECT_TIMEOUT", "3"))
+    MINIO_READ_TIMEOUT = float(os.getenv("MINIO_READ_TIMEOUT", "30"))
+    MINIO_RETRIES = int(os.getenv("MINIO_RETRIES", "2"))
+    MINIO_BUCKET_RETRY_MAX = float(os.getenv("MINIO_BUCKET_RETRY_MAX", "60"))  # seconds between bucket checks
@@ -0,0 +1,139 @@
+"""
+Engine profiles and read/write session routing.
+
+`engine_options` turns the DB_* / SQLITE_* settings into SQLAlchemy engine
+options for a database URI:
+
+* SQLite: WAL journal, busy_timeout and synchronous pragmas on every new
+  connection, so concurrent writers wait instead of failing with
+  "database is locked";
+* PostgreSQL (and other servers): pool size, overflow, timeout, recycle
+  and pre-ping.
+
+When DATABASE_REPLICA_URI is set it becomes the "replica" bind, and
+`RoutingSession` sends reads made while handling GET/HEAD requests there.
+Everything else goes to the primary: writes, flushes, anything after the
+first flush of the request, CLI commands and background threads, and
+views marked with `@use_primary` (GET handlers that write, or that must
+not see replication lag), and queries inside `with primary_reads():`.
+
+`dispose_after_fork` makes forked children (gunicorn --preload) start
+with empty pools instead of sharing the parent's connections.
+"""
+import os
+import sqlite3
+import weakref
+from contextlib import contextmanager
+
+from flask import current_app, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+REPLICA = "replica"
+READ_METHODS = frozenset({"GET", "HEAD"})
+WROTE = "docc.wrote_primary"
+
+
+def use_primary(fn):
+    """Keep every query of this (GET) view on the primary database."""
+    fn.__use_primary__ = True
+    return fn
+
+
+def engine_options(uri, cfg):
+    if make_url(uri).get_backend_name() == "sqlite":
+        # the sqlite3 driver's own lock wait, in seconds; the pragma covers the rest
+        return {"connect_args": {"timeout": cfg["SQLITE_BUSY_TIMEOUT_MS"] / 1000}}
+    return {
+        "pool_size": cfg["DB_POOL_SIZE"],
+        "max_overflow": cfg["DB_MAX_OVERFLOW"],
+        "pool_timeout": cfg["DB_POOL_TIMEOUT"],
+        "pool_recycle": cfg["DB_POOL_RECYCLE"],
+        "pool_pre_ping": cfg["DB_POOL_PRE_PING"],
+    }
+
+
+def configure(app):
+    """Fill in SQLALCHEMY_ENGINE_OPTIONS / BINDS; call before db.init_app."""
+    cfg = app.config
+    cfg.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(cfg["SQLALCHEMY_DATABASE_URI"], cfg))
+    replica = cfg.get("DATABASE_REPLICA_URI")
+    if replica:
+        binds = dict(cfg.get("SQLALCHEMY_BINDS") or {})
+        binds.setdefault(REPLICA, {"url": replica, **engine_options(replica, cfg)})
+        cfg["SQLALCHEMY_BINDS"] = binds
+
+
+def install_sqlite_pragmas(app, engines):
+    cfg = app.config
+    pragmas = [
+        f"PRAGMA journal_mode={cfg['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA busy_timeout={int(cfg['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA synchronous={cfg['SQLITE_SYNCHRONOUS']}",
+    ]
+
+    def on_connect(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    for engine in engines:
+        if engine.dialect.name == "sqlite":
+            event.listen(engine, "connect", on_connect)
+
+
+_engines = weakref.WeakSet()
+
+
+def dispose_after_fork(engines):
+    _engines.update(engines)
+
+
+def _after_fork_in_child():
+    # close=False: the parent still owns those sockets
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+@contextmanager
+def primary_reads():
+    """Route the enclosed queries of the current session to the primary."""
+    from app import db
+
+    info = db.session().info
+    info["primary"] = info.get("primary", 0) + 1
+    try:
+        yield
+    finally:
+        info["primary"] -= 1
+
+
+class RoutingSession(Session):
+    def _reads_from_replica(self):
+        if self._flushing or self.info.get("primary") or not has_request_context():
+            return False
+        if request.method not in READ_METHODS or request.environ.get(WROTE):
+            return False
+        view = current_app.view_functions.get(request.endpoint)
+        return not getattr(view, "__use_primary__", False)
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            replica = self._db.engines.get(REPLICA)
+            if replica is not None and self._reads_from_replica():
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _stick_to_primary(session, flush_context):
+    # read-your-writes for the rest of the request (the session may outlive it)
+    if has_request_context():
+        request.environ[WROTE] = True
@@ -0,0 +1,158 @@
+from datetime import datetime
+from flask import Blueprint, request, jsonify
+from app import db
+from app.querywatch import query_budget
+from app.authz.policy import policy, admin_required, ADMIN_ROLES
+from app.models import EventLog, User, UserProfile, event_attendee
+from app.schedules.routes import parse_datetime
+
+events_bp = Blueprint("events", __name__)
+
+def _user_ids(data):
+    ids = (data or {}).get("user_ids")
+    if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+        return None
+    return list(set(ids))
+
+def _event_json(e, attendee_count=None):
+    data = {
+        "id": e.id,
+        "name": e.name,
+        "date": e.date.isoformat() if e.date else None,
+        "location": e.location,
+        "description": e.description
+    }
+    if attendee_count is not None:
+        data["attendee_count"] = attendee_count
+    return data
+
+def _attendee_counts(event_ids):
+    rows = (
+        db.session.query(event_attendee.c.event_id, db.func.count())
+                  .filter(event_attendee.c.event_id.in_(event_ids))
+                  .group_by(event_attendee.c.event_id)
+    )
+    return dict(rows)
+
+def _add_attendees(eid, user_ids):
+    """One INSERT ... SELECT: skips unknown users and existing attendees."""
+    already = db.exists().where(event_attendee.c.event_id == eid,
+                                event_attendee.c.user_id == User.id)
+    rows = db.select(db.literal(eid), User.id).where(User.id.in_(user_ids), ~already)
+    return db.session.execute(
+        event_attendee.insert().from_select(["event_id", "user_id"], rows)
+    ).rowcount
+
+# GET /api/events?cursor=...&limit=50  (newest first)
+@events_bp.route("", methods=["GET"])
+@query_budget(3)
+@policy()
+def list_events():
+    cursor = request.args.get("cursor", type=int)
+    limit = min(max(request.args.get("limit", 50, type=int), 1), 200)
+    q = EventLog.query
+    if cursor:
+        q = q.filter(EventLog.id < cursor)
+    events = q.order_by(EventLog.id.desc()).limit(limit + 1).all()
+    has_more = len(events) > limit
+    events = events[:limit]
+    counts = _attendee_counts([e.id for e in events]) if events else {}
+    return jsonify(
+        events=[_event_json(e, counts.get(e.id, 0)) for e in events],
+        next_cursor=events[-1].id if has_more else None
+    ), 200
+
+@events_bp.route("", methods=["POST"])
+@admin_required
+def create_event():
+    data = request.get_json() or {}
+    if not data.get("name"):
+        return jsonify(msg="name is required"), 400
+    e = EventLog(
+        name=data["name"],
+        date=parse_datetime(data.get("date")) or datetime.utcnow(),
+        location=data.get("location"),
+        description=data.get("description")
+    )
+    db.session.add(e)
+    db.session.flush()
+    added = 0
+    if data.get("user_ids"):
+        user_ids = _user_ids(data)
+        if user_ids is None:
+            return jsonify(msg="user_ids must be a list of integers"), 400
+        added = _add_attendees(e.id, user_ids)
+    db.session.commit()
+    return jsonify(id=e.id, attendees_added=added), 201
+
+@events_bp.route("/<int:eid>", methods=["GET"])
+@policy()
+def get_event(eid):
+    e = EventLog.query.get_or_404(eid)
+    return jsonify(_event_json(e, _attendee_counts([eid]).get(eid, 0))), 200
+
+@events_bp.route("/<int:eid>", methods=["DELETE"])
+@admin_required
+def delete_event(eid):
+    e = EventLog.query.get_or_404(eid)
+    db.session.execute(event_attendee.delete().where(event_attendee.c.event_id == eid))
+    db.session.delete(e)
+    db.session.commit()
+    return jsonify(msg="Deleted"), 200
+
+# GET /api/events/<eid>/attendees - roster, users and profiles in one query
+@events_bp.route("/<int:eid>/attendees", methods=["GET"])
+@query_budget(3)
+@policy()
+def list_attendees(eid):
+    EventLog.query.get_or_404(eid)
+    rows = (
+        db.session.query(User.id, User.username, UserProfile.full_name)
+                  .join(event_attendee, event_attendee.c.user_id == User.id)
+                  .outerjoin(UserProfile, UserProfile.user_id == User.id)
+                  .filter(event_attendee.c.event_id == eid)
+                  .order_by(User.username)
+    )
+    return jsonify(attendees=[
+        {"id": uid, "username": username, "full_name": full_name}
+        for uid, username, full_name in rows
+    ]), 200
+
+# POST /api/events/<eid>/attendees  { "user_ids": [1, 2, 3] }
+@events_bp.route("/<int:eid>/attendees", methods=["POST"])
+@admin_required
+def add_attendees(eid):
+    EventLog.query.get_or_404(eid)
+    user_ids = _user_ids(request.get_json())
+    if user_ids is None:
+        return jsonify(msg="user_ids must be a list of integers"), 400
+    added = _add_attendees(eid, user_ids) if user_ids else 0
+    db.session.commit()
+    return jsonify(added=added), 200
+
+# DELETE /api/events/<eid>/attendees  { "user_ids": [1, 2, 3] }
+@events_bp.route("/<int:eid>/attendees", methods=["DELETE"])
+@admin_required
+def remove_attendees(eid):
+    EventLog.query.get_or_404(eid)
+    user_ids = _user_ids(request.get_json())
+    if user_ids is None:
+        return jsonify(msg="user_ids must be a list of integers"), 400
+    removed = db.session.execute(
+        event_attendee.delete().where(event_attendee.c.event_id == eid,
+                                      event_attendee.c.user_id.in_(user_ids))
+    ).rowcount
+    db.session.commit()
+    return jsonify(removed=removed), 200
+
+# GET /api/events/attendance/<uid> - events a user attended, newest first
+@events_bp.route("/attendance/<int:uid>", methods=["GET"])
+@policy(roles=ADMIN_ROLES, self_arg="uid")
+def attendance_history(uid):
+    events = (
+        EventLog.query.join(event_attendee, event_attendee.c.event_id == EventLog.id)
+                      .filter(event_attendee.c.user_id == uid)
+                      .order_by(EventLog.date.desc())
+                      .all()
+    )
+    return jsonify(user_id=uid, events=[_event_json(e) for e in events]), 200
@@ -0,0 +1,176 @@
+"""
+Partial updates of entry data: JSON Patch (RFC 6902) and JSON Merge Patch (RFC 7396).
+
+    doc = apply(entry.data, request.get_json(), request.mimetype)
+
+`apply` never modifies its input; it returns the patched copy, or raises
+PatchError when the patch is malformed or cannot be applied (a missing
+path, an index out of range) and PatchConflict when a "test" operation
+fails. A patch is all-or-nothing.
+"""
+import copy
+
+JSON_PATCH = "application/json-patch+json"
+MERGE_PATCH = "application/merge-patch+json"
+MEDIA_TYPES = (JSON_PATCH, MERGE_PATCH)
+
+
+class PatchError(ValueError):
+    pass
+
+
+class PatchConflict(PatchError):
+    pass
+
+
+def _tokens(pointer):
+    """RFC 6901 pointer -> reference tokens; "" is the whole document."""
+    if not isinstance(pointer, str) or (pointer and not pointer.startswith("/")):
+        raise PatchError(f"Invalid JSON pointer: {pointer!r}")
+    if not pointer:
+        return []
+    return [t.replace("~1", "/").replace("~0", "~") for t in pointer[1:].split("/")]
+
+
+def _index(container, token, pointer, append=False):
+    if append and token == "-":
+        return len(container)
+    if not token.isdigit() or (token != "0" and token.startswith("0")):
+        raise PatchError(f"Invalid array index in {pointer}")
+    i = int(token)
+    if i > len(container) or (i == len(container) and not append):
+        raise PatchError(f"Index out of range: {pointer}")
+    return i
+
+
+def _resolve(doc, tokens, pointer):
+    for token in tokens:
+        if isinstance(doc, dict):
+            if token not in doc:
+                raise PatchError(f"Path not found: {pointer}")
+            doc = doc[token]
+        elif isinstance(doc, list):
+            doc = doc[_index(doc, token, pointer)]
+        else:
+            raise PatchError(f"Path not found: {pointer}")
+    return doc
+
+
+def _parent(doc, pointer):
+    tokens = _tokens(pointer)
+    if not tokens:
+        return None, None
+    return _resolve(doc, tokens[:-1], pointer), tokens[-1]
+
+
+def _get(doc, pointer):
+    return _resolve(doc, _tokens(pointer), pointer)
+
+
+def _add(doc, pointer, value):
+    parent, key = _parent(doc, pointer)
+    if parent is None:
+        return value
+    if isinstance(parent, dict):
+        parent[key] = value
+    elif isinstance(parent, list):
+        parent.insert(_index(parent, key, pointer, append=True), value)
+    else:
+        raise PatchError(f"Path not found: {pointer}")
+    return doc
+
+
+def _remove(doc, pointer):
+    parent, key = _parent(doc, pointer)
+    if parent is None:
+        raise PatchError("Cannot remove the whole document")
+    if isinstance(parent, dict):
+        if key not in parent:
+            raise PatchError(f"Path not found: {pointer}")
+        return parent.pop(key)
+    if isinstance(parent, list):
+        return parent.pop(_index(parent, key, pointer))
+    raise PatchError(f"Path not found: {pointer}")
+
+
+def _json_equal(a, b, strict=False):
+    """
+    Equality as RFC 6902 4.6 defines it: 1 == 1.0, but true != 1. With
+    `strict`, 1 != 1.0 as well: the two would serialize differently.
+    """
+    if isinstance(a, bool) or isinstance(b, bool) or strict:
+        if type(a) is not type(b):
+            return False
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_json_equal(a[k], b[k], strict) for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_json_equal(x, y, strict) for x, y in zip(a, b))
+    return a == b
+
+
+def same_document(a, b):
+    """True when storing `a` in place of `b` would change nothing."""
+    return _json_equal(a, b, strict=True)
+
+
+def json_patch(doc, operations):
+    """Apply an RFC 6902 operation list to a copy of `doc`."""
+    if not isinstance(operations, list):
+        raise PatchError("A JSON Patch is a list of operations")
+    doc = copy.deepcopy(doc)
+    for i, operation in enumerate(operations):
+        if not isinstance(operation, dict) or "op" not in operation or "path" not in operation:
+            raise PatchError(f"Operation {i} needs 'op' and 'path'")
+        op, path = operation["op"], operation["path"]
+        _tokens(path)
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise PatchError(f"Operation {i} ({op}) needs 'value'")
+        if op in ("move", "copy"):
+            if "from" not in operation:
+                raise PatchError(f"Operation {i} ({op}) needs 'from'")
+            _tokens(operation["from"])
+
+        if op == "add":
+            doc = _add(doc, path, copy.deepcopy(operation["value"]))
+        elif op == "remove":
+            _remove(doc, path)
+        elif op == "replace":
+            _get(doc, path)     # the target must exist
+            if path:
+                _remove(doc, path)
+            doc = _add(doc, path, copy.deepcopy(operation["value"]))
+        elif op == "move":
+            source = operation["from"]
+            if path != source and path.startswith(source + "/"):
+                raise PatchError(f"Cannot move {source} into itself")
+            if path != source:
+                doc = _add(doc, path, _remove(doc, source))
+        elif op == "copy":
+            doc = _add(doc, path, copy.deepcopy(_get(doc, operation["from"])))
+        elif op == "test":
+            if not _json_equal(_get(doc, path), operation["value"]):
+                raise PatchConflict(f"Test failed at {path or '/'}")
+        else:
+            raise PatchError(f"Unknown operation: {op!r}")
+    return doc
+
+
+def merge_patch(doc, patch):
+    """Apply an RFC 7396 merge patch to a copy of `doc`; null deletes a member."""
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    result = copy.deepcopy(doc) if isinstance(doc, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+def apply(doc, patch, media_type):
+    if media_type == JSON_PATCH:
+        return json_patch(doc, patch)
+    if media_type == MERGE_PATCH:
+        return merge_patch(doc, patch)
+    raise PatchError(f"Unsupported patch type: {media_type}")
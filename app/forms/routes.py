@@ -1,35 +1,22 @@
-import functools
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+import math
+from datetime import datetime
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.orm import load_only
+from sqlalchemy.orm.exc import StaleDataError
 from app import db
+from app.cache import cache, register_tagger, previous_values, invalidate_after_commit
+from app.querywatch import query_budget
+from app.ratelimit import rate_limit
+from app.responses import sparse_fields
+from app.authz.policy import policy, admin_required, is_admin, has_any_role
 from app.models import FormDefinition, FormField, FormEntry, WorkflowDefinition, WorkflowInstance
+from app.forms import patch
 
 forms_bp = Blueprint("forms", __name__)
 
-def user_is_admin():
-    claims = get_jwt()
-    roles = claims.get("roles", [])
-    return "Super Administrator" in roles or "Administrator" in roles
-
-def role_required(allowed_roles):
-    """
-    Decorator factory: only allow users whose JWT 'roles' claim
-    contains at least one of `allowed_roles`.
-    """
-    def decorator_factory(fn):
-        @functools.wraps(fn)  # preserves fn.__name__ so Flask endpoints stay unique
-        @jwt_required()
-        def wrapper(*args, **kwargs):
-            claims = get_jwt()
-            user_roles = claims.get("roles", [])
-            if not any(r in allowed_roles for r in user_roles):
-                return jsonify(msg="Forbidden"), 403
-            return fn(*args, **kwargs)
-        return wrapper
-    return decorator_factory
-
 @forms_bp.route("/", methods=["POST"])
-@role_required(["Super Administrator", "Administrator"])
+@admin_required
 def create_form():
     """
     Payload:
@@ -56,23 +43,27 @@ def create_form():
     return jsonify(id=form.id), 201
 
 @forms_bp.route("/<int:fid>", methods=["GET"])
-@jwt_required()
+@query_budget(5)
+@policy()
 def get_form(fid):
-    f = FormDefinition.query.get_or_404(fid)
+    doc = _form_doc(fid)
     uid  = get_jwt_identity()
 
-    if not user_is_admin():
+    if not is_admin():
         has_entry = FormEntry.query.filter_by(
                         form_id=fid, user_id=uid
                     ).first() is not None
 
         assigned = False
-        for inst in WorkflowInstance.query.filter_by(user_id=uid):
-            wdef = WorkflowDefinition.query.get(inst.workflow_id)
+        # definitions of the user's instances, in one query
+        wdefs = WorkflowDefinition.query.filter(WorkflowDefinition.id.in_(
+            db.select(WorkflowInstance.workflow_id).where(WorkflowInstance.user_id == uid)
+        ))
+        for wdef in wdefs:
             for step in wdef.steps:
                 if step.get("form_id")==fid \
                    and (uid in step.get("assign_users",[]) \
-                        or any(r in get_jwt().get("roles",[]) for r in step.get("assign_roles",[]))):
+                        or has_any_role(step.get("assign_roles",[]))):
                     assigned = True
                     break
             if assigned:
@@ -81,26 +72,36 @@ def get_form(fid):
         if not (has_entry or assigned):
             return jsonify(msg="Forbidden"), 403
     
-    return jsonify({
-      "id": f.id,
-      "name": f.name,
-      "description": f.description,
-      "fields": [
-        {
-          "id": fld.id,
-          "name": fld.name,
-          "label": fld.label,
-          "field_type": fld.field_type,
-          "required": fld.required,
-          "options": fld.options,
-          "order": fld.order
+    return jsonify(doc), 200
+
+def _form_doc(fid):
+    """The form with its fields, cached under the "form:<fid>" tag."""
+    doc = cache.get(f"form:{fid}", None)
+    if doc is None:
+        token = cache.token()
+        f = FormDefinition.query.get_or_404(fid)
+        doc = {
+          "id": f.id,
+          "name": f.name,
+          "description": f.description,
+          "fields": [
+            {
+              "id": fld.id,
+              "name": fld.name,
+              "label": fld.label,
+              "field_type": fld.field_type,
+              "required": fld.required,
+              "options": fld.options,
+              "order": fld.order
+            }
+            for fld in f.fields
+          ]
         }
-        for fld in f.fields
-      ]
-    }), 200
+        cache.set(f"form:{fid}", doc, tags={f"form:{fid}"}, since=token)
+    return doc
 
 @forms_bp.route("/<int:fid>", methods=["PUT"])
-@role_required(["Super Administrator", "Administrator"])
+@admin_required
 def update_form(fid):
     data = request.get_json()
     f = FormDefinition.query.get_or_404(fid)
@@ -108,13 +109,15 @@ def update_form(fid):
     f.description = data.get("description", f.description)
     # naive fields replace: delete old, add new
     FormField.query.filter_by(form_id=fid).delete()
+    invalidate_after_commit(db.session, f"form:{fid}")   # bulk delete skips the taggers
     for fld in data["fields"]:
         f.fields.append(FormField(**fld))
     db.session.commit()
     return jsonify(msg="Updated"), 200
 
 @forms_bp.route("/<int:fid>/entries", methods=["POST"])
-@jwt_required()
+@query_budget(3)
+@policy()
 def submit_entry(fid):
     """
     Payload:
@@ -134,48 +137,200 @@ def submit_entry(fid):
     db.session.commit()
     return jsonify(id=entry.id), 201
 
+def _client_version():
+    """
+    The entry version the client last saw, from If-Match ("3" or W/"3") or
+    ?version=3; None when it sent neither (or If-Match: *).
+    Raises ValueError when it is not a version.
+    """
+    if request.if_match:
+        if request.if_match.star_tag:
+            return None
+        tags = request.if_match.as_set(include_weak=True)
+        tag = tags.pop() if len(tags) == 1 else ""
+        if not tag.isdigit():
+            raise ValueError("If-Match must be a single entry version")
+        return int(tag)
+    version = request.args.get("version")
+    if version is None:
+        return None
+    if not version.isdigit():
+        raise ValueError("version must be an integer")
+    return int(version)
+
+
+def _versioned(response, version):
+    response.set_etag(str(version))
+    return response
+
+
+def _conflict(version=None):
+    msg = "Entry was changed by another save; reload it"
+    if version is None:
+        return jsonify(msg=msg), 409
+    return _versioned(jsonify(msg=msg, version=version), version), 409
+
+
+def _coalesce_wait(entry):
+    """
+    Seconds until a draft may be written again, or 0. Autosaves closer
+    together than FORM_AUTOSAVE_WINDOW are refused rather than written, so
+    the client merges them into one save: at most one rewrite of the
+    entry's data per window, whatever the autosave cadence.
+    """
+    window = current_app.config["FORM_AUTOSAVE_WINDOW"]
+    if not window or entry.status != "draft" or entry.updated_at is None:
+        return 0
+    return window - (datetime.utcnow() - entry.updated_at).total_seconds()
+
+def _save_entry(entry):
+    """Commit `entry`; its new version, or None when a concurrent save won."""
+    try:
+        db.session.flush()
+        version = entry.version
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        return None
+    return version
+
+
 @forms_bp.route("/entries/<int:eid>", methods=["PUT"])
-@jwt_required()
+@query_budget(3)
+@policy()
 def update_entry(eid):
+    """
+    Replace an entry's data (and status). With If-Match: "<version>" the
+    save is rejected with 409 unless the entry is still at that version.
+    """
     entry = FormEntry.query.get_or_404(eid)
     if entry.user_id != get_jwt_identity():
         return jsonify(msg="Forbidden"), 403
+    try:
+        expected = _client_version()
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
+    if expected is not None and expected != entry.version:
+        return _conflict(entry.version)
     data = request.get_json()
     entry.data = data["data"]
     entry.status = data.get("status", entry.status)
-    db.session.commit()
-    return jsonify(msg="Updated"), 200
+    version = _save_entry(entry)
+    if version is None:
+        return _conflict()
+    return _versioned(jsonify(msg="Updated", version=version), version), 200
+
+@forms_bp.route("/entries/<int:eid>", methods=["PATCH"])
+@query_budget(3)
+@policy()
+def patch_entry(eid):
+    """
+    PATCH /api/forms/entries/456
+    If-Match: "<version>"
+    Content-Type: application/json-patch+json   (RFC 6902)
+      [{"op": "replace", "path": "/title", "value": "..."}]
+    or application/merge-patch+json             (RFC 7396)
+      {"title": "...", "obsolete": null}
+
+    Patches the entry's data, for autosave: only the delta travels. 409
+    when the entry is no longer at the client's version (or a "test" op
+    fails), 428 without a version, 400 when the result is not an object.
+
+    Rapid saves are coalesced: a draft written less than
+    FORM_AUTOSAVE_WINDOW seconds ago answers 429 with Retry-After and its
+    unchanged version, and the client sends this delta again together with
+    whatever it has gathered meanwhile, under the same If-Match (JSON
+    Patch op lists concatenate; merge patches merge). A patch that leaves
+    the data unchanged skips the write and keeps the version, so repeated
+    autosaves of an idle draft cost one read.
+    """
+    if request.mimetype not in patch.MEDIA_TYPES:
+        return jsonify(msg=f"Content-Type must be {patch.JSON_PATCH} or {patch.MERGE_PATCH}"), 415
+    entry = FormEntry.query.get_or_404(eid)
+    if entry.user_id != get_jwt_identity():
+        return jsonify(msg="Forbidden"), 403
+    try:
+        expected = _client_version()
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
+    if expected is None and not request.if_match.star_tag:
+        return jsonify(msg="Send the entry version in If-Match"), 428
+    if expected is not None and expected != entry.version:
+        return _conflict(entry.version)
+
+    try:
+        data = patch.apply(entry.data, request.get_json(), request.mimetype)
+    except patch.PatchConflict as e:
+        return jsonify(msg=str(e)), 409
+    except patch.PatchError as e:
+        return jsonify(msg=str(e)), 422
+    if not isinstance(data, dict):
+        # e.g. "replace" at "" or a merge patch that is not an object
+        return jsonify(msg="Entry data must remain a JSON object"), 400
+    if patch.same_document(data, entry.data):
+        return _versioned(jsonify(msg="Unchanged", version=entry.version), entry.version), 200
+    wait = _coalesce_wait(entry)
+    if wait > 0:
+        response = _versioned(jsonify(msg="Saved moments ago; send this change with the next save",
+                                      version=entry.version), entry.version)
+        return response, 429, {"Retry-After": str(math.ceil(wait))}
+
+    entry.data = data
+    version = _save_entry(entry)
+    if version is None:
+        return _conflict()
+    return _versioned(jsonify(msg="Updated", version=version), version), 200
 
 @forms_bp.route("/<int:fid>/entries/mine", methods=["GET"])
-@jwt_required()
+@query_budget(2)
+@policy()
 def list_my_entries(fid):
     uid = get_jwt_identity()
     entries = FormEntry.query.filter_by(form_id=fid, user_id=uid).all()
     return jsonify([
-      { "id": e.id, "data": e.data, "status": e.status, "updated_at": e.updated_at }
+      { "id": e.id, "data": e.data, "status": e.status, "version": e.version, "updated_at": e.updated_at }
       for e in entries
     ]), 200
 
+ENTRY_FIELDS = ("id", "user_id", "data", "status", "version")
+
 @forms_bp.route("/<int:fid>/entries", methods=["GET"])
-@role_required(["Super Administrator", "Administrator"])
+@query_budget(2)
+@admin_required
 def list_all_entries(fid):
-    entries = FormEntry.query.filter_by(form_id=fid).all()
+    """?fields=id,status selects (and returns) only those columns."""
+    try:
+        fields = sparse_fields(ENTRY_FIELDS)
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
+    entries = (
+        FormEntry.query.options(load_only(*(getattr(FormEntry, f) for f in fields)))
+                       .filter_by(form_id=fid)
+                       .all()
+    )
     return jsonify([
-      { "id": e.id, "user_id": e.user_id, "data": e.data, "status": e.status }
+      { f: getattr(e, f) for f in fields }
       for e in entries
     ]), 200
 
+FORM_FIELDS = ("id", "name", "description")
+
 @forms_bp.route("", methods=["GET"])
-@jwt_required()
+@query_budget(5)
+@rate_limit(2, exempt=is_admin)     # scans every workflow definition for non-admins
+@policy()
 def list_forms():
     page = request.args.get("page", 1, type=int)
     per_page = request.args.get("per_page", 10, type=int)
+    try:
+        fields = sparse_fields(FORM_FIELDS)
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
 
-    if user_is_admin():
+    if is_admin():
         q = FormDefinition.query
     else:
         uid = get_jwt_identity()
-        roles = get_jwt().get("roles", [])
 
         # 1) Forms the user has already submitted
         entry_rows = (
@@ -193,7 +348,7 @@ def list_forms():
                 # only consider this step if the user or one of their roles is listed
                 if (
                     uid in step.get("assign_users", [])
-                    or any(r in roles for r in step.get("assign_roles", []))
+                    or has_any_role(step.get("assign_roles", []))
                 ):
                     fid = step.get("form_id")
                     if isinstance(fid, int):
@@ -216,14 +371,15 @@ def list_forms():
         )
 
     pagination = (
-        q.order_by(FormDefinition.created_at.desc())
+        q.options(load_only(*(getattr(FormDefinition, f) for f in fields)))
+         .order_by(FormDefinition.created_at.desc())
          .paginate(page=page, per_page=per_page, error_out=False)
     )
 
     return jsonify({
         "forms": [
-            {"id": f.id, "name": f.name, "description": f.description}
-            for f in pagination.items
+            {f: getattr(form, f) for f in fields}
+            for form in pagination.items
         ],
         "page":        pagination.page,
         "per_page":    pagination.per_page,
@@ -232,7 +388,7 @@ def list_forms():
     }), 200
 
 @forms_bp.route("/<int:fid>", methods=["DELETE"])
-@role_required(["Super Administrator", "Administrator"])
+@admin_required
 def delete_form(fid):
     """
     DELETE /api/forms/123
@@ -249,7 +405,7 @@ def delete_form(fid):
 
 
 @forms_bp.route("/entries/<int:eid>", methods=["DELETE"])
-@jwt_required()
+@policy()
 def delete_entry(eid):
     """
     DELETE /api/forms/entries/456
@@ -258,12 +414,15 @@ def delete_entry(eid):
     """
     entry = FormEntry.query.get_or_404(eid)
     uid   = get_jwt_identity()
-    roles = get_jwt().get("roles", [])
 
     # only owner or admin
-    if entry.user_id != uid and not any(r in ["Super Administrator", "Administrator"] for r in roles):
+    if entry.user_id != uid and not is_admin():
         return jsonify(msg="Forbidden"), 403
 
     db.session.delete(entry)
     db.session.commit()
-    return jsonify(msg="Entry deleted"), 200
\ No newline at end of file
+    return jsonify(msg="Entry deleted"), 200
+
+# cached form documents follow the definition and its fields
+register_tagger(FormDefinition, lambda f: {f"form:{f.id}"})
+register_tagger(FormField, lambda fld: {f"form:{fid}" for fid in previous_values(fld, "form_id")})
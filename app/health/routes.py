@@ -0,0 +1,29 @@
+from flask import Blueprint, jsonify, current_app
+from app import db
+from app.database import use_primary
+
+health_bp = Blueprint("health", __name__)
+
+# GET /api/health - unauthenticated, for load balancers and probes.
+# Only "ok"/"error" per dependency: error text can name hosts, DSNs and
+# buckets, so it goes to the log instead.
+@health_bp.route("", methods=["GET"])
+@use_primary
+def health():
+    checks = {}
+    try:
+        db.session.execute(db.text("SELECT 1"))
+        checks["database"] = "ok"
+    except Exception:
+        current_app.logger.exception("Health check: database")
+        checks["database"] = "error"
+
+    minio_client = current_app.minio_client
+    if hasattr(minio_client, "health"):
+        probe = minio_client.health()
+        if not probe["ok"]:
+            current_app.logger.error(f"Health check: minio: {probe.get('error', 'bucket missing')}")
+        checks["minio"] = "ok" if probe["ok"] else "error"
+
+    ok = all(c == "ok" for c in checks.values())
+    return jsonify(status="ok" if ok else "degraded", checks=checks), 200 if ok else 503
@@ -0,0 +1,207 @@
+"""
+Durable job queue in the application database.
+
+    @handler("reports.xlsx")
+    def write_report(payload): ...          # return value is stored as Job.result
+
+    @handler("notify.email", batch=50)
+    def send(payloads): ...                 # up to 50 same-type jobs per call
+
+    enqueue("reports.xlsx", {...}, priority=5, created_by=uid)
+    db.session.commit()
+
+Jobs are claimed with a single UPDATE ... WHERE id IN (SELECT ... LIMIT n):
+on PostgreSQL the inner SELECT is FOR UPDATE SKIP LOCKED, so workers never
+wait on each other; on SQLite writes are serialized and the
+status = 'queued' condition makes each claim exclusive. A claim stamps the
+rows with a token, and completion only updates rows still carrying it,
+so a job whose lease expired and was requeued cannot be finished twice.
+
+Failures are retried with exponential backoff (JOB_BACKOFF_SECONDS,
+doubling, capped at JOB_BACKOFF_MAX) until max_attempts, then marked
+failed. Jobs running longer than JOB_LEASE_SECONDS are assumed to belong to
+a dead worker and are requeued.
+"""
+import random
+import traceback
+from datetime import datetime, timedelta
+from typing import Callable, NamedTuple
+from uuid import uuid4
+
+from flask import current_app
+
+from app import db
+from app.database import primary_reads
+from app.models import Job
+
+
+class Handler(NamedTuple):
+    fn: Callable
+    batch: int
+
+
+_handlers = {}
+
+
+def handler(name, batch=1):
+    """Register `fn` for jobs of type `name`; batch > 1 passes a list of payloads."""
+    def decorator(fn):
+        _handlers[name] = Handler(fn, batch)
+        return fn
+    return decorator
+
+
+def handlers():
+    return dict(_handlers)
+
+
+def enqueue(type, payload=None, priority=0, delay=None, max_attempts=None, created_by=None):
+    """Add a job to the session; it is queued when the caller commits."""
+    if type not in _handlers:
+        raise ValueError(f"no job handler registered for {type!r}")
+    job = Job(
+        type=type,
+        payload=payload,
+        priority=priority,
+        run_at=datetime.utcnow() + (delay or timedelta()),
+        max_attempts=max_attempts or current_app.config["JOB_MAX_ATTEMPTS"],
+        created_by=created_by
+    )
+    db.session.add(job)
+    return job
+
+
+_order = (Job.priority.desc(), Job.run_at, Job.id)
+
+
+def claim(worker, types=None):
+    """
+    Claim the most urgent due job plus, for batch handlers, more due jobs
+    of the same type. Returns (token, jobs); jobs is empty when idle.
+    """
+    # a replica may lag behind the queue: every read here goes to the primary
+    with primary_reads():
+        return _claim(worker, types)
+
+
+def _claim(worker, types):
+    now = datetime.utcnow()
+    due = db.select(Job.type).where(Job.status == "queued", Job.run_at <= now)
+    if types:
+        due = due.where(Job.type.in_(types))
+    head = db.session.execute(due.order_by(*_order).limit(1)).scalar()
+    db.session.commit()   # end the read; the claim below is one write statement
+    if head is None:
+        return None, []
+
+    h = _handlers.get(head)
+    ids = (
+        db.select(Job.id)
+          .where(Job.status == "queued", Job.run_at <= now, Job.type == head)
+          .order_by(*_order)
+          .limit(h.batch if h else 1)
+    )
+    if db.engine.dialect.name == "postgresql":
+        ids = ids.with_for_update(skip_locked=True)
+    token = f"{worker}:{uuid4().hex[:12]}"
+    db.session.execute(
+        db.update(Job)
+          .where(Job.id.in_(ids), Job.status == "queued")
+          .values(status="running", locked_by=token, locked_at=now, attempts=Job.attempts + 1)
+          .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    jobs = Job.query.filter_by(locked_by=token, status="running").order_by(*_order).all()
+    return token, jobs
+
+
+def _owned(job, token):
+    return db.update(Job).where(Job.id == job.id, Job.locked_by == token) \
+             .execution_options(synchronize_session=False)
+
+
+def complete(job, token, result=None):
+    db.session.execute(_owned(job, token).values(
+        status="done", result=result, locked_by=None, finished_at=datetime.utcnow()
+    ))
+
+
+def fail(job, token, error):
+    """Reschedule with backoff, or mark failed once attempts are used up. Returns the new status."""
+    cfg = current_app.config
+    if job.attempts >= job.max_attempts:
+        status, values = "failed", {"finished_at": datetime.utcnow()}
+    else:
+        delay = min(cfg["JOB_BACKOFF_SECONDS"] * 2 ** (job.attempts - 1), cfg["JOB_BACKOFF_MAX"])
+        delay *= random.uniform(0.8, 1.2)   # spread retries of a failed batch
+        status, values = "queued", {"run_at": datetime.utcnow() + timedelta(seconds=delay)}
+    db.session.execute(_owned(job, token).values(
+        status=status, last_error=error[-4000:], locked_by=None, **values
+    ))
+    return status
+
+
+def run(jobs, token):
+    """
+    Execute claimed jobs (all of one type) and record the outcome.
+    Returns {"done": n, "retried": n, "failed": n}.
+    """
+    outcome = {"done": 0, "retried": 0, "failed": 0}
+    h = _handlers.get(jobs[0].type)
+    try:
+        if h is None:
+            raise LookupError(f"no job handler registered for {jobs[0].type!r}")
+        if h.batch > 1:
+            results = list(h.fn([j.payload for j in jobs]) or [None] * len(jobs))
+            if len(results) != len(jobs):
+                # zip() would leave the unmatched jobs running until their lease expires
+                raise ValueError(f"batch handler returned {len(results)} results for {len(jobs)} jobs")
+        else:
+            results = [h.fn(jobs[0].payload)]
+    except Exception:
+        db.session.rollback()
+        error = traceback.format_exc()
+        current_app.logger.error(f"Job {jobs[0].type} {[j.id for j in jobs]} failed:\n{error}")
+        for job in jobs:
+            status = fail(job, token, error)
+            outcome["failed" if status == "failed" else "retried"] += 1
+    else:
+        for job, result in zip(jobs, results):
+            complete(job, token, result)
+        outcome["done"] = len(jobs)
+    db.session.commit()
+    return outcome
+
+
+def requeue_stale():
+    """Give jobs of dead workers back to the queue; returns how many."""
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config["JOB_LEASE_SECONDS"])
+    stale = (Job.status == "running", Job.locked_at < cutoff)
+    failed = db.session.execute(
+        db.update(Job).where(*stale, Job.attempts >= Job.max_attempts)
+          .values(status="failed", locked_by=None, last_error="lease expired",
+                  finished_at=datetime.utcnow())
+          .execution_options(synchronize_session=False)
+    ).rowcount
+    requeued = db.session.execute(
+        db.update(Job).where(*stale)
+          .values(status="queued", locked_by=None, last_error="lease expired")
+          .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return requeued + failed
+
+
+def stats():
+    """Queue depth per (type, status), and the oldest due queued job's wait."""
+    rows = db.session.execute(
+        db.select(Job.type, Job.status, db.func.count()).group_by(Job.type, Job.status)
+    )
+    depth = {}
+    for type_, status, n in rows:
+        depth.setdefault(type_, {})[status] = n
+    oldest = db.session.execute(
+        db.select(db.func.min(Job.run_at)).where(Job.status == "queued", Job.run_at <= datetime.utcnow())
+    ).scalar()
+    lag = (datetime.utcnow() - oldest).total_seconds() if oldest else 0.0
+    return {"by_type": depth, "oldest_due_seconds": round(lag, 1)}
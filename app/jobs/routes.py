@@ -0,0 +1,85 @@
+import json
+from datetime import datetime
+import click
+from flask import Blueprint, jsonify, current_app
+from flask_jwt_extended import get_jwt_identity
+from app import db
+from app.authz.policy import policy, admin_required, is_admin
+from app.jobs import queue
+from app.models import Job
+
+jobs_bp = Blueprint("jobs", __name__)
+
+def _job_json(j):
+    return {
+        "id":           j.id,
+        "type":         j.type,
+        "status":       j.status,
+        "priority":     j.priority,
+        "attempts":     j.attempts,
+        "max_attempts": j.max_attempts,
+        "run_at":       j.run_at.isoformat() if j.run_at else None,
+        "created_at":   j.created_at.isoformat() if j.created_at else None,
+        "finished_at":  j.finished_at.isoformat() if j.finished_at else None,
+        "result":       j.result,
+        "last_error":   j.last_error.strip().splitlines()[-1] if j.last_error else None
+    }
+
+# GET /api/jobs/stats - queue depth per type and status
+@jobs_bp.route("/stats", methods=["GET"])
+@admin_required
+def job_stats():
+    return jsonify(queue.stats()), 200
+
+# GET /api/jobs/<jid> - the job's creator or an admin
+@jobs_bp.route("/<int:jid>", methods=["GET"])
+@policy()
+def get_job(jid):
+    j = Job.query.get_or_404(jid)
+    if j.created_by != get_jwt_identity() and not is_admin():
+        return jsonify(msg="Forbidden"), 403
+    return jsonify(_job_json(j)), 200
+
+
+@jobs_bp.cli.command("worker")
+@click.option("-n", "--threads", default=2, show_default=True, help="Worker threads per process.")
+@click.option("-p", "--processes", default=1, show_default=True,
+              help="Worker processes; more than 1 spawns them.")
+@click.option("--type", "types", multiple=True, help="Only run these job types (repeatable).")
+@click.option("--burst", is_flag=True, help="Exit once the queue is empty.")
+@click.option("--report-every", default=60.0, show_default=True,
+              help="Seconds between throughput log lines.")
+def worker_command(threads, processes, types, burst, report_every):
+    """Run queued background jobs."""
+    from app.jobs.worker import Worker, run_processes
+
+    unknown = set(types) - queue.handlers().keys()
+    if unknown:
+        raise click.BadParameter(f"no handler for {', '.join(sorted(unknown))}", param_hint="--type")
+    if processes > 1:
+        result = run_processes(processes, threads, list(types), burst, report_every)
+    else:
+        app = current_app._get_current_object()
+        result = Worker(app, threads, list(types), burst, report_every).run()
+    click.echo(json.dumps(result, indent=2))
+
+
+@jobs_bp.cli.command("stats")
+def stats_command():
+    """Queue depth per job type and status."""
+    click.echo(json.dumps(queue.stats(), indent=2))
+
+
+@jobs_bp.cli.command("retry-failed")
+@click.option("--type", "types", multiple=True, help="Only these job types (repeatable).")
+def retry_failed_command(types):
+    """Queue failed jobs again with a fresh set of attempts."""
+    q = db.update(Job).where(Job.status == "failed")
+    if types:
+        q = q.where(Job.type.in_(types))
+    n = db.session.execute(
+        q.values(status="queued", attempts=0, run_at=datetime.utcnow(), finished_at=None)
+         .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    click.echo(f"Requeued {n} job(s).")
@@ -0,0 +1,156 @@
+"""
+Job worker: N threads (optionally in several processes) claiming and
+running jobs until stopped.
+
+Each thread has its own app context and database session, claims one job
+(or one same-type batch) at a time and sleeps JOB_POLL_SECONDS when the
+queue is empty. SIGINT/SIGTERM let running jobs finish, then exit.
+Throughput is logged every `report_every` seconds and at exit.
+"""
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+from app import db
+from app.jobs import queue
+
+
+class Throughput:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.by_type = {}   # type -> {"done", "retried", "failed", "seconds"}
+        self._lock = threading.Lock()
+
+    def record(self, type_, outcome, seconds):
+        with self._lock:
+            s = self.by_type.setdefault(type_, {"done": 0, "retried": 0, "failed": 0, "seconds": 0.0})
+            for key, n in outcome.items():
+                s[key] += n
+            s["seconds"] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            by_type = {t: dict(s) for t, s in self.by_type.items()}
+        done = sum(s["done"] for s in by_type.values())
+        for s in by_type.values():
+            n = s["done"] + s["retried"] + s["failed"]
+            s["avg_ms"] = round(s.pop("seconds") / n * 1000, 1) if n else None
+        return {
+            "elapsed_seconds": round(elapsed, 1),
+            "done": done,
+            "retried": sum(s["retried"] for s in by_type.values()),
+            "failed": sum(s["failed"] for s in by_type.values()),
+            "jobs_per_second": round(done / elapsed, 2) if elapsed else 0.0,
+            "by_type": by_type
+        }
+
+
+class Worker:
+    def __init__(self, app, threads=1, types=None, burst=False, report_every=60.0):
+        self.app = app
+        self.threads = threads
+        self.types = types or None
+        self.burst = burst                      # exit once the queue is empty
+        self.report_every = report_every
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+        self.throughput = Throughput()
+        self._last_requeue = 0.0
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    def _maybe_requeue_stale(self):
+        lease = self.app.config["JOB_LEASE_SECONDS"]
+        if time.monotonic() - self._last_requeue < min(60, lease / 4):
+            return
+        self._last_requeue = time.monotonic()
+        n = queue.requeue_stale()
+        if n:
+            self.app.logger.warning(f"Requeued {n} job(s) with expired leases")
+
+    def _loop(self, n):
+        poll = self.app.config["JOB_POLL_SECONDS"]
+        with self.app.app_context():
+            try:
+                while not self.stopping.is_set():
+                    if n == 0:
+                        self._maybe_requeue_stale()
+                    token, jobs = queue.claim(f"{self.name}:{n}", self.types)
+                    if not jobs:
+                        if self.burst:
+                            break
+                        self.stopping.wait(poll)
+                        continue
+                    started = time.perf_counter()
+                    outcome = queue.run(jobs, token)
+                    self.throughput.record(jobs[0].type, outcome, time.perf_counter() - started)
+            except Exception:
+                self.app.logger.exception(f"Job worker thread {n} crashed")
+                self.stopping.set()
+            finally:
+                db.session.remove()
+
+    def _report(self):
+        s = self.throughput.snapshot()
+        self.app.logger.info(
+            f"Jobs [{self.name}]: {s['done']} done ({s['jobs_per_second']}/s), "
+            f"{s['retried']} retried, {s['failed']} failed in {s['elapsed_seconds']}s"
+        )
+        return s
+
+    def run(self):
+        """Run until stopped (or, in burst mode, until idle). Returns the throughput snapshot."""
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self.stop)
+            signal.signal(signal.SIGTERM, self.stop)
+        workers = [
+            threading.Thread(target=self._loop, args=(n,), name=f"job-worker-{n}", daemon=True)
+            for n in range(self.threads)
+        ]
+        for t in workers:
+            t.start()
+        next_report = time.monotonic() + self.report_every
+        while any(t.is_alive() for t in workers):
+            for t in workers:
+                t.join(timeout=0.5)
+            if time.monotonic() >= next_report:
+                self._report()
+                next_report += self.report_every
+        return self._report()
+
+
+def _process_main(threads, types, burst, report_every, results):
+    from app import create_app
+
+    app = create_app()
+    results.put(Worker(app, threads, types, burst, report_every).run())
+
+
+def run_processes(processes, threads, types=None, burst=False, report_every=60.0):
+    """Run `processes` worker processes (spawned) of `threads` threads each."""
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=_process_main, args=(threads, types, burst, report_every, results),
+                    name=f"job-worker-process-{n}")
+        for n in range(processes)
+    ]
+    for p in procs:
+        p.start()
+
+    def forward(signum, frame):
+        for p in procs:
+            if p.is_alive():
+                os.kill(p.pid, signal.SIGTERM)
+    signal.signal(signal.SIGINT, forward)
+    signal.signal(signal.SIGTERM, forward)
+
+    snapshots = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return snapshots
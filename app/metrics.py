@@ -0,0 +1,266 @@
+"""
+Per-request performance metrics, exposed in Prometheus text format.
+
+`init_app` installs before/after_request hooks and SQLAlchemy engine
+events that record, per endpoint:
+
+* request latency and response size histograms, request counts by status;
+* SQL statements per request and time spent in the database;
+* MinIO call durations per operation (via `LazyMinio.observers`);
+* cache hits, misses, evictions and size per tier (app.cache).
+
+GET /metrics serves everything collected by this process (scrape each
+worker, or run one worker per target). Requests slower than
+SLOW_REQUEST_MS are logged with their most expensive SQL statements and
+kept in a ring buffer at GET /metrics/slow. Both endpoints require
+"Authorization: Bearer <METRICS_TOKEN>"; without a token configured they
+only answer unproxied requests from the loopback interface.
+
+The hot path is a few perf_counter() calls and dict updates under one
+lock per observation; with METRICS_ENABLED off nothing is installed.
+"""
+import bisect
+import hmac
+import threading
+import time
+from collections import deque
+
+from flask import Response, current_app, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.cache import cache
+
+LOOPBACK = {"127.0.0.1", "::1"}
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+TOP_STATEMENTS = 5
+
+
+class Histogram:
+    def __init__(self, name, help, labels, buckets):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self._series = {}   # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(label_values)
+            if s is None:
+                s = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for values, s in sorted(series.items()):
+            labels = _labels(self.labels, values)
+            cumulative = 0
+            for bound, n in zip(self.buckets, s):
+                cumulative += n
+                yield f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {cumulative}'
+            yield f'{self.name}_bucket{{{labels}{"," if labels else ""}le="+Inf"}} {s[-1]}'
+            yield f"{self.name}_sum{{{labels}}} {s[-2]:.6f}" if labels else f"{self.name}_sum {s[-2]:.6f}"
+            yield f"{self.name}_count{{{labels}}} {s[-1]}" if labels else f"{self.name}_count {s[-1]}"
+
+
+class Counter:
+    def __init__(self, name, help, labels):
+        self.name, self.help, self.labels = name, help, labels
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value=1, *label_values):
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            series = dict(self._series)
+        for values, v in sorted(series.items()):
+            yield f"{self.name}{{{_labels(self.labels, values)}}} {v:g}"
+
+
+def _labels(names, values):
+    return ",".join(
+        f'{n}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for n, v in zip(names, values)
+    )
+
+
+request_seconds = Histogram("docc_request_duration_seconds", "Request latency.",
+                            ("endpoint", "method"), LATENCY_BUCKETS)
+requests_total = Counter("docc_requests_total", "Requests by status.", ("endpoint", "method", "status"))
+response_bytes = Histogram("docc_response_size_bytes", "Response body size (non-streamed responses).",
+                           ("endpoint",), SIZE_BUCKETS)
+sql_statements = Histogram("docc_request_sql_statements", "SQL statements per request.",
+                           ("endpoint",), COUNT_BUCKETS)
+db_seconds = Counter("docc_request_db_seconds_total", "Time spent executing SQL.", ("endpoint",))
+minio_seconds = Histogram("docc_minio_call_duration_seconds", "MinIO call latency.",
+                          ("operation", "outcome"), LATENCY_BUCKETS)
+
+METRICS = (request_seconds, requests_total, response_bytes, sql_statements, db_seconds, minio_seconds)
+
+slow_requests = deque(maxlen=100)
+
+
+class RequestStats:
+    __slots__ = ("started", "statements", "db_time", "by_statement")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = 0
+        self.db_time = 0.0
+        self.by_statement = {}   # SQL -> [count, seconds]
+
+
+# --- SQLAlchemy events (all engines) ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["_metrics_started"].pop()
+    if not has_request_context():
+        return
+    stats = g.get("_metrics")
+    if stats is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats.statements += 1
+    stats.db_time += elapsed
+    entry = stats.by_statement.get(statement)
+    if entry is None:
+        stats.by_statement[statement] = [1, elapsed]
+    else:
+        entry[0] += 1
+        entry[1] += elapsed
+
+
+def _handle_error(context):
+    # the failed statement never reaches after_cursor_execute
+    stack = context.connection.info.get("_metrics_started") if context.connection is not None else None
+    if stack:
+        stack.pop()
+
+
+# --- request hooks ---
+
+def _before_request():
+    g._metrics = RequestStats()
+
+
+def _after_request(response):
+    stats = g.pop("_metrics", None)
+    if stats is None:
+        return response
+    elapsed = time.perf_counter() - stats.started
+    endpoint = request.endpoint or "unmatched"
+    method = request.method
+    request_seconds.observe(elapsed, endpoint, method)
+    requests_total.inc(1, endpoint, method, response.status_code)
+    sql_statements.observe(stats.statements, endpoint)
+    db_seconds.inc(stats.db_time, endpoint)
+    if not response.is_streamed and response.content_length is not None:
+        response_bytes.observe(response.content_length, endpoint)
+
+    slow_ms = current_app.config["SLOW_REQUEST_MS"]
+    if slow_ms and elapsed * 1000 >= slow_ms:
+        top = sorted(stats.by_statement.items(), key=lambda kv: kv[1][1], reverse=True)[:TOP_STATEMENTS]
+        record = {
+            "at": time.time(),
+            "method": method,
+            "path": request.full_path.rstrip("?"),
+            "endpoint": endpoint,
+            "status": response.status_code,
+            "ms": round(elapsed * 1000, 1),
+            "sql_statements": stats.statements,
+            "sql_ms": round(stats.db_time * 1000, 1),
+            "top_sql": [
+                {"statement": sql, "count": n, "ms": round(t * 1000, 1)} for sql, (n, t) in top
+            ]
+        }
+        slow_requests.append(record)
+        current_app.logger.warning(
+            f"Slow request {method} {record['path']}: {record['ms']}ms, "
+            f"{stats.statements} SQL ({record['sql_ms']}ms)"
+            + "".join(f"\n  {s['count']}x {s['ms']}ms {s['statement'][:200]}" for s in record["top_sql"])
+        )
+    return response
+
+
+def cache_lines():
+    stats = cache.stats()
+    tiers = {tier: s for tier, s in stats.items() if isinstance(s, dict)}
+    for name, kind, help in (
+        ("hits", "counter", "Cache hits."),
+        ("misses", "counter", "Cache misses."),
+        ("evictions", "counter", "Entries evicted for size."),
+        ("size", "gauge", "Cached entries.")
+    ):
+        metric = f"docc_cache_{name}_total" if kind == "counter" else f"docc_cache_{name}"
+        yield f"# HELP {metric} {help}"
+        yield f"# TYPE {metric} {kind}"
+        for tier, s in sorted(tiers.items()):
+            yield f'{metric}{{tier="{tier}"}} {s[name]}'
+    yield "# HELP docc_cache_invalidations_applied_total Tags invalidated by other workers."
+    yield "# TYPE docc_cache_invalidations_applied_total counter"
+    yield f"docc_cache_invalidations_applied_total {stats['invalidations_applied']}"
+
+
+def observe_minio(operation, seconds, ok):
+    minio_seconds.observe(seconds, operation, "ok" if ok else "error")
+
+
+# --- endpoints ---
+
+def _authorized():
+    token = current_app.config["METRICS_TOKEN"]
+    if not token:
+        # the slow log holds paths and SQL: without a token, same host only,
+        # and not through a local reverse proxy
+        proxied = "X-Forwarded-For" in request.headers or "Forwarded" in request.headers
+        return request.remote_addr in LOOPBACK and not proxied
+    return hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+
+
+def metrics_view():
+    if not _authorized():
+        return jsonify(msg="Forbidden"), 403
+    lines = [line for metric in METRICS for line in metric.render()]
+    lines.extend(cache_lines())
+    return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+
+def slow_view():
+    if not _authorized():
+        return jsonify(msg="Forbidden"), 403
+    return jsonify(slow_requests=list(slow_requests)), 200
+
+
+def init_app(app):
+    global slow_requests
+    if not app.config["METRICS_ENABLED"]:
+        return
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+    slow_requests = deque(maxlen=app.config["SLOW_REQUEST_LOG_SIZE"])
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view, methods=["GET"])
+    app.add_url_rule("/metrics/slow", "metrics_slow", slow_view, methods=["GET"])
+    observers = getattr(app.minio_client, "observers", None)
+    if observers is not None:
+        observers.append(observe_minio)
@@ -1,14 +1,15 @@
 from datetime import datetime
 from uuid import uuid4
 from app import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.auth.passwords import hash_password, verify_password, needs_rehash
 # from sqlalchemy.dialects.postgresql import JSON
 
 # Association tables
 roles_users = db.Table(
     'roles_users',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
-    db.Column('role_id', db.Integer, db.ForeignKey('role.id'), primary_key=True)
+    db.Column('role_id', db.Integer, db.ForeignKey('role.id'), primary_key=True),
+    db.Index('ix_roles_users_role_id', 'role_id')   # "users with role X"; the PK covers user_id
 )
 
 event_media = db.Table(
@@ -17,11 +18,19 @@ event_media = db.Table(
     db.Column('media_id', db.Integer, db.ForeignKey('media_file.id'), primary_key=True)
 )
 
+event_attendee = db.Table(
+    'event_attendee',
+    # no User-side relationship; deleting either side cascades in the database
+    db.Column('event_id', db.Integer, db.ForeignKey('event_log.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_event_attendee_user_id', 'user_id')   # "which events did user X attend?"
+)
+
 class User(db.Model):
     __tablename__ = 'user'
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128), nullable=False)
+    password_hash = db.Column(db.String(256), nullable=False)
     roles = db.relationship('Role', secondary=roles_users, backref='users')
     profile = db.relationship('UserProfile', uselist=False, backref='user')
     uploaded_files = db.relationship('MediaFile', backref='uploader')
@@ -33,10 +42,21 @@ class User(db.Model):
     schedules = db.relationship('TimeSchedule', backref='owner')
 
     def set_password(self, pw):
-        self.password_hash = generate_password_hash(pw)
+        self.password_hash = hash_password(pw)
 
     def check_password(self, pw):
-        return check_password_hash(self.password_hash, pw)
+        return verify_password(self.password_hash, pw)
+
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
+
+class TokenRevocation(db.Model):
+    __tablename__ = 'token_revocation'
+    id = db.Column(db.Integer, primary_key=True)               # doubles as the revocation generation
+    user_id = db.Column(db.Integer, index=True)                # no FK: must outlive deleted users
+    jti = db.Column(db.String(36))                             # set for single-token revocations (logout)
+    scope = db.Column(db.String(16), nullable=False)           # 'access', 'all' or 'jti'
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
 class Role(db.Model):
     __tablename__ = 'role'
@@ -52,8 +72,11 @@ class UserProfile(db.Model):
 
 class StaffProfile(db.Model):
     __tablename__ = 'staff_profile'
+    __table_args__ = (
+        db.Index('ix_staff_profile_department_user_id', 'department', 'user_id'),  # department filters
+    )
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     department = db.Column(db.String(128))
     expertise = db.Column(db.Text)
     contact = db.Column(db.String(256))
@@ -61,13 +84,18 @@ class StaffProfile(db.Model):
 class StudentProfile(db.Model):
     __tablename__ = 'student_profile'
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     program = db.Column(db.String(128))
     year = db.Column(db.Integer)
     advisor = db.Column(db.String(128))
 
 class TimeSchedule(db.Model):
     __tablename__ = 'time_schedule'
+    __table_args__ = (
+        # overlap lookups: location/owner equality, then a range on start
+        db.Index('ix_time_schedule_location_start_end', 'location', 'start', 'end'),
+        db.Index('ix_time_schedule_owner_start_end', 'owner_id', 'start', 'end'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     type = db.Column(db.String(32))  # e.g. course, event, meeting, booking
@@ -78,7 +106,7 @@ class TimeSchedule(db.Model):
 class Award(db.Model):
     __tablename__ = 'award'
     id = db.Column(db.Integer, primary_key=True)
-    recipient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    recipient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     name = db.Column(db.String(256), nullable=False)
     date = db.Column(db.Date, nullable=False)
     awarding_body = db.Column(db.String(256))
@@ -86,7 +114,7 @@ class Award(db.Model):
 class Achievement(db.Model):
     __tablename__ = 'achievement'
     id = db.Column(db.Integer, primary_key=True)
-    owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     title = db.Column(db.String(256), nullable=False)
     description = db.Column(db.Text)
 
@@ -96,11 +124,33 @@ class MediaFile(db.Model):
     filename = db.Column(db.String(256), nullable=False)
     content_type = db.Column(db.String(128), nullable=False)
     url = db.Column(db.String(512), nullable=False)
+    object_name = db.Column(db.String(300), index=True)    # key inside MINIO_BUCKET
     size = db.Column(db.Integer)
     meta = db.Column(db.JSON)
+    uploaded_by = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, default=1)             # current MediaVersion.version
+    versions = db.relationship(
+        'MediaVersion', backref='media', cascade='all, delete-orphan', order_by='MediaVersion.version'
+    )
+
+class MediaVersion(db.Model):
+    __tablename__ = 'media_version'
+    __table_args__ = (
+        db.UniqueConstraint('media_id', 'version', name='uq_media_version'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    media_id = db.Column(db.Integer, db.ForeignKey('media_file.id'), nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    filename = db.Column(db.String(256), nullable=False)
+    content_type = db.Column(db.String(128), nullable=False)
+    url = db.Column(db.String(512), nullable=False)
+    object_name = db.Column(db.String(300), nullable=False, index=True)  # shared by versions with equal bytes
+    size = db.Column(db.Integer)
+    checksum = db.Column(db.String(64))                    # sha256 of the object bytes
+    meta = db.Column(db.JSON)
     uploaded_by = db.Column(db.Integer, db.ForeignKey('user.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    version = db.Column(db.Integer, default=1)
 
 class ResearchPaper(db.Model):
     __tablename__ = 'research_paper'
@@ -110,9 +160,9 @@ class ResearchPaper(db.Model):
     abstract = db.Column(db.Text)
     publication_date = db.Column(db.Date)
     journal = db.Column(db.String(256))
-    doi = db.Column(db.String(128))
-    owner_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    file_id = db.Column(db.Integer, db.ForeignKey('media_file.id'))
+    doi = db.Column(db.String(128), unique=True, index=True)        # stored lower-case
+    owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+    file_id = db.Column(db.Integer, db.ForeignKey('media_file.id'), index=True)
     file = db.relationship('MediaFile')
 
 class Patent(db.Model):
@@ -120,11 +170,11 @@ class Patent(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(256), nullable=False)
     inventors = db.Column(db.String(512))
-    patent_number = db.Column(db.String(128), nullable=False)
+    patent_number = db.Column(db.String(128), nullable=False, unique=True, index=True)
     date = db.Column(db.Date)
     abstract = db.Column(db.Text)
-    owner_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    file_id = db.Column(db.Integer, db.ForeignKey('media_file.id'))
+    owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+    file_id = db.Column(db.Integer, db.ForeignKey('media_file.id'), index=True)
     file = db.relationship('MediaFile')
 
 class EventLog(db.Model):
@@ -134,7 +184,7 @@ class EventLog(db.Model):
     date = db.Column(db.DateTime, default=datetime.utcnow)
     location = db.Column(db.String(256))
     description = db.Column(db.Text)
-    attendees = db.Column(db.JSON)  # list of user IDs
+    attendees = db.relationship('User', secondary=event_attendee, lazy='dynamic')
     media = db.relationship('MediaFile', secondary=event_media)
 
 class WorkflowDefinition(db.Model):
@@ -149,7 +199,8 @@ class WorkflowInstance(db.Model):
         db.UniqueConstraint(
             'workflow_id','entity_type','entity_id','user_id',
             name='uq_workflow_instance_unique_per_user'
-        ),
+        ),                                     # also serves lookups by workflow_id
+        db.Index('ix_workflow_instance_user_entity', 'user_id', 'entity_type', 'entity_id'),
     )
     id = db.Column(db.Integer, primary_key=True)
     workflow_id = db.Column(db.Integer, db.ForeignKey('workflow_definition.id'), nullable=False)
@@ -162,6 +213,9 @@ class WorkflowInstance(db.Model):
 
 class Notification(db.Model):
     __tablename__ = 'notification'
+    __table_args__ = (
+        db.Index('ix_notification_user_id_is_read', 'user_id', 'is_read'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     message = db.Column(db.String(512), nullable=False)
@@ -183,7 +237,7 @@ class FormDefinition(db.Model):
 class FormField(db.Model):
     __tablename__ = 'form_field'
     id = db.Column(db.Integer, primary_key=True)
-    form_id = db.Column(db.Integer, db.ForeignKey('form_definition.id'), nullable=False)
+    form_id = db.Column(db.Integer, db.ForeignKey('form_definition.id'), nullable=False, index=True)
     name = db.Column(db.String(64), nullable=False)
     label = db.Column(db.String(128), nullable=False)
     field_type = db.Column(db.String(32), nullable=False)
@@ -193,10 +247,41 @@ class FormField(db.Model):
 
 class FormEntry(db.Model):
     __tablename__ = 'form_entry'
+    __table_args__ = (
+        db.Index('ix_form_entry_form_id_user_id', 'form_id', 'user_id'),
+        db.Index('ix_form_entry_user_id', 'user_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     form_id = db.Column(db.Integer, db.ForeignKey('form_definition.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     data = db.Column(db.JSON, nullable=False)
     status = db.Column(db.String(16), default='submitted')  # 'draft' or 'submitted'
+    version = db.Column(db.Integer, nullable=False, server_default='1')  # bumped by every write
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
+
+    # every UPDATE/DELETE carries "WHERE version = <loaded version>"; losing
+    # a race raises StaleDataError instead of overwriting the other write
+    __mapper_args__ = {'version_id_col': version}
+
+class Job(db.Model):
+    __tablename__ = 'job'
+    __table_args__ = (
+        # claim order: queued jobs by priority, then due time
+        db.Index('ix_job_status_priority_run_at', 'status', 'priority', 'run_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(64), nullable=False)        # handler name, e.g. 'reports.xlsx'
+    payload = db.Column(db.JSON)
+    status = db.Column(db.String(16), nullable=False, default='queued')  # queued, running, done, failed
+    priority = db.Column(db.Integer, nullable=False, default=0)         # higher runs first
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # not before (retry backoff)
+    locked_by = db.Column(db.String(64))                   # claim token of the worker running it
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    result = db.Column(db.JSON)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
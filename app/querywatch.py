@@ -0,0 +1,125 @@
+"""
+N+1 detection and per-endpoint query budgets (development and tests).
+
+Budgets are declared next to the route, under `@route`:
+
+    @forms_bp.route("", methods=["GET"])
+    @query_budget(4)
+    @policy()
+    def list_forms(): ...
+
+With QUERY_WATCH set to "warn" or "strict", every SQL statement issued
+while handling a request is normalized (literals and IN-lists collapsed)
+and counted. After the request:
+
+* a statement repeated QUERY_REPEAT_THRESHOLD times or more is reported as
+  a likely N+1, with the application line that issued it;
+* more statements than the endpoint's budget is a violation.
+
+"warn" logs findings and adds X-Query-Count / X-Query-Budget headers;
+"strict" raises `QueryBudgetExceeded`, which app.testing propagates to the
+test client, so an N+1 regression fails the test that exercises it.
+tests/test_query_budgets.py drives every benchmark scenario that way.
+"""
+import os
+import re
+import sys
+import sysconfig
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+LIBRARY_DIRS = tuple({sysconfig.get_paths()[k] for k in ("stdlib", "purelib", "platlib")})
+
+_literals = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_in_lists = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)|\((?:\s*%\(\w+\)s\s*,)+\s*%\(\w+\)s\s*\)")
+_spaces = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised in strict mode when a request exceeds its budget or repeats a statement."""
+
+
+def query_budget(n):
+    """Declare the most SQL statements the view may issue per request."""
+    def decorator(fn):
+        fn.__query_budget__ = n
+        return fn
+    return decorator
+
+
+def normalize(statement):
+    statement = _literals.sub("?", statement)
+    statement = _in_lists.sub("(?...)", statement)
+    return _spaces.sub(" ", statement).strip()
+
+
+def _caller():
+    """file:line of the innermost frame outside libraries and the app's hooks."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not (filename.startswith(LIBRARY_DIRS) or filename.startswith("<")
+                or filename in (__file__, os.path.join(APP_DIR, "metrics.py"))):
+            if filename.startswith(APP_DIR):
+                filename = os.path.relpath(filename, os.path.dirname(APP_DIR))
+            return f"{filename}:{frame.f_lineno}"
+        frame = frame.f_back
+    return None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context():
+        return
+    seen = g.get("_querywatch")
+    if seen is None:
+        return
+    key = normalize(statement)
+    entry = seen.get(key)
+    if entry is None:
+        seen[key] = [1, _caller()]
+    else:
+        entry[0] += 1
+
+
+def _before_request():
+    g._querywatch = {}
+
+
+def _after_request(response):
+    seen = g.pop("_querywatch", None)
+    if seen is None:
+        return response
+    cfg = current_app.config
+    total = sum(n for n, _ in seen.values())
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, "__query_budget__", None)
+
+    problems = []
+    threshold = cfg["QUERY_REPEAT_THRESHOLD"]
+    for statement, (n, caller) in seen.items():
+        if n >= threshold:
+            problems.append(f"possible N+1: {n}x from {caller or 'unknown'}: {statement[:300]}")
+    if budget is not None and total > budget:
+        problems.append(f"{total} statements, budget is {budget}")
+
+    response.headers["X-Query-Count"] = str(total)
+    if budget is not None:
+        response.headers["X-Query-Budget"] = str(budget)
+    if problems:
+        message = f"{request.method} {request.path} ({request.endpoint}): " + "; ".join(problems)
+        if cfg["QUERY_WATCH"] == "strict":
+            raise QueryBudgetExceeded(message)
+        current_app.logger.warning(message)
+    return response
+
+
+def init_app(app):
+    if app.config["QUERY_WATCH"] not in ("warn", "strict"):
+        return
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
@@ -0,0 +1,223 @@
+"""
+Token-bucket rate limiting and upload backpressure.
+
+    @bp.route("/login", methods=["POST"])
+    @rate_limit(5, key=lambda: ...)
+    def login(): ...
+
+`rate_limit(cost)` attaches `__rate_limit__` to the view; a before_request
+hook charges `cost` tokens to two buckets, one for the caller's IP and one
+for the user (the JWT identity, or whatever `key` returns), and answers 429
+with Retry-After when either is short. Both are charged or neither. Buckets
+refill continuously: RATE_LIMIT_USER_* / RATE_LIMIT_IP_* give the capacity
+(the burst) and the refill rate in tokens per second; both must be
+positive. `exempt` is a callable; when it returns true the request is not
+charged (e.g. is_admin).
+
+Buckets live in a SQLite file shared by every worker on the host
+(RATE_LIMIT_PATH, default <instance>/ratelimit.sqlite3; "" keeps them per
+process). Each check is one transaction of one UPSERT per bucket. Behind a
+reverse proxy, install werkzeug's ProxyFix so `remote_addr` is the client.
+
+`concurrency_limit(name)` bounds how many requests of a view run at once in
+this worker (UPLOAD_MAX_CONCURRENT for "upload"); callers that cannot get a
+slot within UPLOAD_SLOT_TIMEOUT get 429 instead of queueing.
+"""
+import functools
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+PRUNE_EVERY = 1024      # checks between sweeps of full, idle buckets
+
+
+class Limit:
+    def __init__(self, cost, key=None, exempt=None):
+        self.cost = cost
+        self.key = key
+        self.exempt = exempt
+
+
+def rate_limit(cost=1, key=None, exempt=None):
+    """Charge `cost` tokens per request; see the module docstring."""
+    limit = Limit(cost, key, exempt)
+
+    def decorator(fn):
+        fn.__rate_limit__ = limit
+        return fn
+    return decorator
+
+
+class LocalBuckets:
+    def __init__(self):
+        self._buckets = {}      # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, charges, now):
+        """
+        `charges` is [(key, cost, capacity, rate)]. Takes every charge, or
+        none; returns 0 or the seconds until the short bucket has enough.
+        """
+        with self._lock:
+            levels, wait = [], 0.0
+            for key, cost, capacity, rate in charges:
+                tokens, updated = self._buckets.get(key, (capacity, now))
+                tokens = min(capacity, tokens + (now - updated) * rate)
+                if tokens < cost:
+                    wait = max(wait, (cost - tokens) / rate)
+                levels.append((key, tokens - cost))
+            if wait:
+                return wait
+            for key, tokens in levels:
+                self._buckets[key] = (tokens, now)
+            return 0.0
+
+
+class SQLiteBuckets:
+    """Buckets in a SQLite file, shared by every process that opens it."""
+
+    TAKE = (
+        "INSERT INTO bucket (key, tokens, updated) VALUES (:key, :capacity - :cost, :now) "
+        "ON CONFLICT(key) DO UPDATE SET "
+        " tokens = min(:capacity, tokens + (:now - updated) * :rate) - :cost, updated = :now "
+        "WHERE min(:capacity, tokens + (:now - updated) * :rate) >= :cost "
+        "RETURNING tokens"
+    )
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._checks = 0
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS bucket ("
+            " key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL) WITHOUT ROWID"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def take(self, charges, now):
+        conn = self._conn()
+        wait = 0.0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for key, cost, capacity, rate in charges:
+                params = {"key": key, "cost": cost, "capacity": capacity, "rate": rate, "now": now}
+                if conn.execute(self.TAKE, params).fetchone() is None:
+                    tokens, updated = conn.execute(
+                        "SELECT tokens, updated FROM bucket WHERE key = ?", (key,)
+                    ).fetchone()
+                    tokens = min(capacity, tokens + (now - updated) * rate)
+                    wait = max(wait, (cost - tokens) / rate)
+            conn.execute("ROLLBACK" if wait else "COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._checks += 1
+        if self._checks % PRUNE_EVERY == 0:
+            self.prune(now)
+        return wait
+
+    def prune(self, now, idle=3600):
+        # a bucket idle this long has refilled; dropping it changes nothing
+        self._conn().execute("DELETE FROM bucket WHERE updated < ?", (now - idle,))
+
+
+_buckets = None
+_semaphores = {}
+_semaphores_lock = threading.Lock()
+
+
+def _too_many(wait):
+    return jsonify(msg="Too many requests, retry later"), 429, {"Retry-After": str(max(1, math.ceil(wait)))}
+
+
+def _identity():
+    try:
+        verify_jwt_in_request(optional=True)
+    except Exception:
+        return None     # the view's own jwt_required answers for bad tokens
+    return get_jwt_identity()
+
+
+def _check():
+    view = current_app.view_functions.get(request.endpoint)
+    limit = getattr(view, "__rate_limit__", None)
+    if limit is None:
+        return None
+    user = limit.key() if limit.key else _identity()
+    if limit.exempt is not None and user is not None and limit.exempt():
+        return None
+    cfg = current_app.config
+    charges = [(
+        f"ip:{request.remote_addr}",
+        min(limit.cost, cfg["RATE_LIMIT_IP_CAPACITY"]), cfg["RATE_LIMIT_IP_CAPACITY"], cfg["RATE_LIMIT_IP_RATE"]
+    )]
+    if user is not None:
+        charges.append((
+            f"user:{user}",
+            min(limit.cost, cfg["RATE_LIMIT_USER_CAPACITY"]), cfg["RATE_LIMIT_USER_CAPACITY"], cfg["RATE_LIMIT_USER_RATE"]
+        ))
+    wait = _buckets.take(charges, time.time())
+    if wait:
+        current_app.logger.info(f"Rate limited {request.endpoint} for {charges[-1][0]} ({wait:.1f}s)")
+        return _too_many(wait)
+    return None
+
+
+def _semaphore(name):
+    # one per worker process, sized on first use
+    sem = _semaphores.get((name, os.getpid()))
+    if sem is None:
+        with _semaphores_lock:
+            sem = _semaphores.get((name, os.getpid()))
+            if sem is None:
+                size = current_app.config[f"{name.upper()}_MAX_CONCURRENT"]
+                sem = _semaphores[(name, os.getpid())] = threading.BoundedSemaphore(size)
+    return sem
+
+
+def concurrency_limit(name):
+    """At most <NAME>_MAX_CONCURRENT concurrent calls per worker, else 429."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not current_app.config[f"{name.upper()}_MAX_CONCURRENT"]:
+                return fn(*args, **kwargs)
+            sem = _semaphore(name)
+            timeout = current_app.config[f"{name.upper()}_SLOT_TIMEOUT"]
+            if not sem.acquire(timeout=timeout):
+                return _too_many(1)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                sem.release()
+        return wrapper
+    return decorator
+
+
+def init_app(app):
+    global _buckets
+    if not app.config["RATE_LIMIT_ENABLED"]:
+        return
+    for name in ("USER_CAPACITY", "USER_RATE", "IP_CAPACITY", "IP_RATE"):
+        if not app.config[f"RATE_LIMIT_{name}"] > 0:
+            raise ValueError(f"RATE_LIMIT_{name} must be positive (set RATE_LIMIT_ENABLED=False to disable)")
+    path = app.config["RATE_LIMIT_PATH"]
+    if path is None:
+        os.makedirs(app.instance_path, exist_ok=True)
+        path = os.path.join(app.instance_path, "ratelimit.sqlite3")
+    _buckets = SQLiteBuckets(path) if path else LocalBuckets()
+    app.before_request(_check)
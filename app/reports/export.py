@@ -0,0 +1,115 @@
+"""
+Faculty-wide report rows: every award, achievement, paper and patent with
+its owner's username and full name, in one flat shape.
+
+`iter_rows` runs one query per record type and streams it from a
+server-side cursor (`yield_per`), so memory stays flat however large the
+export is. The writers turn rows into CSV / JSON Lines chunks as they
+arrive, or into an XLSX file (openpyxl, optional) for background exports.
+"""
+import csv
+import io
+import json
+from datetime import date
+
+from app import db
+from app.models import Award, Achievement, ResearchPaper, Patent, User, UserProfile, StaffProfile
+
+COLUMNS = ["type", "id", "user_id", "username", "full_name",
+           "title", "date", "venue", "reference", "description"]
+
+BATCH = 1000
+
+# type -> (model, owner column, title, date, venue, reference, description)
+SOURCES = {
+    "award": (Award, Award.recipient_id, Award.name, Award.date,
+              Award.awarding_body, None, None),
+    "achievement": (Achievement, Achievement.owner_id, Achievement.title, None,
+                    None, None, Achievement.description),
+    "paper": (ResearchPaper, ResearchPaper.owner_id, ResearchPaper.title, ResearchPaper.publication_date,
+              ResearchPaper.journal, ResearchPaper.doi, ResearchPaper.abstract),
+    "patent": (Patent, Patent.owner_id, Patent.title, Patent.date,
+               Patent.inventors, Patent.patent_number, Patent.abstract),
+}
+
+
+def _select(kind, year=None, user_id=None, department=None):
+    model, owner, title, date_col, venue, reference, description = SOURCES[kind]
+    null = db.null()
+    stmt = (
+        db.select(
+            db.literal(kind), model.id, owner, User.username, UserProfile.full_name,
+            title,
+            date_col if date_col is not None else null,
+            venue if venue is not None else null,
+            reference if reference is not None else null,
+            description if description is not None else null
+        )
+        .join(User, User.id == owner)
+        .outerjoin(UserProfile, UserProfile.user_id == owner)
+        .order_by(model.id)
+    )
+    if user_id:
+        stmt = stmt.where(owner == user_id)
+    if department:
+        stmt = stmt.where(owner.in_(
+            db.select(StaffProfile.user_id).where(StaffProfile.department == department)
+        ))
+    if year:
+        if date_col is None:
+            return None   # undated records cannot match a year filter
+        stmt = stmt.where(date_col >= date(year, 1, 1), date_col < date(year + 1, 1, 1))
+    return stmt
+
+
+def iter_rows(types=None, year=None, user_id=None, department=None):
+    """Yield one tuple (in COLUMNS order) per record, streamed per type."""
+    for kind in types or SOURCES:
+        stmt = _select(kind, year, user_id, department)
+        if stmt is None:
+            continue
+        result = db.session.execute(stmt, execution_options={"yield_per": BATCH})
+        for row in result:
+            yield tuple(row)
+
+
+def _cell(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def iter_csv(rows, batch=BATCH):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(COLUMNS)
+    for n, row in enumerate(rows, 1):
+        writer.writerow([_cell(v) for v in row])
+        if n % batch == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def iter_jsonl(rows, batch=BATCH):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(COLUMNS, map(_cell, row))), ensure_ascii=False))
+        if len(lines) >= batch:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def write_xlsx(rows, fh):
+    """Write rows to `fh` as a streaming (write-only) workbook; returns the row count."""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("report")
+    ws.append(COLUMNS)
+    n = 0
+    for n, row in enumerate(rows, 1):
+        ws.append(list(row))
+    wb.save(fh)
+    return n
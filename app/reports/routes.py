@@ -0,0 +1,137 @@
+import json
+import tempfile
+from datetime import datetime, timedelta
+from importlib.util import find_spec
+from uuid import uuid4
+import click
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from flask_jwt_extended import get_jwt_identity
+from app import db
+from app.authz.policy import policy, is_admin
+from app.jobs.queue import handler, enqueue
+from app.models import Job
+from app.reports.export import SOURCES, iter_rows, iter_csv, iter_jsonl, write_xlsx
+
+reports_bp = Blueprint("reports", __name__)
+
+FORMATS = {
+    "csv":   ("text/csv", iter_csv),
+    "jsonl": ("application/x-ndjson", iter_jsonl),
+}
+XLSX_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+LINK_TTL = timedelta(hours=1)
+
+def _filters(args):
+    """Validated export filters from query args or a JSON body, or (None, error)."""
+    types = args.get("type")
+    if isinstance(types, str):
+        types = [t for t in types.split(",") if t]
+    if types and not set(types) <= SOURCES.keys():
+        return None, f"type must be any of {', '.join(SOURCES)}"
+    try:
+        year = int(args["year"]) if args.get("year") else None
+        user_id = int(args["user"]) if args.get("user") else None
+    except (TypeError, ValueError):
+        return None, "year and user must be integers"
+    # everyone may export their own records; the whole faculty is admin-only
+    if not is_admin():
+        if user_id not in (None, get_jwt_identity()):
+            return None, None
+        user_id = get_jwt_identity()
+    return {"types": types or None, "year": year, "user_id": user_id,
+            "department": args.get("department")}, None
+
+def _rejected(error):
+    return (jsonify(msg=error), 400) if error else (jsonify(msg="Forbidden"), 403)
+
+# GET /api/reports/export?format=csv&type=award,paper&year=2024&department=...&user=3
+@reports_bp.route("/export", methods=["GET"])
+@policy()
+def export():
+    fmt = request.args.get("format", "csv")
+    if fmt not in FORMATS:
+        return jsonify(msg="format must be csv or jsonl"), 400
+    filters, error = _filters(request.args)
+    if filters is None:
+        return _rejected(error)
+    mimetype, writer = FORMATS[fmt]
+    body = stream_with_context(writer(iter_rows(**filters)))
+    return Response(body, mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename=report.{fmt}"
+    })
+
+# --- XLSX exports, written by a background job and stored in MinIO ---
+
+def _object(uid, rid):
+    # under app.uploads.gc.EXPORTS_PREFIX: media GC leaves these alone
+    return f"reports/{uid}/{rid}.xlsx"
+
+def _expired(job):
+    ttl = timedelta(hours=current_app.config["REPORT_EXPORT_TTL_HOURS"])
+    return job.finished_at is not None and job.finished_at < datetime.utcnow() - ttl
+
+@handler("reports.xlsx")
+def write_report(payload):
+    """Job: write the workbook to a temp file, then upload it."""
+    name = _object(payload["uid"], payload["rid"])
+    with tempfile.TemporaryFile() as fh:
+        rows = write_xlsx(iter_rows(**payload["filters"]), fh)
+        size = fh.tell()
+        fh.seek(0)
+        current_app.minio_client.put_object(current_app.config["MINIO_BUCKET"], name, fh, size,
+                                            content_type=XLSX_TYPE)
+    return {"object_name": name, "rows": rows, "size": size}
+
+# POST /api/reports/exports  { "type": ["award"], "year": 2024, "department": "...", "user": 3 }
+@reports_bp.route("/exports", methods=["POST"])
+@policy()
+def start_export():
+    if find_spec("openpyxl") is None:
+        return jsonify(msg="XLSX export requires openpyxl"), 501
+    filters, error = _filters(request.get_json() or {})
+    if filters is None:
+        return _rejected(error)
+    uid = get_jwt_identity()
+    job = enqueue("reports.xlsx", {"filters": filters, "uid": uid, "rid": uuid4().hex}, created_by=uid)
+    db.session.commit()
+    return jsonify(id=job.id, status_url=f"/api/reports/exports/{job.id}"), 202
+
+# GET /api/reports/exports/<jid>  -> pending | ready (+ download link) | failed | expired
+@reports_bp.route("/exports/<int:jid>", methods=["GET"])
+@policy()
+def export_status(jid):
+    job = Job.query.filter_by(id=jid, type="reports.xlsx").first_or_404()
+    if job.created_by != get_jwt_identity() and not is_admin():
+        return jsonify(msg="Forbidden"), 403
+    if job.status == "failed":
+        return jsonify(status="failed", error=job.last_error.strip().splitlines()[-1]), 200
+    if job.status != "done":
+        return jsonify(status="pending", attempts=job.attempts), 200
+    if _expired(job):
+        return jsonify(status="expired"), 200
+    url = current_app.minio_client.presigned_get_object(
+        current_app.config["MINIO_BUCKET"], job.result["object_name"], expires=LINK_TTL
+    )
+    return jsonify(status="ready", url=url, rows=job.result["rows"], size=job.result["size"]), 200
+
+@reports_bp.cli.command("prune-exports")
+@click.option("--dry-run/--execute", default=True, show_default=True,
+              help="Only report what would be deleted.")
+@click.option("--batch-size", default=500, show_default=True)
+@click.option("--rate", default=200.0, show_default=True,
+              help="Max objects deleted per second, 0 for unlimited.")
+def prune_exports_command(dry_run, batch_size, rate):
+    """Delete XLSX exports older than REPORT_EXPORT_TTL_HOURS."""
+    from app.uploads import gc
+
+    report = gc.prune_exports(
+        current_app.minio_client,
+        current_app.config["MINIO_BUCKET"],
+        current_app.logger,
+        cutoff=datetime.utcnow() - timedelta(hours=current_app.config["REPORT_EXPORT_TTL_HOURS"]),
+        dry_run=dry_run,
+        batch_size=batch_size,
+        rate=rate,
+        echo=click.echo,
+    )
+    click.echo(json.dumps(report, indent=2))
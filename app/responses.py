@@ -0,0 +1,112 @@
+"""
+Response encoding: sparse fieldsets, a faster JSON provider and compression.
+
+* `sparse_fields(allowed)` parses `?fields=id,name` for list endpoints,
+  which pass the result to `load_only` so unrequested columns (large
+  `data`/`steps` JSON) are neither selected nor serialized.
+* JSON_PROVIDER selects the app's JSON provider: "orjson" (optional
+  dependency), "default" (Flask's) or "auto" (orjson when installed).
+  OrjsonProvider keeps Flask's output: sorted keys, HTTP dates for
+  datetimes, the same fallbacks for other types.
+* Responses of at least COMPRESS_MIN_BYTES with a compressible mimetype
+  are encoded with brotli (optional dependency) or gzip, as negotiated by
+  Accept-Encoding. Streamed responses are left alone.
+"""
+import gzip
+from importlib.util import find_spec
+
+from flask import current_app, request
+from flask.json.provider import DefaultJSONProvider
+
+COMPRESSIBLE = {
+    "application/json", "application/x-ndjson", "text/csv", "text/plain", "text/html"
+}
+
+
+def sparse_fields(allowed):
+    """
+    The fields named by ?fields= (in `allowed` order), or all of `allowed`.
+    Raises ValueError naming unknown fields, or when ?fields= names none.
+    """
+    raw = request.args.get("fields")
+    if not raw:
+        return list(allowed)
+    wanted = {f.strip() for f in raw.split(",") if f.strip()}
+    if not wanted:
+        raise ValueError(f"fields must name at least one of: {', '.join(allowed)}")
+    unknown = wanted - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return [f for f in allowed if f in wanted]
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """orjson-backed provider, same output as DefaultJSONProvider."""
+
+    def __init__(self, app):
+        super().__init__(app)
+        import orjson
+
+        self._orjson = orjson
+        self._options = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def _encode(self, obj):
+        return self._orjson.dumps(obj, default=self.default, option=self._options)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return self._orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if self._app.debug:
+            return super().response(obj)    # pretty-printed
+        return self._app.response_class(self._encode(obj) + b"\n", mimetype=self.mimetype)
+
+
+def _encoders():
+    encoders = {"gzip": lambda data, level: gzip.compress(data, compresslevel=level, mtime=0)}
+    if find_spec("brotli") is not None:
+        import brotli
+
+        encoders["br"] = lambda data, level: brotli.compress(data, quality=level)
+    return encoders
+
+
+def _compress(response):
+    cfg = current_app.config
+    if (
+        response.direct_passthrough or response.is_streamed
+        or response.status_code < 200 or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+        or response.mimetype not in COMPRESSIBLE
+    ):
+        return response
+    response.vary.add("Accept-Encoding")
+    length = response.content_length
+    if length is None or length < cfg["COMPRESS_MIN_BYTES"]:
+        return response
+    encoders = current_app.extensions["compression"]
+    # brotli first when the client weighs both equally
+    encoding = request.accept_encodings.best_match([e for e in ("br", "gzip") if e in encoders])
+    if encoding is None:
+        return response
+    level = cfg["COMPRESS_BROTLI_QUALITY"] if encoding == "br" else cfg["COMPRESS_GZIP_LEVEL"]
+    response.set_data(encoders[encoding](response.get_data(), level))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_app(app):
+    provider = app.config["JSON_PROVIDER"]
+    if provider == "orjson" or (provider == "auto" and find_spec("orjson") is not None):
+        app.json = OrjsonProvider(app)
+    if app.config["COMPRESS_MIN_BYTES"]:
+        app.extensions["compression"] = _encoders()
+        app.after_request(_compress)
@@ -1,37 +1,29 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt
 from app import db
-from app.models import Role
+from app.authz.policy import admin_required
+from app.auth.revocation import revocations, revoke_users
+from app.models import Role, roles_users
 
 roles_bp = Blueprint('roles', __name__)
 
-def role_required(allowed_roles):
-    def decorator(fn):
-        @jwt_required()
-        def wrapper(*args, **kwargs):
-            claims = get_jwt()
-            user_roles = claims.get('roles', [])
-            if not any(r in user_roles for r in allowed_roles):
-                return jsonify(msg='Forbidden'), 403
-            return fn(*args, **kwargs)
-        wrapper.__name__ = fn.__name__
-        return wrapper
-    return decorator
+def _member_ids(role_id):
+    return [uid for (uid,) in db.session.query(roles_users.c.user_id)
+                                        .filter(roles_users.c.role_id == role_id)]
 
 @roles_bp.route('', methods=['GET'])
-@role_required(['Administrator', 'Super Administrator'])
+@admin_required
 def list_roles():
     roles = Role.query.order_by(Role.name).all()
     return jsonify(roles=[{'id': r.id, 'name': r.name} for r in roles]), 200
 
 @roles_bp.route('/<int:role_id>', methods=['GET'])
-@role_required(['Administrator', 'Super Administrator'])
+@admin_required
 def get_role(role_id):
     role = Role.query.get_or_404(role_id)
     return jsonify(id=role.id, name=role.name), 200
 
 @roles_bp.route('', methods=['POST'])
-@role_required(['Administrator', 'Super Administrator'])
+@admin_required
 def create_role():
     data = request.get_json() or {}
     name = data.get('name', '').strip()
@@ -46,7 +38,7 @@ def create_role():
     return jsonify(id=role.id, name=role.name), 201
 
 @roles_bp.route('/<int:role_id>', methods=['PUT'])
-@role_required(['Administrator', 'Super Administrator'])
+@admin_required
 def update_role(role_id):
     data = request.get_json() or {}
     name = data.get('name', '').strip()
@@ -59,13 +51,18 @@ def update_role(role_id):
         return jsonify(msg='Another role with that name already exists'), 400
 
     role.name = name
+    # role names are baked into access tokens
+    revoke_users(_member_ids(role_id))
     db.session.commit()
+    revocations.sync(force=True)
     return jsonify(msg='Role updated'), 200
 
 @roles_bp.route('/<int:role_id>', methods=['DELETE'])
-@role_required(['Administrator', 'Super Administrator'])
+@admin_required
 def delete_role(role_id):
     role = Role.query.get_or_404(role_id)
+    revoke_users(_member_ids(role_id))
     db.session.delete(role)
     db.session.commit()
+    revocations.sync(force=True)
     return jsonify(msg='Role deleted'), 200
@@ -0,0 +1,199 @@
+from datetime import datetime, timezone
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.authz.policy import policy, is_admin
+from app.cache import cache
+from app.models import TimeSchedule, User
+
+schedules_bp = Blueprint("schedules", __name__)
+
+def parse_datetime(value):
+    """
+    Naive UTC datetime from an ISO string, None when missing or invalid.
+    Offsets are converted, not dropped. Shared with app.events.
+    """
+    try:
+        parsed = datetime.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+    if parsed is not None and parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def _lock_slot(owner_id, location):
+    """
+    PostgreSQL: serialize bookings of one owner (and of one location) for
+    the rest of the transaction. Under READ COMMITTED two NOT EXISTS checks
+    could otherwise both pass. Locks are taken owner first, then location.
+    """
+    if db.engine.dialect.name != "postgresql":
+        return      # SQLite runs one writer at a time
+    db.session.execute(db.text("SELECT pg_advisory_xact_lock(1, :owner)"), {"owner": owner_id})
+    if location:
+        db.session.execute(db.text("SELECT pg_advisory_xact_lock(2, hashtext(:location))"),
+                           {"location": location})
+
+def _overlapping(start, end):
+    # half-open intervals: [start, end) overlaps iff a.start < b.end and a.end > b.start
+    return db.and_(TimeSchedule.start < end, TimeSchedule.end > start)
+
+def _conflicts(start, end, location=None, owner_id=None):
+    """Bookings overlapping [start, end) at `location` or for `owner_id`."""
+    clauses = []
+    if location:
+        clauses.append(TimeSchedule.location == location)
+    if owner_id:
+        clauses.append(TimeSchedule.owner_id == owner_id)
+    if not clauses:
+        return []
+    return (
+        TimeSchedule.query.filter(_overlapping(start, end), db.or_(*clauses))
+                          .order_by(TimeSchedule.start)
+                          .all()
+    )
+
+def _schedule_json(s):
+    return {
+        "id": s.id,
+        "owner_id": s.owner_id,
+        "type": s.type,
+        "start": s.start.isoformat(),
+        "end": s.end.isoformat(),
+        "location": s.location
+    }
+
+def _conflict_json(s):
+    """
+    Schedules are private to their owner and admins (see users.portfolio):
+    anyone else only learns that [start, end) is taken.
+    """
+    if s.owner_id == get_jwt_identity() or is_admin():
+        return _schedule_json(s)
+    return {"start": s.start.isoformat(), "end": s.end.isoformat()}
+
+# POST /api/schedules  { "type":"booking", "start":"2025-09-01T10:00", "end":"...", "location":"R101" }
+@schedules_bp.route("", methods=["POST"])
+@policy()
+def create_booking():
+    """
+    Book a slot. The overlap check and the insert are one
+    INSERT ... SELECT ... WHERE NOT EXISTS statement. SQLite serializes
+    writers; on PostgreSQL the statement runs under advisory locks on the
+    owner and the location, so a concurrent booking of either waits and
+    then sees this one. The ex_time_schedule_booking_overlap exclusion
+    constraint backs up the location check for type "booking".
+    """
+    data = request.get_json() or {}
+    start, end = parse_datetime(data.get("start")), parse_datetime(data.get("end"))
+    if not start or not end or start >= end:
+        return jsonify(msg="start and end must be ISO datetimes with start < end"), 400
+    owner_id = data.get("owner_id", get_jwt_identity()) if is_admin() else get_jwt_identity()
+    if owner_id != get_jwt_identity() and (
+        isinstance(owner_id, bool) or not isinstance(owner_id, int)
+        or db.session.get(User, owner_id) is None
+    ):
+        return jsonify(msg="owner_id does not exist"), 400
+    location = data.get("location") or None
+
+    free = ~db.exists().where(TimeSchedule.owner_id == owner_id, _overlapping(start, end))
+    if location:
+        free = db.and_(free, ~db.exists().where(TimeSchedule.location == location,
+                                                _overlapping(start, end)))
+    values = db.select(
+        db.literal(owner_id), db.literal(data.get("type", "booking")),
+        db.literal(start), db.literal(end), db.literal(location)
+    ).where(free)
+    stmt = db.insert(TimeSchedule).from_select(
+        ["owner_id", "type", "start", "end", "location"], values
+    )
+    try:
+        _lock_slot(owner_id, location)
+        inserted = db.session.execute(stmt).rowcount
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        inserted = 0
+    if not inserted:
+        return jsonify(
+            msg="Slot is already booked",
+            conflicts=[_conflict_json(s) for s in _conflicts(start, end, location, owner_id)]
+        ), 409
+
+    booking = (
+        TimeSchedule.query.filter_by(owner_id=owner_id, start=start, end=end)
+                          .order_by(TimeSchedule.id.desc())
+                          .first()
+    )
+    # Core insert: the portfolio tagger does not see it
+    cache.invalidate_tags(f"portfolio:{owner_id}")
+    return jsonify(_schedule_json(booking)), 201
+
+# GET /api/schedules/mine?from=...&to=...
+@schedules_bp.route("/mine", methods=["GET"])
+@policy()
+def list_my_schedules():
+    q = TimeSchedule.query.filter_by(owner_id=get_jwt_identity())
+    start, end = parse_datetime(request.args.get("from")), parse_datetime(request.args.get("to"))
+    if start and end:
+        q = q.filter(_overlapping(start, end))
+    return jsonify([_schedule_json(s) for s in q.order_by(TimeSchedule.start)]), 200
+
+# GET /api/schedules/conflicts?location=R101&owner=3&start=...&end=...
+# other users' entries come back as bare {start, end} intervals
+@schedules_bp.route("/conflicts", methods=["GET"])
+@policy()
+def check_conflicts():
+    start, end = parse_datetime(request.args.get("start")), parse_datetime(request.args.get("end"))
+    if not start or not end or start >= end:
+        return jsonify(msg="start and end must be ISO datetimes with start < end"), 400
+    conflicts = _conflicts(start, end,
+                           location=request.args.get("location"),
+                           owner_id=request.args.get("owner", type=int))
+    return jsonify(free=not conflicts, conflicts=[_conflict_json(s) for s in conflicts]), 200
+
+# GET /api/schedules/freebusy?location=R101&from=2025-09-01T00:00&to=2025-09-08T00:00
+@schedules_bp.route("/freebusy", methods=["GET"])
+@policy()
+def free_busy():
+    """Busy intervals merged in one pass over the bookings sorted by start, plus the gaps."""
+    start, end = parse_datetime(request.args.get("from")), parse_datetime(request.args.get("to"))
+    location = request.args.get("location")
+    owner = request.args.get("owner", type=int)
+    if not start or not end or start >= end:
+        return jsonify(msg="from and to must be ISO datetimes with from < to"), 400
+    if not location and not owner:
+        return jsonify(msg="location or owner is required"), 400
+
+    q = db.session.query(TimeSchedule.start, TimeSchedule.end).filter(_overlapping(start, end))
+    q = q.filter(TimeSchedule.location == location) if location else q.filter(TimeSchedule.owner_id == owner)
+
+    busy = []
+    for s, e in q.order_by(TimeSchedule.start):
+        s, e = max(s, start), min(e, end)
+        if busy and s <= busy[-1][1]:
+            busy[-1][1] = max(busy[-1][1], e)
+        else:
+            busy.append([s, e])
+
+    free, cursor = [], start
+    for s, e in busy:
+        if s > cursor:
+            free.append([cursor, s])
+        cursor = e
+    if cursor < end:
+        free.append([cursor, end])
+
+    fmt = lambda intervals: [{"start": s.isoformat(), "end": e.isoformat()} for s, e in intervals]
+    return jsonify(busy=fmt(busy), free=fmt(free)), 200
+
+@schedules_bp.route("/<int:sid>", methods=["DELETE"])
+@policy()
+def delete_schedule(sid):
+    s = TimeSchedule.query.get_or_404(sid)
+    if s.owner_id != get_jwt_identity() and not is_admin():
+        return jsonify(msg="Forbidden"), 403
+    db.session.delete(s)
+    db.session.commit()
+    return jsonify(msg="Deleted"), 200
@@ -0,0 +1,166 @@
+"""
+Lazily created, connection-pooled MinIO client.
+
+`create_app` stores a `LazyMinio` on `app.minio_client` instead of a real
+`minio.Minio`. Nothing touches the network until the first call, so worker
+boot does not depend on MinIO being up or fast:
+
+* the client and its urllib3 pool are built on first use, in the process
+  that uses them (safe with gunicorn --preload);
+* the bucket check runs once in a background thread and is retried with
+  backoff until it succeeds;
+* a connection-level error drops the client so the next call reconnects.
+
+Callables in `observers` are called as fn(operation, seconds, ok) after
+every proxied call (used by app.metrics).
+
+The MinIO SDK and urllib3 are imported by the first call, not at boot, and
+a forked child (gunicorn --preload) forgets any client its parent built.
+"""
+import functools
+import os
+import threading
+import time
+import weakref
+
+_instances = weakref.WeakSet()
+
+
+class LazyMinio:
+    def __init__(self, app):
+        self.config = app.config
+        self.logger = app.logger
+        self.bucket = app.config["MINIO_BUCKET"]
+        self.bucket_ready = False
+        self.last_error = None
+        self._client = None
+        self._lock = threading.Lock()
+        self._checking = False
+        self._next_check = 0.0
+        self._backoff = 1.0
+        self._connection_errors = (OSError,)
+        self.observers = []
+        _instances.add(self)
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._connect()
+        self._check_bucket_in_background()
+        return self._client
+
+    def _connect(self):
+        import urllib3
+        from minio import Minio
+
+        self._connection_errors = (urllib3.exceptions.HTTPError, OSError)
+
+        cfg = self.config
+        http_client = urllib3.PoolManager(
+            maxsize=cfg["MINIO_POOL_SIZE"],
+            timeout=urllib3.Timeout(
+                connect=cfg["MINIO_CONNECT_TIMEOUT"],
+                read=cfg["MINIO_READ_TIMEOUT"]
+            ),
+            retries=urllib3.Retry(
+                total=cfg["MINIO_RETRIES"],
+                backoff_factor=0.2,
+                status_forcelist=[500, 502, 503, 504]
+            )
+        )
+        return Minio(
+            endpoint=cfg["MINIO_ENDPOINT"],
+            access_key=cfg["MINIO_ROOT_USER"],
+            secret_key=cfg["MINIO_ROOT_PASSWORD"],
+            secure=cfg["MINIO_SECURE"],
+            http_client=http_client
+        )
+
+    def reset(self):
+        """Forget the current client; the next call builds a fresh one."""
+        with self._lock:
+            self._client = None
+
+    def __getattr__(self, name):
+        # proxy everything else (put_object, list_objects, ...) to the client
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            started, ok = time.perf_counter(), False
+            try:
+                result = attr(*args, **kwargs)
+                ok = True
+                return result
+            except self._connection_errors as e:
+                self.last_error = str(e)
+                self.reset()
+                raise
+            finally:
+                for observe in self.observers:
+                    observe(name, time.perf_counter() - started, ok)
+        return call
+
+    def _after_fork(self):
+        self._client = None
+        self._lock = threading.Lock()
+        self._checking = False
+
+    # --- bucket check ---
+
+    def _check_bucket_in_background(self):
+        if self.bucket_ready or self._checking or time.monotonic() < self._next_check:
+            return
+        with self._lock:
+            if self._checking:
+                return
+            self._checking = True
+        threading.Thread(target=self._ensure_bucket, name="minio-bucket-check", daemon=True).start()
+
+    def _ensure_bucket(self):
+        try:
+            client = self._client
+            if client is None:
+                return
+            if not client.bucket_exists(self.bucket):
+                client.make_bucket(self.bucket)
+            self.bucket_ready = True
+            self.last_error = None
+            self._backoff = 1.0
+            self.logger.info(f"MinIO bucket '{self.bucket}' is ready.")
+        except Exception as e:
+            self.last_error = str(e)
+            self._next_check = time.monotonic() + self._backoff
+            self._backoff = min(self._backoff * 2, self.config["MINIO_BUCKET_RETRY_MAX"])
+            self.logger.error(f"MinIO setup failed: {e}")
+            self.reset()
+        finally:
+            self._checking = False
+
+    def health(self):
+        """Probe MinIO synchronously; used by the health endpoint."""
+        started = time.monotonic()
+        try:
+            exists = self.client.bucket_exists(self.bucket)
+        except Exception as e:
+            self.last_error = str(e)
+            self.reset()
+            return {"ok": False, "error": self.last_error}
+        return {
+            "ok": exists,
+            "bucket": self.bucket,
+            "bucket_ready": self.bucket_ready,
+            "latency_ms": round((time.monotonic() - started) * 1000, 1)
+        }
+
+
+def _after_fork_in_child():
+    for client in list(_instances):
+        client._after_fork()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
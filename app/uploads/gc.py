@@ -0,0 +1,367 @@
+"""
+Garbage collection for the media bucket.
+
+Two kinds of garbage are collected:
+
+* stale rows   - MediaFile rows that no paper, patent, event or form entry
+                 points at any more, by id or by the URL of any of their
+                 versions (their objects go with them);
+* orphans      - objects in MINIO_BUCKET without a MediaFile or
+                 MediaVersion row, e.g. the row was deleted or the DB commit
+                 failed after put_object. Keys under EXPORTS_PREFIX are not
+                 media: report exports have no row and are expired by
+                 `prune_exports` (flask reports prune-exports) instead.
+
+`prune_versions` applies the version retention policy on top of that.
+
+Orphans are found with a sorted merge of the bucket listing (S3 lists keys
+in ascending order) against the object names in `media_file` and
+`media_version` read in the same order, so memory stays bounded no matter how big the bucket is. Object
+names start with a uuid4 hex prefix, so the DB collation and the byte
+order MinIO uses agree on them.
+"""
+import time
+from datetime import datetime, timedelta
+
+from minio.deleteobjects import DeleteObject
+from sqlalchemy import union
+
+from app import db
+from app.cache import invalidate_after_commit
+from app.models import (
+    MediaFile, MediaVersion, ResearchPaper, Patent, FormField, FormEntry, event_media
+)
+
+# MinIO accepts at most 1000 keys per DeleteObjects request
+MAX_BATCH = 1000
+EXPORTS_PREFIX = "reports/"     # app.reports XLSX exports
+
+
+def iter_bucket_objects(client, bucket, prefix=None, skip=(EXPORTS_PREFIX,)):
+    """Stream (object_name, last_modified) in key order, leaving out `skip` prefixes."""
+    for obj in client.list_objects(bucket, prefix=prefix, recursive=True):
+        if obj.is_dir or obj.object_name.startswith(skip):
+            continue
+        yield obj.object_name, obj.last_modified
+
+
+def iter_known_object_names(chunk=1000):
+    """Stream every object name the DB knows about, in key order."""
+    names = union(
+        db.select(MediaFile.object_name).where(MediaFile.object_name.isnot(None)),
+        db.select(MediaVersion.object_name)
+    ).subquery()
+    q = (
+        db.session.query(names.c.object_name)
+                  .order_by(names.c.object_name)
+                  .yield_per(chunk)
+    )
+    for (name,) in q:
+        yield name
+
+
+def find_orphaned_objects(objects, known_names, cutoff):
+    """
+    Sorted merge of two ascending streams. Yields names present in
+    `objects` but not in `known_names`, skipping anything modified after
+    `cutoff` (an upload may still be on its way to the DB).
+    """
+    known = iter(known_names)
+    current = next(known, None)
+    for name, last_modified in objects:
+        while current is not None and current < name:
+            current = next(known, None)
+        if current == name:
+            continue
+        if last_modified is not None and last_modified.replace(tzinfo=None) > cutoff:
+            continue
+        yield name
+
+
+def referenced_by_entries():
+    """
+    Collect MediaFile ids and URLs referenced from `file` fields of form
+    entries. Entries store either the MediaFile id or its URL (or a list of
+    either), see forms.submit_entry.
+    """
+    file_fields = {}
+    for form_id, name in db.session.query(FormField.form_id, FormField.name) \
+                                   .filter(FormField.field_type == 'file'):
+        file_fields.setdefault(form_id, []).append(name)
+
+    ids, urls = set(), set()
+    if not file_fields:
+        return ids, urls
+
+    q = (
+        db.session.query(FormEntry.form_id, FormEntry.data)
+                  .filter(FormEntry.form_id.in_(file_fields.keys()))
+                  .yield_per(1000)
+    )
+    for form_id, data in q:
+        if not isinstance(data, dict):
+            continue        # not an object: no named fields to look in
+        for name in file_fields[form_id]:
+            value = data.get(name)
+            for v in (value if isinstance(value, list) else [value]):
+                if isinstance(v, int):
+                    ids.add(v)
+                elif isinstance(v, str):
+                    if v.isdigit():
+                        ids.add(int(v))
+                    else:
+                        urls.add(v)
+    return ids, urls
+
+
+def media_ids_for_urls(urls, chunk=500):
+    """
+    MediaFile ids owning any of `urls`, current or not: a PUT to
+    /api/uploads/<id> moves MediaFile.url on, but an entry may still hold
+    the URL of an earlier version, which lives on in media_version.
+    """
+    urls, ids = list(urls), set()
+    for i in range(0, len(urls), chunk):
+        batch = urls[i:i + chunk]
+        ids.update(mid for (mid,) in db.session.query(MediaVersion.media_id)
+                                               .filter(MediaVersion.url.in_(batch)))
+        ids.update(mid for (mid,) in db.session.query(MediaFile.id)
+                                               .filter(MediaFile.url.in_(batch)))
+    return ids
+
+
+def iter_stale_media(cutoff, chunk=1000):
+    """
+    Stream MediaFile rows created before `cutoff` that nothing refers to.
+    Papers, patents and events are excluded in SQL; form entries are
+    checked against `referenced_by_entries`, their URLs resolved through
+    every version of a file. Rows are read in keyset pages so the caller
+    may commit deletions between pages.
+    """
+    entry_ids, entry_urls = referenced_by_entries()
+    entry_ids |= media_ids_for_urls(entry_urls)
+    last_id = 0
+    while True:
+        page = (
+            db.session.query(MediaFile.id, MediaFile.object_name)
+                      .filter(MediaFile.id > last_id)
+                      .filter(MediaFile.created_at < cutoff)
+                      .filter(~db.exists().where(ResearchPaper.file_id == MediaFile.id))
+                      .filter(~db.exists().where(Patent.file_id == MediaFile.id))
+                      .filter(~db.exists().where(event_media.c.media_id == MediaFile.id))
+                      .order_by(MediaFile.id)
+                      .limit(chunk)
+                      .all()
+        )
+        if not page:
+            return
+        last_id = page[-1][0]
+        for mid, name in page:
+            if mid in entry_ids:
+                continue
+            yield mid, name
+
+
+def chunked(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Throttle:
+    """Keep the average deletion rate at or below `rate` items/second."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.started = time.monotonic()
+        self.done = 0
+
+    def wait(self, n):
+        self.done += n
+        if not self.rate:
+            return
+        ahead = self.done / self.rate - (time.monotonic() - self.started)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+def remove_objects(client, bucket, names, batch_size, throttle, logger):
+    """Bulk-delete `names`; returns (deleted, failed)."""
+    deleted = failed = 0
+    for batch in chunked(names, min(batch_size, MAX_BATCH)):
+        errors = list(client.remove_objects(bucket, [DeleteObject(n) for n in batch]))
+        for err in errors:
+            logger.error(f"GC: could not remove {err.name}: {err.message}")
+        failed += len(errors)
+        deleted += len(batch) - len(errors)
+        throttle.wait(len(batch))
+    return deleted, failed
+
+
+def collect(client, bucket, logger, dry_run=True, grace=timedelta(hours=24),
+            batch_size=500, rate=200, rows=True, objects=True, echo=lambda msg: None):
+    """
+    Run one GC pass and return a report dict. With `dry_run` nothing is
+    deleted and every candidate is passed to `echo` instead.
+    """
+    cutoff = datetime.utcnow() - grace
+    throttle = Throttle(rate)
+    report = {
+        'dry_run': dry_run,
+        'cutoff': cutoff.isoformat(),
+        'stale_rows': 0,
+        'orphaned_objects': 0,
+        'deleted_objects': 0,
+        'failed_objects': 0,
+    }
+
+    if rows:
+        for batch in chunked(iter_stale_media(cutoff), batch_size):
+            report['stale_rows'] += len(batch)
+            if dry_run:
+                for mid, name in batch:
+                    echo(f"stale media_file id={mid} object={name}")
+                continue
+            ids = [mid for mid, _ in batch]
+            names = {name for _, name in batch if name}
+            names.update(
+                name for (name,) in db.session.query(MediaVersion.object_name)
+                                              .filter(MediaVersion.media_id.in_(ids))
+            )
+            owners = {
+                uid for (uid,) in db.session.query(MediaFile.uploaded_by)
+                                            .filter(MediaFile.id.in_(ids))
+                if uid is not None
+            }
+            # bulk deletes skip the MediaFile tagger (app.users.portfolio)
+            invalidate_after_commit(
+                db.session, *(f"media:{mid}" for mid in ids), *(f"portfolio:{uid}" for uid in owners)
+            )
+            MediaVersion.query.filter(MediaVersion.media_id.in_(ids)).delete(synchronize_session=False)
+            MediaFile.query.filter(MediaFile.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            deleted, failed = remove_objects(client, bucket, names, batch_size, throttle, logger)
+            report['deleted_objects'] += deleted
+            report['failed_objects'] += failed
+
+    if objects:
+        orphans = find_orphaned_objects(
+            iter_bucket_objects(client, bucket), iter_known_object_names(), cutoff
+        )
+        if dry_run:
+            for name in orphans:
+                report['orphaned_objects'] += 1
+                echo(f"orphaned object {name}")
+        else:
+            def counted(names):
+                for name in names:
+                    report['orphaned_objects'] += 1
+                    yield name
+            deleted, failed = remove_objects(
+                client, bucket, counted(orphans), batch_size, throttle, logger
+            )
+            report['deleted_objects'] += deleted
+            report['failed_objects'] += failed
+
+    logger.info(f"GC finished: {report}")
+    return report
+
+
+def prune_versions(client, bucket, logger, keep, cutoff, dry_run=True,
+                   batch_size=500, rate=200, echo=lambda msg: None):
+    """
+    Delete every version beyond the newest `keep` of each file that was
+    created before `cutoff`, one bulk DELETE per batch, then remove the
+    objects no remaining version or file still points at. The current
+    version is always the newest, so it is never pruned.
+    """
+    throttle = Throttle(rate)
+    report = {
+        'dry_run': dry_run,
+        'cutoff': cutoff.isoformat(),
+        'pruned_versions': 0,
+        'deleted_objects': 0,
+        'failed_objects': 0,
+    }
+    ranked = db.session.query(
+        MediaVersion.id,
+        MediaVersion.media_id,
+        MediaVersion.version,
+        MediaVersion.object_name,
+        MediaVersion.created_at,
+        db.func.row_number().over(
+            partition_by=MediaVersion.media_id,
+            order_by=MediaVersion.version.desc()
+        ).label('rank')
+    ).subquery()
+
+    last_id = 0
+    while True:
+        page = (
+            db.session.query(ranked.c.id, ranked.c.media_id, ranked.c.version, ranked.c.object_name)
+                      .filter(ranked.c.id > last_id)
+                      .filter(ranked.c.rank > keep)
+                      .filter(ranked.c.created_at < cutoff)
+                      .order_by(ranked.c.id)
+                      .limit(batch_size)
+                      .all()
+        )
+        if not page:
+            break
+        last_id = page[-1][0]
+        report['pruned_versions'] += len(page)
+        if dry_run:
+            for _, mid, version, name in page:
+                echo(f"prune media_file id={mid} version={version} object={name}")
+            continue
+
+        ids = [vid for vid, _, _, _ in page]
+        names = {name for _, _, _, name in page}
+        MediaVersion.query.filter(MediaVersion.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+
+        # objects shared with a surviving version (dedup) must stay
+        still_used = {
+            name for (name,) in db.session.query(MediaVersion.object_name)
+                                          .filter(MediaVersion.object_name.in_(names))
+        } | {
+            name for (name,) in db.session.query(MediaFile.object_name)
+                                          .filter(MediaFile.object_name.in_(names))
+        }
+        deleted, failed = remove_objects(
+            client, bucket, sorted(names - still_used), batch_size, throttle, logger
+        )
+        report['deleted_objects'] += deleted
+        report['failed_objects'] += failed
+
+    logger.info(f"Version prune finished: {report}")
+    return report
+
+
+def prune_exports(client, bucket, logger, cutoff, dry_run=True,
+                  batch_size=500, rate=200, echo=lambda msg: None):
+    """Delete report exports last modified before `cutoff`."""
+    throttle = Throttle(rate)
+    report = {'dry_run': dry_run, 'cutoff': cutoff.isoformat(), 'expired_exports': 0,
+              'deleted_objects': 0, 'failed_objects': 0}
+
+    def expired():
+        for name, last_modified in iter_bucket_objects(client, bucket, prefix=EXPORTS_PREFIX, skip=()):
+            if last_modified is None or last_modified.replace(tzinfo=None) < cutoff:
+                report['expired_exports'] += 1
+                yield name
+
+    if dry_run:
+        for name in expired():
+            echo(f"expired export {name}")
+    else:
+        deleted, failed = remove_objects(client, bucket, expired(), batch_size, throttle, logger)
+        report['deleted_objects'] += deleted
+        report['failed_objects'] += failed
+    logger.info(f"Export prune finished: {report}")
+    return report
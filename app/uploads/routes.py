@@ -1,49 +1,109 @@
+import json
+import hashlib
+import tempfile
+from datetime import datetime, timedelta
 from uuid import uuid4
+import click
 from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.exc import IntegrityError
 from werkzeug.utils import secure_filename
 
 from app import db
-from app.models import MediaFile
+from app.authz.policy import policy, is_admin
+from app.ratelimit import rate_limit, concurrency_limit
+from app.models import MediaFile, MediaVersion
 
 uploads_bp = Blueprint("uploads", __name__)
 
 # allowed extensions
 ALLOWED = {"pdf", "docx", "txt", "jpg", "jpeg", "png", "mp3", "wav", "mp4"}
 
+# uploads larger than this are spooled to disk while hashing
+SPOOL_MAX = 8 * 1024 * 1024
+CHUNK = 1024 * 1024
+
+def _allowed(filename):
+    return filename.rsplit(".", 1)[-1].lower() in ALLOWED
+
+def _spool(file):
+    """Copy the upload to a temp file; returns (fh, size, sha256 hexdigest)."""
+    digest = hashlib.sha256()
+    fh = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX)
+    for chunk in iter(lambda: file.stream.read(CHUNK), b""):
+        digest.update(chunk)
+        fh.write(chunk)
+    size = fh.tell()
+    fh.seek(0)
+    return fh, size, digest.hexdigest()
+
+def _object_url(obj_name):
+    # construct a public URL (assumes MinIO is fronted by HTTP)
+    endpoint = current_app.config["MINIO_ENDPOINT"]
+    secure = current_app.config["MINIO_SECURE"]
+    scheme = "https" if secure else "http"
+    return f"{scheme}://{endpoint}/{current_app.config['MINIO_BUCKET']}/{obj_name}"
+
+def _put(fh, size, filename, content_type):
+    obj_name = f"{uuid4().hex}_{filename}"
+    current_app.minio_client.put_object(
+        current_app.config["MINIO_BUCKET"], obj_name, fh, size,
+        content_type=content_type
+    )
+    return obj_name
+
+def _version_json(v):
+    return {
+        "version":      v.version,
+        "filename":     v.filename,
+        "content_type": v.content_type,
+        "url":          v.url,
+        "size":         v.size,
+        "checksum":     v.checksum,
+        "meta":         v.meta,
+        "uploaded_by":  v.uploaded_by,
+        "created_at":   v.created_at.isoformat() if v.created_at else None
+    }
+
+def _add_version(mf, **fields):
+    """Append a version to `mf` and make it the current one."""
+    v = MediaVersion(media_id=mf.id, version=(mf.version or 1) + 1, **fields)
+    db.session.add(v)
+    mf.version = v.version
+    mf.filename = v.filename
+    mf.content_type = v.content_type
+    mf.url = v.url
+    mf.object_name = v.object_name
+    mf.size = v.size
+    mf.meta = v.meta
+    return v
+
 @uploads_bp.route("", methods=["POST"])
-@jwt_required()
+@rate_limit(5)
+@policy()
+@concurrency_limit("upload")
 def upload_file():
     file = request.files.get("file")
     if not file:
         return jsonify(msg="No file provided"), 400
 
     # simple extension check
-    ext = file.filename.rsplit(".", 1)[-1].lower()
-    if ext not in ALLOWED:
+    if not _allowed(file.filename):
         return jsonify(msg="Type not allowed"), 400
 
     filename = secure_filename(file.filename)
-    obj_name = f"{uuid4().hex}_{filename}"
-
-    minio_client = current_app.minio_client
-    bucket = current_app.config["MINIO_BUCKET"]
+    fh, size, checksum = _spool(file)
 
     # stream upload
     try:
-        minio_client.put_object(
-            bucket, obj_name, file.stream, file.content_length,
-            content_type=file.mimetype
-        )
+        obj_name = _put(fh, size, filename, file.mimetype)
     except Exception as e:
         current_app.logger.error(f"MinIO upload failed: {e}")
         return jsonify(msg="Upload failed"), 500
+    finally:
+        fh.close()
 
-    # construct a public URL (assumes MinIO is fronted by HTTP)
-    endpoint = current_app.config["MINIO_ENDPOINT"]
-    secure = current_app.config["MINIO_SECURE"]
-    scheme = "https" if secure else "http"
-    url = f"{scheme}://{endpoint}/{bucket}/{obj_name}"
+    url = _object_url(obj_name)
 
     # TODO: extract metadata (EXIF, PDF info) here
     metadata = {}
@@ -53,11 +113,193 @@ def upload_file():
         filename=filename,
         content_type=file.mimetype,
         url=url,
-        size=file.content_length,
-        metadata=metadata,
-        uploaded_by=get_jwt_identity()
+        object_name=obj_name,
+        size=size,
+        meta=metadata,
+        uploaded_by=get_jwt_identity(),
+        version=1
     )
+    mf.versions.append(MediaVersion(
+        version=1,
+        filename=filename,
+        content_type=file.mimetype,
+        url=url,
+        object_name=obj_name,
+        size=size,
+        checksum=checksum,
+        meta=metadata,
+        uploaded_by=mf.uploaded_by
+    ))
     db.session.add(mf)
     db.session.commit()
 
     return jsonify(id=mf.id, url=mf.url), 201
+
+# PUT /api/uploads/<mid>  (multipart "file") - store a new version
+@uploads_bp.route("/<int:mid>", methods=["PUT"])
+@rate_limit(5)
+@policy()
+@concurrency_limit("upload")
+def replace_file(mid):
+    mf = MediaFile.query.get_or_404(mid)
+    uid = get_jwt_identity()
+    if mf.uploaded_by != uid and not is_admin():
+        return jsonify(msg="Forbidden"), 403
+
+    file = request.files.get("file")
+    if not file:
+        return jsonify(msg="No file provided"), 400
+    if not _allowed(file.filename):
+        return jsonify(msg="Type not allowed"), 400
+
+    filename = secure_filename(file.filename)
+    fh, size, checksum = _spool(file)
+    try:
+        # identical bytes already stored for this file: point at them
+        same = MediaVersion.query.filter_by(media_id=mid, checksum=checksum).first()
+        if same:
+            obj_name, url = same.object_name, same.url
+        else:
+            try:
+                obj_name = _put(fh, size, filename, file.mimetype)
+            except Exception as e:
+                current_app.logger.error(f"MinIO upload failed: {e}")
+                return jsonify(msg="Upload failed"), 500
+            url = _object_url(obj_name)
+    finally:
+        fh.close()
+
+    v = _add_version(
+        mf,
+        filename=filename,
+        content_type=file.mimetype,
+        url=url,
+        object_name=obj_name,
+        size=size,
+        checksum=checksum,
+        meta=request.form.get("meta", type=json.loads) or mf.meta,
+        uploaded_by=uid
+    )
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify(msg="File was changed concurrently, retry"), 409
+    return jsonify(id=mf.id, version=v.version, url=v.url, deduplicated=bool(same)), 200
+
+# PATCH /api/uploads/<mid>  { "filename": "...", "meta": {...} } - no bytes re-uploaded
+@uploads_bp.route("/<int:mid>", methods=["PATCH"])
+@policy()
+def update_file_metadata(mid):
+    mf = MediaFile.query.get_or_404(mid)
+    uid = get_jwt_identity()
+    if mf.uploaded_by != uid and not is_admin():
+        return jsonify(msg="Forbidden"), 403
+
+    data = request.get_json() or {}
+    filename = secure_filename(data.get("filename", mf.filename))
+    if not filename or not _allowed(filename):
+        return jsonify(msg="Type not allowed"), 400
+
+    current = MediaVersion.query.filter_by(media_id=mid, version=mf.version).first()
+    v = _add_version(
+        mf,
+        filename=filename,
+        content_type=data.get("content_type", mf.content_type),
+        url=mf.url,
+        object_name=mf.object_name,
+        size=mf.size,
+        checksum=current.checksum if current else None,
+        meta=data.get("meta", mf.meta),
+        uploaded_by=uid
+    )
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify(msg="File was changed concurrently, retry"), 409
+    return jsonify(id=mf.id, version=v.version, url=v.url), 200
+
+# GET /api/uploads/<mid>/versions
+@uploads_bp.route("/<int:mid>/versions", methods=["GET"])
+@policy()
+def list_versions(mid):
+    mf = MediaFile.query.get_or_404(mid)
+    if mf.uploaded_by != get_jwt_identity() and not is_admin():
+        return jsonify(msg="Forbidden"), 403
+    versions = (
+        MediaVersion.query.filter_by(media_id=mid)
+                          .order_by(MediaVersion.version.desc())
+                          .all()
+    )
+    return jsonify(id=mf.id, current=mf.version, versions=[_version_json(v) for v in versions]), 200
+
+# GET /api/uploads/<mid>/versions/<n>
+@uploads_bp.route("/<int:mid>/versions/<int:ver>", methods=["GET"])
+@policy()
+def get_version(mid, ver):
+    mf = MediaFile.query.get_or_404(mid)
+    if mf.uploaded_by != get_jwt_identity() and not is_admin():
+        return jsonify(msg="Forbidden"), 403
+    v = MediaVersion.query.filter_by(media_id=mid, version=ver).first_or_404()
+    return jsonify(id=mf.id, **_version_json(v)), 200
+
+
+@uploads_bp.cli.command("gc")
+@click.option("--dry-run/--execute", default=True, show_default=True,
+              help="Only report what would be deleted.")
+@click.option("--grace-hours", default=24, show_default=True,
+              help="Leave rows and objects younger than this alone.")
+@click.option("--batch-size", default=500, show_default=True,
+              help="Objects per remove_objects call (max 1000).")
+@click.option("--rate", default=200.0, show_default=True,
+              help="Max objects deleted per second, 0 for unlimited.")
+@click.option("--rows/--no-rows", default=True, help="Collect unreferenced MediaFile rows.")
+@click.option("--objects/--no-objects", default=True, help="Collect objects without a row.")
+def gc_command(dry_run, grace_hours, batch_size, rate, rows, objects):
+    """Delete orphaned MinIO objects and unreferenced MediaFile rows."""
+    from app.uploads import gc
+
+    report = gc.collect(
+        current_app.minio_client,
+        current_app.config["MINIO_BUCKET"],
+        current_app.logger,
+        dry_run=dry_run,
+        grace=timedelta(hours=grace_hours),
+        batch_size=batch_size,
+        rate=rate,
+        rows=rows,
+        objects=objects,
+        echo=click.echo,
+    )
+    click.echo(json.dumps(report, indent=2))
+
+
+@uploads_bp.cli.command("prune-versions")
+@click.option("--keep", default=5, show_default=True,
+              help="Versions to keep per file, the current one included.")
+@click.option("--older-than-days", default=30, show_default=True,
+              help="Only prune versions created before this many days ago.")
+@click.option("--dry-run/--execute", default=True, show_default=True,
+              help="Only report what would be deleted.")
+@click.option("--batch-size", default=500, show_default=True)
+@click.option("--rate", default=200.0, show_default=True,
+              help="Max objects deleted per second, 0 for unlimited.")
+def prune_versions_command(keep, older_than_days, dry_run, batch_size, rate):
+    """Apply the version retention policy to every media file."""
+    from app.uploads import gc
+
+    if keep < 1:
+        raise click.BadParameter("must keep at least the current version", param_hint="--keep")
+    report = gc.prune_versions(
+        current_app.minio_client,
+        current_app.config["MINIO_BUCKET"],
+        current_app.logger,
+        keep=keep,
+        cutoff=datetime.utcnow() - timedelta(days=older_than_days),
+        dry_run=dry_run,
+        batch_size=batch_size,
+        rate=rate,
+        echo=click.echo,
+    )
+    click.echo(json.dumps(report, indent=2))
@@ -0,0 +1,151 @@
+"""
+Bulk user import.
+
+Rows come from CSV (header: username,password,roles with roles separated
+by ';') or NDJSON ({"username", "password", "roles": [...]}). They are
+processed in chunks: one IN query finds existing usernames, passwords are
+hashed in a process pool started once for the whole import, and users
+plus their roles_users rows are inserted with two executemany statements.
+A report dict is yielded for every input row as soon as its chunk is
+committed; usernames created concurrently by someone else are reported
+as existing rather than failing the import.
+"""
+import csv
+import io
+import json
+
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.auth.passwords import batch_pool, hash_many
+from app.models import User, Role, roles_users
+
+
+def parse_csv(stream):
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    for line, row in enumerate(reader, start=2):
+        roles = [r.strip() for r in (row.get("roles") or "").split(";") if r.strip()]
+        yield line, {"username": row.get("username"), "password": row.get("password"), "roles": roles}
+
+
+def parse_ndjson(stream):
+    for line, raw in enumerate(io.TextIOWrapper(stream, encoding="utf-8"), start=1):
+        if not raw.strip():
+            continue
+        try:
+            row = json.loads(raw)
+        except ValueError:
+            yield line, {"error": "Invalid JSON"}
+            continue
+        yield line, row if isinstance(row, dict) else {"error": "Expected an object"}
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _taken(usernames):
+    return {
+        name for (name,) in db.session.query(User.username)
+                                      .filter(User.username.in_(usernames))
+    }
+
+
+def _insert(valid, role_ids):
+    """Insert (line, username, roles, hash) rows; {username: id}."""
+    created = db.session.execute(
+        db.insert(User).returning(User.id, User.username),
+        [{"username": username, "password_hash": h} for _, username, _, h in valid]
+    ).all()
+    ids = {username: uid for uid, username in created}
+    links = [
+        {"user_id": ids[username], "role_id": role_ids[r]}
+        for _, username, roles, _ in valid for r in set(roles)
+    ]
+    if links:
+        db.session.execute(roles_users.insert(), links)
+    db.session.commit()
+    return ids
+
+
+def import_users(rows, chunk_size=500, workers=None):
+    """Import (line, row) pairs; yields one report dict per row."""
+    with batch_pool(workers) as pool:
+        yield from _import(rows, chunk_size, pool)
+
+
+def _invalid(row, role_ids):
+    """Why `row` cannot be imported, or None."""
+    username, password = row.get("username"), row.get("password")
+    roles = row.get("roles") or []
+    if row.get("error"):
+        return row["error"]
+    if not isinstance(username, str) or not username.strip() or not password:
+        return "Missing username or password"
+    if not isinstance(password, str):
+        return "Password must be a string"
+    if len(username) > 80:
+        return "Username too long"
+    if not isinstance(roles, list) or not all(isinstance(r, str) for r in roles):
+        return "roles must be a list of role names"
+    unknown = [r for r in roles if r not in role_ids]
+    if unknown:
+        return f"Unknown roles: {unknown}"
+    return None
+
+
+def _import(rows, chunk_size, pool):
+    role_ids = dict(db.session.query(Role.name, Role.id).all())
+    seen = set()
+
+    for chunk in _chunks(rows, chunk_size):
+        valid, report = [], {}
+        for line, row in chunk:
+            username, password = row.get("username"), row.get("password")
+            roles = row.get("roles") or []
+            error = _invalid(row, role_ids)
+            if error:
+                report[line] = {"status": "error", "msg": error}
+            elif username in seen:
+                report[line] = {"status": "duplicate", "msg": "Repeated in this import"}
+            else:
+                seen.add(username)
+                valid.append((line, username, password, roles))
+
+        if valid:
+            existing = _taken([v[1] for v in valid])
+            for line, username, _, _ in valid:
+                if username in existing:
+                    report[line] = {"status": "exists", "msg": "Username already exists"}
+            valid = [v for v in valid if v[1] not in existing]
+
+        if valid:
+            hashes = hash_many([v[2] for v in valid], pool=pool)
+            valid = [(line, username, roles, h) for (line, username, _, roles), h in zip(valid, hashes)]
+        while valid:
+            try:
+                ids = _insert(valid, role_ids)
+            except IntegrityError:
+                # created by someone else since the existence check
+                db.session.rollback()
+                existing = _taken([v[1] for v in valid])
+                if not existing:
+                    raise
+                for line, username, _, _ in valid:
+                    if username in existing:
+                        report[line] = {"status": "exists", "msg": "Username already exists"}
+                valid = [v for v in valid if v[1] not in existing]
+                continue
+            for line, username, _, _ in valid:
+                report[line] = {"status": "created", "id": ids[username]}
+            break
+
+        for line, row in chunk:
+            yield {"line": line, "username": row.get("username"), **report[line]}
@@ -0,0 +1,152 @@
+"""
+Researcher portfolios: a user with their profile, papers, patents, awards,
+achievements, schedules and uploads as one document. The document is
+cached whole; the users routes strip schedules and uploads for anyone but
+the user and admins.
+
+`load_portfolios` assembles any number of users with a fixed number of
+queries (one per relationship via selectinload, plus one for staff and
+student profiles each and one for the MediaFiles papers and patents link
+to). Documents are cached per user and dropped by the taggers below when
+one of the rows they were built from changes.
+"""
+from sqlalchemy.orm import selectinload
+
+from app.cache import cache, register_tagger, previous_values
+from app.models import (
+    User, UserProfile, StaffProfile, StudentProfile, ResearchPaper, Patent,
+    Award, Achievement, TimeSchedule, MediaFile
+)
+
+CACHE_TTL = 600
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _file(files, file_id):
+    f = files.get(file_id)
+    return {"id": f.id, "filename": f.filename, "url": f.url} if f else None
+
+
+def _build(user, staff, student, files):
+    p = user.profile
+    return {
+        "id": user.id,
+        "username": user.username,
+        "profile": {
+            "full_name": p.full_name, "avatar_url": p.avatar_url, "bio": p.bio
+        } if p else None,
+        "staff": [
+            {"department": s.department, "expertise": s.expertise, "contact": s.contact}
+            for s in staff.get(user.id, [])
+        ],
+        "student": [
+            {"program": s.program, "year": s.year, "advisor": s.advisor}
+            for s in student.get(user.id, [])
+        ],
+        "papers": [
+            {
+                "id": pp.id, "title": pp.title, "authors": pp.authors,
+                "publication_date": _iso(pp.publication_date), "journal": pp.journal,
+                "doi": pp.doi, "file": _file(files, pp.file_id)
+            }
+            for pp in user.papers
+        ],
+        "patents": [
+            {
+                "id": pt.id, "title": pt.title, "inventors": pt.inventors,
+                "patent_number": pt.patent_number, "date": _iso(pt.date),
+                "file": _file(files, pt.file_id)
+            }
+            for pt in user.patents
+        ],
+        "awards": [
+            {"id": a.id, "name": a.name, "date": _iso(a.date), "awarding_body": a.awarding_body}
+            for a in user.awards
+        ],
+        "achievements": [
+            {"id": a.id, "title": a.title, "description": a.description}
+            for a in user.achievements
+        ],
+        "schedules": [
+            {"id": s.id, "type": s.type, "start": _iso(s.start), "end": _iso(s.end), "location": s.location}
+            for s in user.schedules
+        ],
+        "uploads": [
+            {"id": f.id, "filename": f.filename, "url": f.url, "version": f.version}
+            for f in user.uploaded_files
+        ]
+    }
+
+
+def _group(rows):
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row.user_id, []).append(row)
+    return grouped
+
+
+def load_portfolios(user_ids):
+    """Return {uid: document} for the existing users among `user_ids`."""
+    docs, missing = {}, []
+    for uid in user_ids:
+        doc = cache.get(f"portfolio:{uid}", None)
+        if doc is None:
+            missing.append(uid)
+        else:
+            docs[uid] = doc
+    if not missing:
+        return docs
+
+    token = cache.token()
+    users = (
+        User.query.options(
+            selectinload(User.profile),
+            selectinload(User.papers),
+            selectinload(User.patents),
+            selectinload(User.awards),
+            selectinload(User.achievements),
+            selectinload(User.schedules),
+            selectinload(User.uploaded_files)
+        )
+        .filter(User.id.in_(missing))
+        .all()
+    )
+    if not users:
+        return docs
+
+    ids = [u.id for u in users]
+    staff = _group(StaffProfile.query.filter(StaffProfile.user_id.in_(ids)))
+    student = _group(StudentProfile.query.filter(StudentProfile.user_id.in_(ids)))
+    file_ids = {
+        item.file_id for u in users for item in (*u.papers, *u.patents) if item.file_id
+    }
+    files = {
+        f.id: f for f in MediaFile.query.filter(MediaFile.id.in_(file_ids))
+    } if file_ids else {}
+
+    for u in users:
+        doc = _build(u, staff, student, files)
+        linked = {f"media:{d['file']['id']}" for d in (*doc["papers"], *doc["patents"]) if d["file"]}
+        cache.set(f"portfolio:{u.id}", doc, tags={f"portfolio:{u.id}", *linked},
+                  ttl=CACHE_TTL, since=token)
+        docs[u.id] = doc
+    return docs
+
+
+def _owned_by(attr):
+    return lambda obj: {f"portfolio:{uid}" for uid in previous_values(obj, attr)}
+
+
+register_tagger(User, lambda u: {f"portfolio:{u.id}"})
+register_tagger(UserProfile, _owned_by("user_id"))
+register_tagger(StaffProfile, _owned_by("user_id"))
+register_tagger(StudentProfile, _owned_by("user_id"))
+register_tagger(ResearchPaper, _owned_by("owner_id"))
+register_tagger(Patent, _owned_by("owner_id"))
+register_tagger(Award, _owned_by("recipient_id"))
+register_tagger(Achievement, _owned_by("owner_id"))
+register_tagger(TimeSchedule, _owned_by("owner_id"))
+register_tagger(MediaFile, lambda f: {f"media:{f.id}", *_owned_by("uploaded_by")(f)})
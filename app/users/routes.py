@@ -1,37 +1,43 @@
-import functools
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+import json
+import os
+import click
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from sqlalchemy.orm import selectinload, load_only
+from flask_jwt_extended import get_jwt_identity, get_jwt
 from app import db
-from app.models import User, Role
+from app.cache import cache, register_tagger
+from app.querywatch import query_budget
+from app.responses import sparse_fields
+from app.authz.policy import policy, admin_required, is_admin, ADMIN_ROLES
+from app.auth.revocation import revocations, revoke_users
+from app.models import User, Role, StaffProfile, roles_users, event_attendee
+from app.users.portfolio import load_portfolios
 
 users_bp = Blueprint("users", __name__)
 
-def role_required(allowed_roles):
-    def decorator_factory(fn):
-        @functools.wraps(fn)
-        @jwt_required()
-        def wrapper(*args, **kwargs):
-            claims = get_jwt()
-            user_roles = claims.get('roles', [])
-            if not any(r in allowed_roles for r in user_roles):
-                return jsonify(msg='Forbidden'), 403
-            return fn(*args, **kwargs)
-        return wrapper
-    return decorator_factory
-# GET /api/users?page=1&per_page=10
+USER_FIELDS = ('id', 'username', 'roles')
+
+# GET /api/users?page=1&per_page=10&fields=id,username
 @users_bp.route('', methods=['GET'])
-@role_required(['Administrator', 'Super Administrator'])
+@query_budget(4)
+@admin_required
 def list_users():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
-    pagination = User.query.order_by(User.id).paginate(page=page, per_page=per_page, error_out=False)
+    try:
+        fields = sparse_fields(USER_FIELDS)
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
+    query = User.query.options(load_only(User.id, User.username))
+    if 'roles' in fields:
+        query = query.options(selectinload(User.roles))
+    pagination = query.order_by(User.id).paginate(page=page, per_page=per_page, error_out=False)
     data = []
     for u in pagination.items:
-        data.append({
-            'id': u.id,
-            'username': u.username,
-            'roles': [r.name for r in u.roles]
-        })
+        user = {'id': u.id, 'username': u.username}
+        if 'roles' in fields:
+            user['roles'] = [r.name for r in u.roles]
+        data.append({f: user[f] for f in fields})
     return jsonify(
         users=data,
         page=pagination.page,
@@ -40,8 +46,57 @@ def list_users():
         total_pages=pagination.pages
     ), 200
 
+def _like_escape(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def _username_search(q, match):
+    if match == 'substring':
+        # served by the pg_trgm GIN index on PostgreSQL
+        return User.username.ilike(f"%{_like_escape(q)}%", escape='\\')
+    if db.engine.dialect.name == 'postgresql':
+        # rewritten to a range scan on ix_user_username_pattern (text_pattern_ops)
+        return User.username.like(f"{_like_escape(q)}%", escape='\\')
+    # SQLite's LIKE is case-insensitive and cannot use the unique index; a range can
+    return db.and_(User.username >= q, User.username < q + '\U0010ffff')
+
+# GET /api/users/directory?q=ann&match=prefix|substring&role=Staff&cursor=120&limit=50
+@users_bp.route('/directory', methods=['GET'])
+@query_budget(3)
+@admin_required
+def user_directory():
+    """
+    Keyset-paginated user directory: pass `next_cursor` from the previous
+    page as `cursor`. Every page costs two queries (users, then their roles).
+    """
+    q      = request.args.get('q', '').strip()
+    match  = request.args.get('match', 'prefix')
+    role   = request.args.get('role')
+    cursor = request.args.get('cursor', 0, type=int)
+    limit  = min(max(request.args.get('limit', 50, type=int), 1), 200)
+    if match not in ('prefix', 'substring'):
+        return jsonify(msg="match must be 'prefix' or 'substring'"), 400
+
+    query = User.query.options(selectinload(User.roles)).filter(User.id > cursor)
+    if role:
+        role_id = db.select(Role.id).where(Role.name == role).scalar_subquery()
+        query = query.join(roles_users, roles_users.c.user_id == User.id) \
+                     .filter(roles_users.c.role_id == role_id)
+    if q:
+        query = query.filter(_username_search(q, match))
+
+    users = query.order_by(User.id).limit(limit + 1).all()
+    has_more = len(users) > limit
+    users = users[:limit]
+    return jsonify(
+        users=[
+            {'id': u.id, 'username': u.username, 'roles': [r.name for r in u.roles]}
+            for u in users
+        ],
+        next_cursor=users[-1].id if has_more else None
+    ), 200
+
 @users_bp.route("/me", methods=["GET"])
-@jwt_required()
+@policy()
 def get_current_user():
     """Get current user's information"""
     current_user_id = get_jwt_identity()
@@ -59,23 +114,79 @@ def get_current_user():
 
 # GET /api/users/<uid>
 @users_bp.route('/<int:uid>', methods=['GET'])
-@jwt_required()
+@query_budget(3)
+@policy(roles=ADMIN_ROLES, self_arg='uid')
 def get_user(uid):
-    current = get_jwt_identity()
-    claims = get_jwt()
-    is_admin = any(r in ['Administrator','Super Administrator'] for r in claims.get('roles', []))
-    if uid != current and not is_admin:
-        return jsonify(msg='Forbidden'), 403
-    user = User.query.get_or_404(uid)
+    doc = cache.get(f'user:{uid}', None)
+    if doc is None:
+        token = cache.token()
+        user = User.query.get_or_404(uid)
+        doc = dict(
+            id=user.id,
+            username=user.username,
+            roles=[r.name for r in user.roles]
+        )
+        # a renamed or deleted role changes the document too
+        tags = {f'user:{uid}', *(f'role:{r.id}' for r in user.roles)}
+        cache.set(f'user:{uid}', doc, tags=tags, since=token)
+    return jsonify(doc), 200
+
+def _portfolio_view(doc):
+    # schedules and uploaded files are private to the user and admins
+    if doc['id'] == get_jwt_identity() or is_admin():
+        return doc
+    return {k: v for k, v in doc.items() if k not in ('schedules', 'uploads')}
+
+# GET /api/users/<uid>/portfolio
+@users_bp.route('/<int:uid>/portfolio', methods=['GET'])
+@query_budget(12)
+@policy()
+def get_portfolio(uid):
+    doc = load_portfolios([uid]).get(uid)
+    if doc is None:
+        return jsonify(msg='User not found'), 404
+    return jsonify(_portfolio_view(doc)), 200
+
+# GET /api/users/portfolios?ids=1,2,3  or  ?department=Physics&cursor=120&limit=50
+@users_bp.route('/portfolios', methods=['GET'])
+@query_budget(12)
+@policy()
+def list_portfolios():
+    """
+    Portfolios of the listed users, or a page of a department's staff:
+    pass `next_cursor` from the previous page as `cursor`.
+    """
+    department = request.args.get('department')
+    try:
+        ids = [int(i) for i in request.args.get('ids', '').split(',') if i.strip()]
+    except ValueError:
+        return jsonify(msg='ids must be a comma separated list of integers'), 400
+    if len(ids) > 200:
+        return jsonify(msg='At most 200 ids per request'), 400
+    next_cursor = None
+    if department:
+        cursor = request.args.get('cursor', 0, type=int)
+        limit  = min(max(request.args.get('limit', 50, type=int), 1), 200)
+        staff = [uid for (uid,) in db.session.query(StaffProfile.user_id)
+                                             .filter(StaffProfile.department == department,
+                                                     StaffProfile.user_id > cursor)
+                                             .distinct()
+                                             .order_by(StaffProfile.user_id)
+                                             .limit(limit + 1)]
+        if len(staff) > limit:
+            staff = staff[:limit]
+            next_cursor = staff[-1]
+        ids += staff
+    ids = list(dict.fromkeys(ids))
+    docs = load_portfolios(ids)
     return jsonify(
-        id=user.id,
-        username=user.username,
-        roles=[r.name for r in user.roles]
+        portfolios=[_portfolio_view(docs[uid]) for uid in ids if uid in docs],
+        next_cursor=next_cursor
     ), 200
 
 # POST /api/users
 @users_bp.route('', methods=['POST'])
-@role_required(['Administrator', 'Super Administrator'])
+@admin_required
 def create_user():
     data = request.get_json()
     username = data.get('username')
@@ -94,28 +205,52 @@ def create_user():
     db.session.commit()
     return jsonify(id=user.id), 201
 
+# POST /api/users/import  (text/csv or application/x-ndjson body)
+@users_bp.route('/import', methods=['POST'])
+@admin_required
+def import_users():
+    """
+    Bulk-create users. Streams back one NDJSON line per input row
+    ({line, username, status, id|msg}) followed by a summary line.
+    """
+    from app.users import bulk
+
+    fmt = request.args.get('format') or (
+        'csv' if request.mimetype in ('text/csv', 'application/csv') else 'ndjson'
+    )
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify(msg="format must be 'csv' or 'ndjson'"), 400
+    parse = bulk.parse_csv if fmt == 'csv' else bulk.parse_ndjson
+    # every request starts its own pool: keep it small
+    workers = min(current_app.config['USER_IMPORT_HASH_WORKERS'], os.cpu_count() or 1)
+
+    def generate():
+        counts = {}
+        for row in bulk.import_users(parse(request.stream), workers=workers):
+            counts[row['status']] = counts.get(row['status'], 0) + 1
+            yield json.dumps(row) + '\n'
+        yield json.dumps({'summary': counts}) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 # PUT /api/users/<uid>
 @users_bp.route('/<int:uid>', methods=['PUT'])
-@jwt_required()
+@policy(roles=ADMIN_ROLES, self_arg='uid')
 def update_user(uid):
-    current = get_jwt_identity()
-    claims  = get_jwt()
-    user    = User.query.get_or_404(uid)
     # Only the user themselves or an admin can update
-    is_self  = (current == uid)
-    is_admin = any(r.name in ['Administrator','Super Administrator'] for r in user.roles) \
-               or any(r in claims.get('roles', []) for r in ['Administrator','Super Administrator'])
-    if not (is_self or is_admin):
-        return jsonify(msg="Forbidden"), 403
+    user    = User.query.get_or_404(uid)
 
     data = request.get_json()
+    revoke = None
     if 'username' in data:
         user.username = data['username']
+        revoke = 'access'
     if 'password' in data:
         user.set_password(data['password'])
+        revoke = 'all'
 
     # Update roles (only admins)
-    if is_admin and 'roles' in data:
+    if is_admin() and 'roles' in data:
         # Expecting data['roles'] to be a list of role names
         if not isinstance(data['roles'], list) or not all(isinstance(r, str) for r in data['roles']):
             return jsonify(msg="Invalid roles format"), 400
@@ -126,20 +261,48 @@ def update_user(uid):
             return jsonify(msg=f"Unknown roles: {', '.join(missing)}"), 400
 
         user.roles = roles
+        revoke = revoke or 'access'
 
+    # tokens carrying the old username/roles (or password) stop working now
+    if revoke:
+        revoke_users([uid], scope=revoke)
     db.session.commit()
+    if revoke:
+        revocations.sync(force=True)
     return jsonify(msg="User updated"), 200
 
 # DELETE /api/users/<uid>
 @users_bp.route('/<int:uid>', methods=['DELETE'])
-@jwt_required()
+@policy(roles=ADMIN_ROLES, self_arg='uid')
 def delete_user(uid):
-    current = get_jwt_identity()
-    claims = get_jwt()
-    is_admin = any(r in ['Administrator','Super Administrator'] for r in claims.get('roles', []))
-    if uid != current and not is_admin:
-        return jsonify(msg='Forbidden'), 403
     user = User.query.get_or_404(uid)
+    # ON DELETE CASCADE too, but SQLite only enforces it with foreign_keys=ON
+    db.session.execute(event_attendee.delete().where(event_attendee.c.user_id == uid))
     db.session.delete(user)
+    revoke_users([uid], scope='all')
     db.session.commit()
+    revocations.sync(force=True)
     return jsonify(msg='User deleted'), 200
+
+# cached user documents (get_user) follow the user and their roles
+register_tagger(User, lambda u: {f'user:{u.id}'})
+register_tagger(Role, lambda r: {f'role:{r.id}'})
+
+@users_bp.cli.command("import")
+@click.argument("file", type=click.File("rb"))
+@click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]), default=None,
+              help="Defaults to the file extension.")
+@click.option("--workers", default=0, help="Hashing processes, 0 = all cores.")
+@click.option("--chunk-size", default=500, show_default=True)
+def import_users_command(file, fmt, workers, chunk_size):
+    """Bulk-create users from a CSV or NDJSON file."""
+    from app.users import bulk
+
+    fmt = fmt or ("csv" if file.name.endswith(".csv") else "ndjson")
+    parse = bulk.parse_csv if fmt == "csv" else bulk.parse_ndjson
+    counts = {}
+    for row in bulk.import_users(parse(file), chunk_size=chunk_size,
+                                 workers=workers or os.cpu_count()):
+        counts[row["status"]] = counts.get(row["status"], 0) + 1
+        click.echo(json.dumps(row))
+    click.echo(json.dumps({"summary": counts}))
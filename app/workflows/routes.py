@@ -1,38 +1,45 @@
 from datetime import datetime
 from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.orm import load_only
 from app import db
+from app.cache import cache, register_tagger
+from app.database import use_primary
+from app.querywatch import query_budget
+from app.responses import sparse_fields
+from app.authz.policy import policy, admin_required, is_admin, has_any_role
 from app.models import WorkflowDefinition, WorkflowInstance, Notification
 
 workflows_bp = Blueprint('workflows', __name__)
 
+DEFINITION_FIELDS = ('id', 'name', 'steps')
+
 # --- Admin: CRUD on workflow templates ---
+# GET /api/workflows?fields=id,name
 @workflows_bp.route('', methods=['GET'])
-@jwt_required()
+@query_budget(2)
+@admin_required
 def list_definitions():
-    claims = get_jwt()
-    if 'Administrator' not in claims.get('roles', []):
-        return jsonify(msg='Forbidden'), 403
-    defs = WorkflowDefinition.query.all()
-    return jsonify([ { 'id': w.id, 'name': w.name, 'steps': w.steps } for w in defs ])
+    try:
+        fields = sparse_fields(DEFINITION_FIELDS)
+    except ValueError as e:
+        return jsonify(msg=str(e)), 400
+    defs = WorkflowDefinition.query.options(
+        load_only(*(getattr(WorkflowDefinition, f) for f in fields))
+    ).all()
+    return jsonify([ { f: getattr(w, f) for f in fields } for w in defs ])
 
 @workflows_bp.route('', methods=['POST'])
-@jwt_required()
+@admin_required
 def create_definition():
-    claims = get_jwt()
-    if 'Administrator' not in claims.get('roles', []):
-        return jsonify(msg='Forbidden'), 403
     data = request.get_json()
     w = WorkflowDefinition(name=data['name'], steps=data['steps'])
     db.session.add(w); db.session.commit()
     return jsonify(id=w.id), 201
 
 @workflows_bp.route('/<int:wfid>', methods=['PUT'])
-@jwt_required()
+@admin_required
 def update_definition(wfid):
-    claims = get_jwt()
-    if 'Administrator' not in claims.get('roles', []):
-        return jsonify(msg='Forbidden'), 403
     data = request.get_json()
     w = WorkflowDefinition.query.get_or_404(wfid)
     w.name = data.get('name', w.name)
@@ -41,29 +48,33 @@ def update_definition(wfid):
     return jsonify(msg='Updated'), 200
 
 @workflows_bp.route('/<int:wfid>', methods=['DELETE'])
-@jwt_required()
+@admin_required
 def delete_definition(wfid):
-    claims = get_jwt()
-    if 'Administrator' not in claims.get('roles', []):
-        return jsonify(msg='Forbidden'), 403
     w = WorkflowDefinition.query.get_or_404(wfid)
     db.session.delete(w); db.session.commit()
     return jsonify(msg='Deleted'), 200
 
 # GET /api/workflows/<wfid>
 @workflows_bp.route('/<int:wfid>', methods=['GET'])
-@jwt_required()
+@query_budget(2)
+@policy()
 def get_definition(wfid):
-    w = WorkflowDefinition.query.get_or_404(wfid)
-    return jsonify({
-        'id':    w.id,
-        'name':  w.name,
-        'steps': w.steps
-    }), 200
+    doc = cache.get(f'workflow:{wfid}', None)
+    if doc is None:
+        token = cache.token()
+        w = WorkflowDefinition.query.get_or_404(wfid)
+        doc = {
+            'id':    w.id,
+            'name':  w.name,
+            'steps': w.steps
+        }
+        cache.set(f'workflow:{wfid}', doc, tags={f'workflow:{wfid}'}, since=token)
+    return jsonify(doc), 200
 
 # Start a workflow instance on an entity
 @workflows_bp.route('/<int:wfid>/instances', methods=['POST'])
-@jwt_required()
+@query_budget(4)
+@policy()
 def start_instance(wfid):
     data = request.get_json()
     uid  = get_jwt_identity()
@@ -91,13 +102,9 @@ def start_instance(wfid):
     return jsonify(id=inst.id), 200
 
 @workflows_bp.route('/<int:wfid>/instances', methods=['GET'])
-@jwt_required()
+@query_budget(2)
+@admin_required  # only admins should see all instances
 def list_instances_for_definition(wfid):
-    # only admins should see all instances
-    claims = get_jwt()
-    if 'Administrator' not in claims.get('roles', []) and \
-       'Super Administrator' not in claims.get('roles', []):
-        return jsonify(msg='Forbidden'), 403
 
     # fetch all instances for this workflow
     insts = WorkflowInstance.query.filter_by(workflow_id=wfid).all()
@@ -114,38 +121,40 @@ def list_instances_for_definition(wfid):
 
 
 @workflows_bp.route('/instances/tasks', methods=['GET'])
-@jwt_required()
+@query_budget(5)
+@use_primary    # creates missing instances
+@policy()
 def list_my_tasks():
     uid   = get_jwt_identity()
-    roles = get_jwt().get('roles', [])
 
-    tasks = []
-    # Fetch all workflow templates
+    # Fetch all workflow templates, and this user's instances of them in one query
     all_defs = WorkflowDefinition.query.all()
-
-    for wdef in all_defs:
-        wfid = wdef.id
-
-        # See if this user already has an instance for this workflow
-        inst = WorkflowInstance.query.filter_by(
-            workflow_id = wfid,
+    existing = {
+        inst.workflow_id: inst
+        for inst in WorkflowInstance.query.filter_by(
             entity_type = 'workflow',
             entity_id   = 0,
             user_id     = uid
-        ).first()
+        )
+    }
+
+    mine = []
+    created = False
+    for wdef in all_defs:
+        inst = existing.get(wdef.id)
 
         # Determine if this user should have an instance at all
         # either because they’re the owner (starter), or appear in any step’s assign lists:
         any_assigned = any(
             uid in s.get('assign_users', []) or
-            any(r in roles for r in s.get('assign_roles', []))
+            has_any_role(s.get('assign_roles', []))
             for s in wdef.steps
         )
 
         # If they should but don’t yet have one, create it
         if any_assigned and not inst:
             inst = WorkflowInstance(
-                workflow_id  = wfid,
+                workflow_id  = wdef.id,
                 entity_type  = 'workflow',
                 entity_id    = 0,
                 user_id      = uid,
@@ -153,42 +162,50 @@ def list_my_tasks():
                 state        = wdef.steps[0]['name']
             )
             db.session.add(inst)
-            db.session.commit()
+            created = True
 
         # If they own an instance (or we just created one), show it
         if inst:
-            tasks.append({
-                'workflow_id':    wfid,
-                'instance_id':    inst.id,
-                'workflow_name':  wdef.name,
-                'step':           inst.state,
-                'current_step':   inst.current_step,
-                'entity_type':    inst.entity_type,
-                'entity_id':      inst.entity_id
-            })
+            mine.append((wdef, inst))
+
+    if created:
+        db.session.flush()   # assign ids; committed below, after serializing
+    tasks = [
+        {
+            'workflow_id':    wdef.id,
+            'instance_id':    inst.id,
+            'workflow_name':  wdef.name,
+            'step':           inst.state,
+            'current_step':   inst.current_step,
+            'entity_type':    inst.entity_type,
+            'entity_id':      inst.entity_id
+        }
+        for wdef, inst in mine
+    ]
+    if created:
+        db.session.commit()
 
     return jsonify(tasks), 200
 
 @workflows_bp.route('/instances/<int:iid>', methods=['GET'])
-@jwt_required()
+@query_budget(3)
+@policy()
 def get_instance(iid):
     inst  = WorkflowInstance.query.get_or_404(iid)
     uid   = get_jwt_identity()
-    roles = get_jwt().get('roles', [])
 
     # Authorization: allow the starter, any assigned user/role, or admins
     wdef  = WorkflowDefinition.query.get(inst.workflow_id)
     step  = wdef.steps[inst.current_step]
     is_owner          = (inst.user_id == uid)
     is_assigned_user  = uid in step.get('assign_users', [])
-    is_assigned_role  = any(r in roles for r in step.get('assign_roles', []))
-    is_admin          = any(r in ['Administrator','Super Administrator'] for r in roles)
+    is_assigned_role  = has_any_role(step.get('assign_roles', []))
     any_step_assigned = any(
-       uid in s.get('assign_users', []) or 
-       any(r in roles for r in s.get('assign_roles', []))
+       uid in s.get('assign_users', []) or
+       has_any_role(s.get('assign_roles', []))
        for s in wdef.steps
     )
-    if not (is_owner or is_assigned_user or is_assigned_role or is_admin or any_step_assigned):
+    if not (is_owner or is_assigned_user or is_assigned_role or is_admin() or any_step_assigned):
         return jsonify(msg='Forbidden'), 403
 
     return jsonify({
@@ -204,18 +221,17 @@ def get_instance(iid):
 
 # Transition a task to next state
 @workflows_bp.route('/instances/<int:iid>/transition', methods=['POST'])
-@jwt_required()
+@query_budget(5)
+@policy()
 def transition(iid):
     data   = request.get_json()  # e.g. { comment: 'Looks good', approve: true }
     inst   = WorkflowInstance.query.get_or_404(iid)
     uid    = get_jwt_identity()
-    claims = get_jwt()
-    roles  = claims.get('roles', [])
 
     wdef = WorkflowDefinition.query.get(inst.workflow_id)
     step = wdef.steps[inst.current_step]
     # check permission:
-    if uid not in step.get('assign_users', []) and not any(r in roles for r in step.get('assign_roles', [])):
+    if uid not in step.get('assign_users', []) and not has_any_role(step.get('assign_roles', [])):
       return jsonify(msg='Forbidden'), 403
 
     # append log
@@ -239,3 +255,6 @@ def transition(iid):
 
     db.session.commit()
     return jsonify(msg='Transitioned', new_state=inst.state), 200
+
+# cached definitions are dropped on update/delete, in every worker
+register_tagger(WorkflowDefinition, lambda w: {f'workflow:{w.id}'})
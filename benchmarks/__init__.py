@@ -0,0 +1,17 @@
+"""
+Endpoint benchmarks against a seeded synthetic dataset.
+
+    python -m benchmarks run --users 500 --repeat 30 --out bench.json
+    python -m benchmarks compare before.json after.json
+    python -m benchmarks plancheck [--database URI]
+    python -m benchmarks loadgen --vus 64 --rate 20,40,80 --step-seconds 30
+
+Runs in-process through Flask's test client on a throwaway SQLite file,
+with MinIO replaced by `FakeMinio`, so it needs no running services. The
+dataset is generated from a seed, so two runs at different commits see
+identical data and their JSON reports can be compared directly.
+
+`loadgen` (benchmarks.loadgen) is the over-the-wire counterpart: virtual
+users replay mixed traffic against a served app at stepped request rates
+to find the saturation point.
+"""
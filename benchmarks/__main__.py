@@ -0,0 +1,165 @@
+import argparse
+import json
+import logging
+import sys
+
+from benchmarks import loadgen, plancheck
+from benchmarks.runner import run, compare
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="generate a dataset and benchmark every endpoint")
+    p.add_argument("--users", type=int, default=200)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--repeat", type=int, default=20, help="timed requests per endpoint")
+    p.add_argument("--warmup", type=int, default=2, help="untimed requests per endpoint")
+    p.add_argument("--only", action="append", help="endpoint name prefix to include (repeatable)")
+    p.add_argument("--exclude", action="append", help="endpoint name prefix to skip (repeatable)")
+    p.add_argument("--hash-method", help="PASSWORD_HASH_METHOD override (login cost)")
+    p.add_argument("--workdir", help="directory for the SQLite file (default: a temp dir)")
+    p.add_argument("--out", help="write the JSON report here instead of stdout")
+
+    c = sub.add_parser("compare", help="compare two JSON reports")
+    c.add_argument("base")
+    c.add_argument("head")
+    c.add_argument("--metric", default="p50_ms")
+
+    pc = sub.add_parser("plancheck", help="fail if a hot query falls back to a full table scan")
+    pc.add_argument("--database", help="database URI to check (default: fresh SQLite schema)")
+    pc.add_argument("--verbose", action="store_true", help="print every plan")
+
+    lg = sub.add_parser("loadgen", help="step a mixed-traffic load through target request rates")
+    lg.add_argument("--url", help="app to load (default: start `serve` in a subprocess)")
+    lg.add_argument("--dataset", help="dataset.json of the app at --url (written by `serve`)")
+    lg.add_argument("--users", type=int, default=200, help="dataset size when starting a server")
+    lg.add_argument("--seed", type=int, default=0)
+    lg.add_argument("--vus", type=int, default=32, help="concurrent virtual users")
+    lg.add_argument("--rate", default="10", help="target requests/sec per step, e.g. 20,40,80")
+    lg.add_argument("--step-seconds", type=float, default=30)
+    lg.add_argument("--mix", help="weight overrides, e.g. uploads.upload=0,forms.get=8")
+    lg.add_argument("--max-error-rate", type=float, default=0.01)
+    lg.add_argument("--slo-p95-ms", type=float, help="fail a step whose p95 exceeds this")
+    lg.add_argument("--keep-going", action="store_true", help="run every step even after one fails")
+    lg.add_argument("--timeout", type=float, default=30, help="per-request timeout (seconds)")
+    lg.add_argument("--hash-method", help="PASSWORD_HASH_METHOD for the started server")
+    lg.add_argument("--workdir", help="directory for the started server (default: a temp dir)")
+    lg.add_argument("--out", help="write the JSON report here instead of stdout")
+
+    sv = sub.add_parser("serve", help="seed a dataset and serve the app with MinIO faked on disk")
+    sv.add_argument("--workdir", required=True)
+    sv.add_argument("--users", type=int, default=200)
+    sv.add_argument("--seed", type=int, default=0)
+    sv.add_argument("--host", default="127.0.0.1")
+    sv.add_argument("--port", type=int, default=8000)
+    sv.add_argument("--hash-method", help="PASSWORD_HASH_METHOD override (login cost)")
+    sv.add_argument("--seed-only", action="store_true", help="seed, then exit (serve with gunicorn)")
+    sv.add_argument("--no-seed", action="store_true", help="serve the existing workdir")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        logging.disable(logging.WARNING)
+        config = {"PASSWORD_HASH_METHOD": args.hash_method} if args.hash_method else None
+        if not args.no_seed:
+            loadgen.seed(args.workdir, args.users, args.seed, config)
+        if not args.seed_only:
+            loadgen.serve(args.workdir, args.host, args.port, config)
+        return 0
+
+    if args.command == "loadgen":
+        return _loadgen(args)
+
+    if args.command == "plancheck":
+        logging.disable(logging.WARNING)
+        results = plancheck.run(args.database)
+        for r in results:
+            print(f"{'ok  ' if r['ok'] else 'SCAN'} {r['name']}"
+                  + (f"  (full scan of {', '.join(r['full_scans'])})" if not r["ok"] else ""))
+            if args.verbose or not r["ok"]:
+                print("       " + r["sql"].replace("\n", " "))
+                for line in r["plan"]:
+                    print(f"       | {line}")
+        failed = sum(not r["ok"] for r in results)
+        print(f"{len(results) - failed}/{len(results)} hot queries use an index")
+        return 1 if failed else 0
+
+    if args.command == "compare":
+        with open(args.base) as fh:
+            base = json.load(fh)
+        with open(args.head) as fh:
+            head = json.load(fh)
+        print(f"{'endpoint':32} {'base':>10} {'head':>10} {'change':>8} {'queries':>10}")
+        for name, b, h, change, bq, hq in compare(base, head, args.metric):
+            pct = f"{change:+.1f}%" if change is not None else "-"
+            print(f"{name:32} {b if b is not None else '-':>10} {h if h is not None else '-':>10} "
+                  f"{pct:>8} {f'{bq}->{hq}':>10}")
+        return 0
+
+    logging.disable(logging.WARNING)   # keep access/boot logs out of the report
+    config = {"PASSWORD_HASH_METHOD": args.hash_method} if args.hash_method else None
+    report = run(users=args.users, seed=args.seed, repeat=args.repeat, warmup=args.warmup,
+                 only=args.only, exclude=args.exclude, config=config, workdir=args.workdir)
+    out = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as fh:
+            fh.write(out + "\n")
+    else:
+        print(out)
+    return 0
+
+
+def _loadgen(args):
+    import tempfile
+
+    rates = [float(r) for r in args.rate.split(",") if r.strip()]
+    mix = {}
+    for item in (args.mix or "").split(","):
+        if item.strip():
+            name, _, weight = item.partition("=")
+            if name.strip() not in loadgen.MIX:
+                print(f"unknown mix entry {name!r}; one of {', '.join(loadgen.MIX)}", file=sys.stderr)
+                return 2
+            mix[name.strip()] = float(weight)
+
+    proc = None
+    if args.url:
+        if not args.dataset:
+            print("--url needs --dataset (see `serve --seed-only`)", file=sys.stderr)
+            return 2
+        url, dataset = args.url, loadgen.load_dataset(args.dataset)
+    else:
+        workdir = args.workdir or tempfile.mkdtemp(prefix="docc-load-")
+        print(f"seeding {args.users} users and starting a server in {workdir} ...", file=sys.stderr)
+        proc, url, dataset = loadgen.start_server(workdir, args.users, args.seed, args.hash_method)
+
+    def progress(step):
+        o = step["overall"]
+        print(f"{step['target_rps']:>8g} rps target  {o['rps']:>8g} achieved  p50 {o['p50_ms']}ms  "
+              f"p95 {o['p95_ms']}ms  p99 {o['p99_ms']}ms  errors {o['error_rate']:.2%}  "
+              f"missed {o['missed']}  {'ok' if step['ok'] else 'FAIL: ' + '; '.join(step['reasons'])}",
+              file=sys.stderr)
+
+    try:
+        report = loadgen.run_load(
+            url, dataset, vus=args.vus, rates=rates, step_seconds=args.step_seconds, mix=mix,
+            max_error_rate=args.max_error_rate, slo_p95_ms=args.slo_p95_ms,
+            keep_going=args.keep_going, timeout=args.timeout, seed=args.seed, progress=progress
+        )
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(10)
+    out = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as fh:
+            fh.write(out + "\n")
+    else:
+        print(out)
+    return 0 if report["saturated_at"] is None else 3
+
+
+if __name__ == "__main__":
+    sys.exit(main())
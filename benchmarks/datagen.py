@@ -0,0 +1,249 @@
+"""
+Deterministic synthetic dataset built from the app's own models.
+
+Everything is drawn from one `random.Random(seed)`, and rows are inserted
+in a fixed order, so the same (users, seed) pair always produces the same
+ids and contents on an empty database.
+"""
+import random
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+
+from app import db
+from app.auth.passwords import hash_password
+from app.models import (
+    User, Role, UserProfile, StaffProfile, StudentProfile, FormDefinition, FormField,
+    FormEntry, WorkflowDefinition, WorkflowInstance, Notification, ResearchPaper, Patent,
+    Award, Achievement, TimeSchedule, EventLog, MediaFile, event_attendee
+)
+
+PASSWORD = "bench-password"
+ROLES = ["Administrator", "Staff", "Student", "Reviewer"]
+DEPARTMENTS = ["Physics", "Chemistry", "Biology", "Mathematics", "Computer Science", "History"]
+JOURNALS = ["Nature", "Science", "PLOS ONE", "Physical Review", "JACM", "Cell"]
+FIELD_TYPES = ["text", "richtext", "number", "select", "file", "date"]
+ROOMS = [f"Room {n}" for n in range(101, 121)]
+WORDS = ("data model system analysis study method network protein quantum graph "
+         "learning field theory design review survey energy cell signal").split()
+
+EPOCH = datetime(2025, 1, 6, 8, 0)
+
+
+@dataclass
+class Dataset:
+    seed: int
+    admin: str = "admin"
+    member: str = None            # Staff user with entries and workflow instances
+    reviewer: str = None          # holds Reviewer, may transition every workflow step
+    user_ids: list = field(default_factory=list)
+    form_ids: list = field(default_factory=list)
+    member_form_ids: list = field(default_factory=list)
+    member_entry_ids: list = field(default_factory=list)
+    workflow_ids: list = field(default_factory=list)
+    instance_ids: list = field(default_factory=list)
+    event_ids: list = field(default_factory=list)
+    media_ids: list = field(default_factory=list)
+    counts: dict = field(default_factory=dict)
+
+
+def _words(rng, lo, hi):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(lo, hi)))
+
+
+def _field_value(rng, fld):
+    if fld.field_type == "number":
+        return rng.randint(0, 1000)
+    if fld.field_type == "select":
+        return rng.choice(fld.options)
+    if fld.field_type == "richtext":
+        return "<p>" + _words(rng, 40, 200) + "</p>"
+    if fld.field_type == "date":
+        return (date(2025, 1, 1) + timedelta(days=rng.randint(0, 364))).isoformat()
+    if fld.field_type == "file":
+        return rng.randint(1, 10_000)
+    return _words(rng, 2, 8)
+
+
+def generate(users=200, seed=0, forms=None, workflows=None, events=None):
+    """Populate the (empty) database; returns a `Dataset` describing it."""
+    rng = random.Random(seed)
+    forms = forms or max(5, users // 20)
+    workflows = workflows or max(3, users // 50)
+    events = events or max(5, users // 10)
+    ds = Dataset(seed=seed)
+
+    roles = {name: Role(name=name) for name in ROLES}
+    db.session.add_all(roles.values())
+
+    # one hash for everyone: hashing is benchmarked by the login endpoint
+    pwhash = hash_password(PASSWORD)
+    people = []
+    for n in range(users):
+        username = "admin" if n == 0 else f"user{n:05d}"
+        u = User(username=username, password_hash=pwhash)
+        if n == 0:
+            u.roles.append(roles["Administrator"])
+        elif rng.random() < 0.6:
+            u.roles.append(roles["Staff"])
+        else:
+            u.roles.append(roles["Student"])
+        if n and rng.random() < 0.1:
+            u.roles.append(roles["Reviewer"])
+        people.append(u)
+    # fixed members for the per-user scenarios
+    people[1].roles = [roles["Staff"]]
+    people[2].roles = [roles["Staff"], roles["Reviewer"]]
+    ds.member, ds.reviewer = people[1].username, people[2].username
+    db.session.add_all(people)
+    db.session.flush()
+    ds.user_ids = [u.id for u in people]
+    staff = [u for u in people if roles["Staff"] in u.roles]
+
+    for u in people:
+        db.session.add(UserProfile(user_id=u.id, full_name=_words(rng, 2, 3).title(), bio=_words(rng, 10, 40)))
+        if roles["Staff"] in u.roles:
+            db.session.add(StaffProfile(user_id=u.id, department=rng.choice(DEPARTMENTS),
+                                        expertise=_words(rng, 3, 8), contact=f"{u.username}@example.edu"))
+        elif roles["Student"] in u.roles:
+            db.session.add(StudentProfile(user_id=u.id, program=rng.choice(DEPARTMENTS),
+                                          year=rng.randint(1, 5), advisor=rng.choice(staff).username if staff else None))
+
+    # --- forms, fields and entries ---
+    form_defs = []
+    for n in range(forms):
+        f = FormDefinition(name=f"Form {n:04d} {_words(rng, 1, 3)}", description=_words(rng, 5, 20),
+                           created_by=people[0].id, created_at=EPOCH + timedelta(hours=n))
+        for order in range(rng.randint(3, 8)):
+            ftype = rng.choice(FIELD_TYPES)
+            f.fields.append(FormField(
+                name=f"field_{order}", label=_words(rng, 1, 3).title(), field_type=ftype,
+                required=rng.random() < 0.5, order=order,
+                options=[_words(rng, 1, 1) for _ in range(4)] if ftype == "select" else []
+            ))
+        form_defs.append(f)
+    db.session.add_all(form_defs)
+    db.session.flush()
+    ds.form_ids = [f.id for f in form_defs]
+
+    entries = []
+    for u in people[1:]:
+        count = 3 if u is people[1] else rng.randint(0, 3)
+        for f in rng.sample(form_defs, min(count, len(form_defs))):
+            entries.append(FormEntry(
+                form_id=f.id, user_id=u.id, status=rng.choice(["draft", "submitted", "submitted"]),
+                data={fld.name: _field_value(rng, fld) for fld in f.fields},
+                created_at=EPOCH + timedelta(minutes=len(entries))
+            ))
+    db.session.add_all(entries)
+    db.session.flush()
+    ds.member_entry_ids = [e.id for e in entries if e.user_id == people[1].id]
+    ds.member_form_ids = [e.form_id for e in entries if e.user_id == people[1].id]
+
+    # --- workflows and instances ---
+    wdefs = []
+    for n in range(workflows):
+        steps = []
+        for s in range(rng.randint(2, 4)):
+            steps.append({
+                "name": f"Step {s + 1}: {_words(rng, 1, 2)}",
+                "assign_roles": ["Reviewer"] + rng.sample(["Staff", "Student"], rng.randint(0, 1)),
+                "assign_users": rng.sample(ds.user_ids[1:], min(3, users - 1)),
+                "form_id": rng.choice(ds.form_ids)
+            })
+        wdefs.append(WorkflowDefinition(name=f"Workflow {n:03d}", steps=steps))
+    db.session.add_all(wdefs)
+    db.session.flush()
+    ds.workflow_ids = [w.id for w in wdefs]
+
+    instances = []
+    for e in entries:
+        if rng.random() < 0.5 and e.user_id != people[1].id:
+            continue
+        w = rng.choice(wdefs)
+        step = rng.randrange(len(w.steps))
+        instances.append(WorkflowInstance(
+            workflow_id=w.id, user_id=e.user_id, entity_type="form_entry", entity_id=e.id,
+            current_step=step, state=w.steps[step]["name"],
+            logs=[{"by": e.user_id, "step": w.steps[0]["name"], "at": EPOCH.isoformat(),
+                   "comment": "", "action": "approved"}] * step
+        ))
+    db.session.add_all(instances)
+    db.session.flush()
+    ds.instance_ids = [i.id for i in instances]
+
+    db.session.add_all(
+        Notification(user_id=uid, message=_words(rng, 4, 12), url=f"/tasks/{rng.choice(ds.instance_ids or [0])}",
+                     is_read=rng.random() < 0.7, created_at=EPOCH + timedelta(minutes=n))
+        for n, uid in enumerate(rng.choices(ds.user_ids, k=users * 3))
+    )
+
+    # --- research records, uploads and schedules ---
+    media = []
+    for n, u in enumerate(staff):
+        for k in range(rng.randint(0, 2)):
+            media.append(MediaFile(
+                filename=f"{u.username}-{k}.pdf", content_type="application/pdf",
+                url=f"http://fake-minio/docc-files/bench-{n}-{k}.pdf", object_name=f"bench-{n}-{k}.pdf",
+                size=rng.randint(10_000, 5_000_000), uploaded_by=u.id, version=1,
+                created_at=EPOCH + timedelta(minutes=n)
+            ))
+    db.session.add_all(media)
+    db.session.flush()
+    ds.media_ids = [m.id for m in media]
+
+    papers = patents = 0
+    for u in staff:
+        for _ in range(rng.randint(0, 6)):
+            papers += 1
+            db.session.add(ResearchPaper(
+                title=_words(rng, 4, 10).capitalize(), authors=_words(rng, 2, 6), abstract=_words(rng, 30, 120),
+                publication_date=date(2015, 1, 1) + timedelta(days=rng.randint(0, 3650)),
+                journal=rng.choice(JOURNALS), doi=f"10.5555/bench.{papers}", owner_id=u.id,
+                file_id=rng.choice(ds.media_ids) if ds.media_ids and rng.random() < 0.3 else None
+            ))
+        for _ in range(rng.randint(0, 2)):
+            patents += 1
+            db.session.add(Patent(
+                title=_words(rng, 3, 8).capitalize(), inventors=_words(rng, 2, 4),
+                patent_number=f"US{9_000_000 + patents}", date=date(2010, 1, 1) + timedelta(days=rng.randint(0, 5000)),
+                abstract=_words(rng, 20, 80), owner_id=u.id
+            ))
+        for _ in range(rng.randint(0, 3)):
+            db.session.add(Award(recipient_id=u.id, name=_words(rng, 2, 5).title(),
+                                 date=date(2012, 1, 1) + timedelta(days=rng.randint(0, 4000)),
+                                 awarding_body=_words(rng, 2, 4).title()))
+        for _ in range(rng.randint(0, 3)):
+            db.session.add(Achievement(owner_id=u.id, title=_words(rng, 2, 6), description=_words(rng, 10, 30)))
+
+    for u in people:
+        day = EPOCH + timedelta(days=rng.randint(0, 60))
+        for k in range(rng.randint(0, 4)):
+            start = day + timedelta(hours=2 * k)
+            db.session.add(TimeSchedule(owner_id=u.id, type=rng.choice(["course", "meeting", "booking"]),
+                                        start=start, end=start + timedelta(hours=1),
+                                        location=f"{rng.choice(ROOMS)} {u.id}"))
+
+    # --- events and attendance ---
+    event_rows = [
+        EventLog(name=_words(rng, 2, 5).title(), date=EPOCH + timedelta(days=n), location=rng.choice(ROOMS),
+                 description=_words(rng, 10, 40))
+        for n in range(events)
+    ]
+    db.session.add_all(event_rows)
+    db.session.flush()
+    ds.event_ids = [e.id for e in event_rows]
+    attendance = [
+        {"event_id": e.id, "user_id": uid}
+        for e in event_rows
+        for uid in rng.sample(ds.user_ids, min(users, rng.randint(5, 50)))
+    ]
+    if attendance:
+        db.session.execute(event_attendee.insert(), attendance)
+
+    db.session.commit()
+    ds.counts = {
+        "users": users, "forms": forms, "entries": len(entries), "workflows": workflows,
+        "instances": len(instances), "papers": papers, "patents": patents,
+        "media": len(media), "events": events, "attendance": len(attendance)
+    }
+    return ds
@@ -0,0 +1,101 @@
+"""
+In-memory (or directory-backed) stand-in for the subset of `minio.Minio`
+the app uses. Assigned to `app.minio_client` in place of `LazyMinio`.
+"""
+import io
+import os
+import threading
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+
+class _Response(io.BytesIO):
+    def release_conn(self):
+        pass
+
+
+class FakeMinio:
+    def __init__(self, root=None):
+        self.root = root                # None = keep objects in memory
+        self.objects = {}               # (bucket, name) -> (bytes or None, content_type, metadata, mtime, size)
+        self.buckets = set()
+        self.bucket_ready = True
+        self._lock = threading.Lock()
+
+    def _missing(self, name):
+        from minio.error import S3Error
+        return S3Error(None, "NoSuchKey", "Object does not exist", name, "fake", "fake")
+
+    def _path(self, bucket, name):
+        return os.path.join(self.root, bucket, name)
+
+    # --- bucket ---
+
+    def bucket_exists(self, bucket):
+        return True
+
+    def make_bucket(self, bucket):
+        self.buckets.add(bucket)
+
+    def health(self):
+        return {"ok": True, "bucket": "fake", "bucket_ready": True, "latency_ms": 0.0}
+
+    def reset(self):
+        pass
+
+    # --- objects ---
+
+    def put_object(self, bucket, name, data, length, content_type="application/octet-stream",
+                   metadata=None, **kwargs):
+        body = data.read(length) if length >= 0 else data.read()
+        size = len(body)
+        if self.root:
+            path = self._path(bucket, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as fh:
+                fh.write(body)
+            body = None
+        meta = {f"x-amz-meta-{k}": v for k, v in (metadata or {}).items()}
+        with self._lock:
+            self.objects[(bucket, name)] = (body, content_type, meta, datetime.now(timezone.utc), size)
+        return SimpleNamespace(bucket_name=bucket, object_name=name, etag="fake")
+
+    def _read(self, bucket, name):
+        body = self.objects[(bucket, name)][0]
+        if body is None:
+            with open(self._path(bucket, name), "rb") as fh:
+                body = fh.read()
+        return body
+
+    def get_object(self, bucket, name, *args, **kwargs):
+        if (bucket, name) not in self.objects:
+            raise self._missing(name)
+        return _Response(self._read(bucket, name))
+
+    def stat_object(self, bucket, name, *args, **kwargs):
+        entry = self.objects.get((bucket, name))
+        if entry is None:
+            raise self._missing(name)
+        _, content_type, meta, mtime, size = entry
+        return SimpleNamespace(bucket_name=bucket, object_name=name, size=size,
+                               content_type=content_type, metadata=meta, last_modified=mtime)
+
+    def presigned_get_object(self, bucket, name, expires=None, **kwargs):
+        return f"http://fake-minio/{bucket}/{name}?X-Amz-Signature=fake"
+
+    def list_objects(self, bucket, prefix=None, recursive=False, **kwargs):
+        for (b, name), entry in sorted(self.objects.items()):
+            if b == bucket and (not prefix or name.startswith(prefix)):
+                yield SimpleNamespace(object_name=name, last_modified=entry[3], size=entry[4], is_dir=False)
+
+    def remove_object(self, bucket, name, *args, **kwargs):
+        with self._lock:
+            self.objects.pop((bucket, name), None)
+        if self.root and os.path.exists(self._path(bucket, name)):
+            os.remove(self._path(bucket, name))
+
+    def remove_objects(self, bucket, delete_object_list, **kwargs):
+        for d in delete_object_list:
+            self.remove_object(bucket, d.name)
+        return iter(())
+
@@ -0,0 +1,479 @@
+"""
+Closed-loop load generator: many virtual users replay mixed traffic against
+a running app over HTTP, stepping through target request rates.
+
+    python -m benchmarks loadgen --users 500 --vus 64 --rate 20,40,80,160 --step-seconds 30
+    python -m benchmarks loadgen --url http://app:8000 --dataset ds.json --vus 200 --rate 100,200
+
+Without --url a server is started in a subprocess (`python -m benchmarks
+serve`): a seeded SQLite database, `FakeMinio` writing objects under the
+workdir, rate limiting off (every virtual user shares one IP), and
+werkzeug's threaded server. To size a real worker configuration, seed
+with `serve --seed-only` and run the WSGI factory under gunicorn:
+
+    LOADGEN_WORKDIR=/tmp/load gunicorn -w 4 'benchmarks.loadgen:server_app()'
+
+Each virtual user logs in as its own dataset user and keeps a keep-alive
+connection. Requests are paced by a shared schedule at the step's target
+rate; a user waits for its response before taking the next slot, so an
+overloaded server shows up as achieved < target (slots more than MAX_LAG
+late are dropped and counted as `missed`). A step passes when it reaches
+95% of its target with an error rate (5xx and transport failures) of at
+most --max-error-rate and, if given, a p95 under --slo-p95-ms; ramping
+stops at the first failing step. 429s are counted separately as throttled.
+"""
+import http.client
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import asdict
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+from uuid import uuid4
+
+from benchmarks.datagen import PASSWORD, Dataset, generate
+from benchmarks.fake_minio import FakeMinio
+from benchmarks.runner import _git_commit, _percentile
+
+MIX = {
+    "auth.login":            1,
+    "forms.list":            2,
+    "forms.get":             4,
+    "forms.entries.submit":  1,
+    "forms.entries.update":  2,
+    "uploads.upload":        1,
+    "workflows.tasks":       3,
+    "workflows.transition":  1,
+}
+MAX_LAG = 1.0            # seconds a slot may be late before it is dropped
+TOKEN_MAX_AGE = 600      # re-login before access tokens (15 min) expire
+
+
+# --- server side ---
+
+def _paths(workdir):
+    return {
+        "db": os.path.join(workdir, "load.db"),
+        "objects": os.path.join(workdir, "objects"),
+        "cache": os.path.join(workdir, "cache.sqlite3"),
+        "dataset": os.path.join(workdir, "dataset.json")
+    }
+
+
+def server_app(workdir=None, config=None):
+    """WSGI app on the seeded workdir (LOADGEN_WORKDIR) with MinIO faked on disk."""
+    from app import create_app
+
+    paths = _paths(workdir or os.environ["LOADGEN_WORKDIR"])
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{paths['db']}",
+        "CACHE_SHARED_PATH": paths["cache"],
+        "RATE_LIMIT_ENABLED": False,
+        **(config or {})
+    })
+    app.minio_client = FakeMinio(paths["objects"])
+    return app
+
+
+def seed(workdir, users=200, seed=0, config=None):
+    """Fresh database and object store under `workdir`; writes and returns the dataset."""
+    from app import db
+
+    os.makedirs(workdir, exist_ok=True)
+    paths = _paths(workdir)
+    for path in (paths["db"], paths["cache"]):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    app = server_app(workdir, config)
+    with app.app_context():
+        db.create_all()
+        ds = generate(users=users, seed=seed)
+    with open(paths["dataset"], "w") as fh:
+        json.dump(asdict(ds), fh)
+    return ds
+
+
+def serve(workdir, host="127.0.0.1", port=8000, config=None):
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server(host, port, server_app(workdir, config), threaded=True)
+    server.serve_forever()
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workdir, users, seed_value, hash_method=None, timeout=600):
+    """Seed and serve in a subprocess; returns (process, base url, dataset)."""
+    port = _free_port()
+    cmd = [sys.executable, "-m", "benchmarks", "serve", "--workdir", workdir,
+           "--port", str(port), "--users", str(users), "--seed", str(seed_value)]
+    if hash_method:
+        cmd += ["--hash-method", hash_method]
+    os.makedirs(workdir, exist_ok=True)
+    log = open(os.path.join(workdir, "server.log"), "wb")
+    proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}, see {log.name}")
+        try:
+            status, _ = Client(url, 2).request("GET", "/api/health")
+            if status == 200:
+                return proc, url, load_dataset(_paths(workdir)["dataset"])
+        except OSError:
+            pass
+        time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError(f"server did not come up within {timeout}s, see {log.name}")
+
+
+def load_dataset(path):
+    with open(path) as fh:
+        return Dataset(**json.load(fh))
+
+
+# --- client side ---
+
+class Client:
+    """One keep-alive HTTP/1.1 connection (stdlib only)."""
+
+    def __init__(self, base_url, timeout=30):
+        u = urlsplit(base_url)
+        self.https = u.scheme == "https"
+        self.host, self.port = u.hostname, u.port
+        self.timeout = timeout
+        self._conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        if self._conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self._conn = cls(self.host, self.port, timeout=self.timeout)
+        try:
+            self._conn.request(method, path, body=body, headers=headers or {})
+            resp = self._conn.getresponse()
+            return resp.status, resp.read()
+        except (http.client.HTTPException, OSError):
+            self.close()
+            raise
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}       # name -> [ms]
+        self.statuses = {}      # name -> {status: n}; 0 = transport failure
+        self.missed = 0
+        self._lock = threading.Lock()
+
+    def add(self, name, ms, status):
+        with self._lock:
+            self.samples.setdefault(name, []).append(ms)
+            counts = self.statuses.setdefault(name, {})
+            counts[status] = counts.get(status, 0) + 1
+
+    def miss(self):
+        with self._lock:
+            self.missed += 1
+
+    @staticmethod
+    def _summary(timings, statuses, seconds):
+        timings = sorted(timings)
+        n = len(timings)
+        errors = sum(v for s, v in statuses.items() if s == 0 or s >= 500)
+        return {
+            "n": n,
+            "rps": round(n / seconds, 2),
+            "errors": errors,
+            "error_rate": round(errors / n, 4) if n else 0.0,
+            "throttled": statuses.get(429, 0),
+            "client_errors": sum(v for s, v in statuses.items() if 400 <= s < 500 and s != 429),
+            "status": {str(s): v for s, v in sorted(statuses.items())},
+            "p50_ms": round(_percentile(timings, 50), 2) if n else None,
+            "p95_ms": round(_percentile(timings, 95), 2) if n else None,
+            "p99_ms": round(_percentile(timings, 99), 2) if n else None,
+            "max_ms": round(timings[-1], 2) if n else None
+        }
+
+    def report(self, seconds):
+        with self._lock:
+            samples = {k: list(v) for k, v in self.samples.items()}
+            statuses = {k: dict(v) for k, v in self.statuses.items()}
+        overall_statuses = {}
+        for counts in statuses.values():
+            for s, v in counts.items():
+                overall_statuses[s] = overall_statuses.get(s, 0) + v
+        overall = self._summary([t for v in samples.values() for t in v], overall_statuses, seconds)
+        overall["missed"] = self.missed
+        return {
+            "overall": overall,
+            "endpoints": {
+                name: self._summary(samples[name], statuses[name], seconds) for name in sorted(samples)
+            }
+        }
+
+
+class Step:
+    """One target rate: a shared slot schedule and its recorder."""
+
+    def __init__(self, rate, seconds):
+        self.rate = rate
+        self.seconds = seconds
+        self.started = time.monotonic()
+        self.ends = self.started + seconds
+        self.recorder = Recorder()
+        self._next = self.started
+        self._lock = threading.Lock()
+
+    def take(self):
+        """The next slot's start time, or None once the step is over."""
+        with self._lock:
+            slot = self._next
+            if slot >= self.ends:
+                return None
+            self._next += 1 / self.rate
+            return slot
+
+
+class LoadRun:
+    def __init__(self, url, dataset, vus, mix=None, timeout=30, seed=0):
+        self.url = url
+        self.ds = dataset
+        self.vus = vus
+        self.mix = {k: v for k, v in {**MIX, **(mix or {})}.items() if v > 0}
+        self.timeout = timeout
+        self.seed = seed
+        self.step = None
+        self.stop = threading.Event()
+        self.ready = threading.Barrier(vus + 1)
+        self._reviewer = None       # (token, issued at), shared by every user
+        self._reviewer_lock = threading.Lock()
+
+    def login(self, client, username):
+        status, body = client.request(
+            "POST", "/api/auth/login",
+            json.dumps({"username": username, "password": PASSWORD}).encode(),
+            {"Content-Type": "application/json"}
+        )
+        if status != 200:
+            raise RuntimeError(f"login as {username} failed: {status} {body[:200]!r}")
+        return json.loads(body)["access_token"]
+
+    def reviewer_token(self, client):
+        with self._reviewer_lock:
+            if self._reviewer is None or time.monotonic() - self._reviewer[1] > TOKEN_MAX_AGE:
+                self._reviewer = (self.login(client, self.ds.reviewer), time.monotonic())
+            return self._reviewer[0]
+
+
+class VirtualUser(threading.Thread):
+    def __init__(self, run, n):
+        super().__init__(name=f"vu-{n}", daemon=True)
+        self.run_ = run
+        self.rng = random.Random(run.seed * 100003 + n)
+        # every dataset user except the admin shares the password
+        self.username = f"user{1 + n % (len(run.ds.user_ids) - 1):05d}"
+        self.client = Client(run.url, run.timeout)
+        self.token = None
+        self.token_at = 0.0
+        self.forms = []         # forms this user may open
+        self.entries = []       # this user's entries
+        self.step = None
+        self.names = list(run.mix)
+        self.weights = [run.mix[k] for k in self.names]
+        self.error = None
+
+    # --- requests ---
+
+    def call(self, name, method, path, payload=None, body=None, content_type=None, token=None):
+        headers = {"Authorization": f"Bearer {token or self.token}"}
+        if payload is not None:
+            body, content_type = json.dumps(payload).encode(), "application/json"
+        if content_type:
+            headers["Content-Type"] = content_type
+        started = time.perf_counter()
+        try:
+            status, data = self.client.request(method, path, body, headers)
+        except (http.client.HTTPException, OSError):
+            status, data = 0, b""
+        self.step.recorder.add(name, (time.perf_counter() - started) * 1000, status)
+        if 200 <= status < 300 and data:
+            try:
+                return status, json.loads(data)
+            except ValueError:
+                return status, None
+        return status, None
+
+    def relogin(self):
+        self.token = self.run_.login(self.client, self.username)
+        self.token_at = time.monotonic()
+
+    # --- actions ---
+
+    def do_auth_login(self):
+        status, body = self.call("auth.login", "POST", "/api/auth/login",
+                                 {"username": self.username, "password": PASSWORD})
+        if body:
+            self.token, self.token_at = body["access_token"], time.monotonic()
+
+    def do_forms_list(self):
+        status, body = self.call("forms.list", "GET", "/api/forms?per_page=50&fields=id")
+        if body:
+            self.forms = list({*self.forms, *(f["id"] for f in body["forms"])})
+
+    def do_forms_get(self):
+        if not self.forms:
+            return self.do_forms_list()
+        self.call("forms.get", "GET", f"/api/forms/{self.rng.choice(self.forms)}")
+
+    def do_forms_entries_submit(self):
+        fid = self.rng.choice(self.run_.ds.form_ids)
+        status, body = self.call("forms.entries.submit", "POST", f"/api/forms/{fid}/entries",
+                                 {"data": self._entry_data()})
+        if body:
+            self.entries.append(body["id"])
+            if fid not in self.forms:
+                self.forms.append(fid)
+
+    def do_forms_entries_update(self):
+        if not self.entries:
+            return self.do_forms_entries_submit()
+        self.call("forms.entries.update", "PUT", f"/api/forms/entries/{self.rng.choice(self.entries)}",
+                  {"data": self._entry_data(), "status": "draft"})
+
+    def do_uploads_upload(self):
+        size = self.rng.randint(10, 200) * 1024
+        boundary = uuid4().hex
+        body = (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="load-{uuid4().hex[:8]}.pdf"\r\n'
+            f"Content-Type: application/pdf\r\n\r\n"
+        ).encode() + b"%PDF-1.4 " + self.rng.randbytes(size) + f"\r\n--{boundary}--\r\n".encode()
+        self.call("uploads.upload", "POST", "/api/uploads", body=body,
+                  content_type=f"multipart/form-data; boundary={boundary}")
+
+    def do_workflows_tasks(self):
+        self.call("workflows.tasks", "GET", "/api/workflows/instances/tasks")
+
+    def do_workflows_transition(self):
+        if not self.run_.ds.instance_ids:
+            return self.do_workflows_tasks()
+        iid = self.rng.choice(self.run_.ds.instance_ids)
+        self.call("workflows.transition", "POST", f"/api/workflows/instances/{iid}/transition",
+                  {"comment": "load test", "approve": self.rng.random() < 0.8},
+                  token=self.run_.reviewer_token(self.client))
+
+    def _entry_data(self):
+        return {"field_0": f"load {self.rng.random():.6f}", "field_1": "<p>" + "draft text " * self.rng.randint(5, 200) + "</p>"}
+
+    # --- loop ---
+
+    def run(self):
+        run = self.run_
+        try:
+            self.relogin()
+            status, body = self.client.request("GET", "/api/forms?per_page=50&fields=id",
+                                               headers={"Authorization": f"Bearer {self.token}"})
+            if status == 200:
+                self.forms = [f["id"] for f in json.loads(body)["forms"]]
+        except Exception as e:
+            self.error = f"{self.username}: {e}"
+        run.ready.wait()
+        if self.error:
+            return
+        while not run.stop.is_set():
+            self.step = step = run.step
+            slot = step.take() if step else None
+            if slot is None:
+                time.sleep(0.01)
+                continue
+            delay = slot - time.monotonic()
+            if delay > 0:
+                run.stop.wait(delay)
+            elif -delay > MAX_LAG:
+                step.recorder.miss()
+                continue
+            if time.monotonic() - self.token_at > TOKEN_MAX_AGE:
+                try:
+                    self.relogin()
+                except Exception:
+                    pass
+            name = self.rng.choices(self.names, self.weights)[0]
+            getattr(self, "do_" + name.replace(".", "_"))()
+        self.client.close()
+
+
+def run_load(url, dataset, vus=32, rates=(10,), step_seconds=30, mix=None, max_error_rate=0.01,
+             slo_p95_ms=None, keep_going=False, timeout=30, seed=0, progress=None):
+    """Drive `url` through each target rate in `rates`; returns the report dict."""
+    run = LoadRun(url, dataset, vus, mix, timeout, seed)
+    users = [VirtualUser(run, n) for n in range(vus)]
+    for vu in users:
+        vu.start()
+    run.ready.wait()
+    failed = [vu.error for vu in users if vu.error]
+    if len(failed) == vus:
+        run.stop.set()
+        raise RuntimeError(f"no virtual user could log in: {failed[0]}")
+
+    steps, saturation = [], None
+    try:
+        for rate in rates:
+            run.step = step = Step(rate, step_seconds)
+            run.stop.wait(step_seconds)
+            run.step = None
+            elapsed = time.monotonic() - step.started
+            result = {"target_rps": rate, "seconds": round(elapsed, 1), **step.recorder.report(elapsed)}
+            overall = result["overall"]
+            reasons = []
+            if overall["rps"] < 0.95 * rate:
+                reasons.append(f"achieved {overall['rps']} of {rate} rps")
+            if overall["error_rate"] > max_error_rate:
+                reasons.append(f"error rate {overall['error_rate']:.2%}")
+            if slo_p95_ms is not None and (overall["p95_ms"] or 0) > slo_p95_ms:
+                reasons.append(f"p95 {overall['p95_ms']}ms > {slo_p95_ms}ms")
+            result["ok"] = not reasons
+            result["reasons"] = reasons
+            steps.append(result)
+            if progress:
+                progress(result)
+            if reasons and saturation is None:
+                saturation = {"rps": rate, "reasons": reasons}
+                if not keep_going:
+                    break
+    finally:
+        run.stop.set()
+        for vu in users:
+            vu.join(timeout + 1)
+
+    passed = [s["target_rps"] for s in steps if s["ok"]]
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "url": url,
+            "vus": vus,
+            "vus_failed_login": len(failed),
+            "step_seconds": step_seconds,
+            "mix": run.mix,
+            "dataset": dataset.counts
+        },
+        "steps": steps,
+        "max_ok_rps": max(passed) if passed else None,
+        "saturated_at": saturation
+    }
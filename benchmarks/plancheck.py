@@ -0,0 +1,128 @@
+"""
+Query-plan regression checks for hot lookups.
+
+Each entry in HOT_QUERIES is a statement the app issues on a hot path.
+`check` runs EXPLAIN QUERY PLAN (SQLite) or EXPLAIN (FORMAT JSON)
+(PostgreSQL, with enable_seqscan off so the planner picks an index
+whenever one exists, whatever the table size) and flags every statement
+that falls back to a full table scan.
+
+    python -m benchmarks plancheck                      # fresh SQLite schema from the models
+    python -m benchmarks plancheck --database postgresql://.../docc   # a migrated database
+"""
+import re
+
+from app import db
+from app.models import (
+    User, StaffProfile, StudentProfile, FormEntry, FormField, WorkflowDefinition,
+    WorkflowInstance, Notification, MediaFile, MediaVersion, Award, Achievement,
+    ResearchPaper, Patent, TimeSchedule, TokenRevocation, roles_users, event_attendee
+)
+
+HOT_QUERIES = {
+    "user by username":             lambda: db.select(User).where(User.username == "alice"),
+    "users with role":              lambda: db.select(roles_users.c.user_id).where(roles_users.c.role_id == 1),
+    "staff profile of user":        lambda: db.select(StaffProfile).where(StaffProfile.user_id == 1),
+    "staff by department":          lambda: db.select(StaffProfile.user_id).where(StaffProfile.department == "Physics"),
+    "student profile of user":      lambda: db.select(StudentProfile).where(StudentProfile.user_id == 1),
+    "fields of form":               lambda: db.select(FormField).where(FormField.form_id == 1),
+    "entries of form":              lambda: db.select(FormEntry).where(FormEntry.form_id == 1),
+    "my entries of form":           lambda: db.select(FormEntry).where(FormEntry.form_id == 1, FormEntry.user_id == 1),
+    "forms a user submitted":       lambda: db.select(FormEntry.form_id).where(FormEntry.user_id == 1).distinct(),
+    "instances of workflow":        lambda: db.select(WorkflowInstance).where(WorkflowInstance.workflow_id == 1),
+    "task inbox instances":         lambda: db.select(WorkflowInstance).where(
+                                        WorkflowInstance.user_id == 1, WorkflowInstance.entity_type == "workflow",
+                                        WorkflowInstance.entity_id == 0),
+    "definitions of my instances":  lambda: db.select(WorkflowDefinition).where(WorkflowDefinition.id.in_(
+                                        db.select(WorkflowInstance.workflow_id).where(WorkflowInstance.user_id == 1))),
+    "unread notifications":         lambda: db.select(Notification).where(
+                                        Notification.user_id == 1, Notification.is_read == False),  # noqa: E712
+    "uploads of user":              lambda: db.select(MediaFile).where(MediaFile.uploaded_by == 1),
+    "media by object name":         lambda: db.select(MediaFile.id).where(MediaFile.object_name == "x"),
+    "versions by object name":      lambda: db.select(MediaVersion.id).where(MediaVersion.object_name == "x"),
+    "versions of media":            lambda: db.select(MediaVersion).where(MediaVersion.media_id == 1),
+    "awards of user":               lambda: db.select(Award).where(Award.recipient_id == 1),
+    "achievements of user":         lambda: db.select(Achievement).where(Achievement.owner_id == 1),
+    "papers of user":               lambda: db.select(ResearchPaper).where(ResearchPaper.owner_id == 1),
+    "paper by doi":                 lambda: db.select(ResearchPaper).where(ResearchPaper.doi == "10.1/x"),
+    "papers linking a file":        lambda: db.select(ResearchPaper.id).where(ResearchPaper.file_id == 1),
+    "patents of user":              lambda: db.select(Patent).where(Patent.owner_id == 1),
+    "patent by number":             lambda: db.select(Patent).where(Patent.patent_number == "US1"),
+    "patents linking a file":       lambda: db.select(Patent.id).where(Patent.file_id == 1),
+    "room bookings overlapping":    lambda: db.select(TimeSchedule.id).where(
+                                        TimeSchedule.location == "R1", TimeSchedule.start < "2025-01-02",
+                                        TimeSchedule.end > "2025-01-01"),
+    "owner bookings overlapping":   lambda: db.select(TimeSchedule.id).where(
+                                        TimeSchedule.owner_id == 1, TimeSchedule.start < "2025-01-02",
+                                        TimeSchedule.end > "2025-01-01"),
+    "events a user attended":       lambda: db.select(event_attendee.c.event_id).where(event_attendee.c.user_id == 1),
+    "revocations since":            lambda: db.select(TokenRevocation).where(TokenRevocation.id > 10),
+}
+
+# "SCAN t" and "SCAN t USING [COVERING] INDEX i" both read every row; SEARCH is a lookup
+_sqlite_scan = re.compile(r"^SCAN (\w+)")
+
+
+def _sql(stmt, dialect):
+    return str(stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+
+
+def _sqlite_plan(conn, sql):
+    rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql).fetchall()
+    lines = [row[-1] for row in rows]
+    scans = [m.group(1) for m in map(_sqlite_scan.match, lines) if m]
+    return lines, scans
+
+
+def _pg_nodes(node):
+    yield node
+    for child in node.get("Plans", ()):
+        yield from _pg_nodes(child)
+
+
+def _pg_plan(conn, sql):
+    plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + sql).scalar()
+    root = plan[0]["Plan"]
+    nodes = list(_pg_nodes(root))
+    lines = [f"{n['Node Type']}" + (f" on {n['Relation Name']}" if "Relation Name" in n else "")
+             + (f" using {n['Index Name']}" if "Index Name" in n else "") for n in nodes]
+    scans = [n["Relation Name"] for n in nodes if n["Node Type"] == "Seq Scan"]
+    return lines, scans
+
+
+def check(engine, names=None):
+    """Returns [{name, sql, plan, full_scans, ok}] for each hot query."""
+    dialect = engine.dialect
+    explain = {"sqlite": _sqlite_plan, "postgresql": _pg_plan}.get(dialect.name)
+    if explain is None:
+        raise ValueError(f"no plan checker for {dialect.name}")
+    results = []
+    with engine.connect() as conn:
+        if dialect.name == "postgresql":
+            conn.exec_driver_sql("SET enable_seqscan = off")
+        for name, build in HOT_QUERIES.items():
+            if names and name not in names:
+                continue
+            sql = _sql(build(), dialect)
+            plan, scans = explain(conn, sql)
+            results.append({"name": name, "sql": sql, "plan": plan, "full_scans": scans, "ok": not scans})
+        conn.rollback()
+    return results
+
+
+def run(database=None):
+    """Check a database (default: a fresh SQLite schema built from the models)."""
+    import tempfile
+    from benchmarks.runner import make_app
+
+    if database:
+        app = make_app(":memory:", {"SQLALCHEMY_DATABASE_URI": database})
+        with app.app_context():
+            return check(db.engine)
+    with tempfile.TemporaryDirectory(prefix="docc-plan-") as tmp:
+        app = make_app(f"{tmp}/plan.db")
+        with app.app_context():
+            db.create_all()
+            results = check(db.engine)
+            db.engine.dispose()
+        return results
@@ -0,0 +1,214 @@
+"""
+Drive every blueprint through the test client and measure each endpoint.
+
+Each scenario is (name, method, path, caller, body): `path` and `body` may
+be callables taking (dataset, iteration) so writes rotate over rows
+instead of hammering one. Callers are the dataset's admin, member and
+reviewer, logged in once through /api/auth/login.
+"""
+import io
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+
+from benchmarks.datagen import PASSWORD, generate
+from benchmarks.fake_minio import FakeMinio
+
+SCENARIOS = [
+    # name                        method   path                                                        caller
+    ("auth.login",                "POST",  "/api/auth/login",                                          None,
+        lambda ds, i: {"username": ds.member, "password": PASSWORD}),
+    ("auth.refresh",              "POST",  "/api/auth/refresh",                                        "member:refresh", None),
+    ("health",                    "GET",   "/api/health",                                              None, None),
+    ("authz.policies",            "GET",   "/api/authz/policies",                                      "admin", None),
+    ("roles.list",                "GET",   "/api/roles",                                               "admin", None),
+    ("users.list",                "GET",   "/api/users",                                               "admin", None),
+    ("users.directory",           "GET",   "/api/users/directory?limit=50",                            "admin", None),
+    ("users.directory.search",    "GET",   "/api/users/directory?q=user000&limit=20",                  "admin", None),
+    ("users.me",                  "GET",   "/api/users/me",                                            "member", None),
+    ("users.get",                 "GET",   lambda ds, i: f"/api/users/{ds.user_ids[i % len(ds.user_ids)]}", "admin", None),
+    ("users.portfolio",           "GET",   lambda ds, i: f"/api/users/{ds.user_ids[i % len(ds.user_ids)]}/portfolio", "admin", None),
+    ("users.portfolios",          "GET",   lambda ds, i: "/api/users/portfolios?ids=" + ",".join(map(str, ds.user_ids[:20])), "admin", None),
+    ("forms.list.admin",          "GET",   "/api/forms",                                               "admin", None),
+    ("forms.list",                "GET",   "/api/forms",                                               "member", None),
+    ("forms.get",                 "GET",   lambda ds, i: f"/api/forms/{ds.member_form_ids[i % len(ds.member_form_ids)]}", "member", None),
+    ("forms.entries.list",        "GET",   lambda ds, i: f"/api/forms/{ds.form_ids[i % len(ds.form_ids)]}/entries", "admin", None),
+    ("forms.entries.mine",        "GET",   lambda ds, i: f"/api/forms/{ds.member_form_ids[i % len(ds.member_form_ids)]}/entries/mine", "member", None),
+    ("forms.entries.submit",      "POST",  lambda ds, i: f"/api/forms/{ds.member_form_ids[0]}/entries", "member",
+        lambda ds, i: {"data": {"field_0": f"bench {i}"}, "status": "draft"}),
+    ("forms.entries.update",      "PUT",   lambda ds, i: f"/api/forms/entries/{ds.member_entry_ids[i % len(ds.member_entry_ids)]}", "member",
+        lambda ds, i: {"data": {"field_0": f"edit {i}"}, "status": "draft"}),
+    ("workflows.list",            "GET",   "/api/workflows",                                           "admin", None),
+    ("workflows.get",             "GET",   lambda ds, i: f"/api/workflows/{ds.workflow_ids[i % len(ds.workflow_ids)]}", "member", None),
+    ("workflows.instances",       "GET",   lambda ds, i: f"/api/workflows/{ds.workflow_ids[i % len(ds.workflow_ids)]}/instances", "admin", None),
+    ("workflows.tasks",           "GET",   "/api/workflows/instances/tasks",                           "member", None),
+    ("workflows.instance.get",    "GET",   lambda ds, i: f"/api/workflows/instances/{ds.instance_ids[i % len(ds.instance_ids)]}", "reviewer", None),
+    ("workflows.transition",      "POST",  lambda ds, i: f"/api/workflows/instances/{ds.instance_ids[i % len(ds.instance_ids)]}/transition", "reviewer",
+        lambda ds, i: {"comment": "bench", "approve": True}),
+    ("uploads.upload",            "POST",  "/api/uploads",                                             "member",
+        lambda ds, i: {"file": (io.BytesIO(b"%PDF-1.4 bench " + str(i).encode() * 512), f"bench-{i}.pdf")}),
+    ("uploads.versions",          "GET",   lambda ds, i: f"/api/uploads/{ds.media_ids[i % len(ds.media_ids)]}/versions", "admin", None),
+    ("catalog.papers",            "GET",   "/api/catalog/papers?limit=50",                             "member", None),
+    ("catalog.papers.facets",     "GET",   "/api/catalog/papers/facets",                               "member", None),
+    ("catalog.patents",           "GET",   "/api/catalog/patents?limit=50",                            "member", None),
+    ("schedules.mine",            "GET",   "/api/schedules/mine",                                      "member", None),
+    ("events.list",               "GET",   "/api/events?limit=50",                                     "member", None),
+    ("events.attendees",          "GET",   lambda ds, i: f"/api/events/{ds.event_ids[i % len(ds.event_ids)]}/attendees", "member", None),
+    ("events.attendance",         "GET",   lambda ds, i: f"/api/events/attendance/{ds.user_ids[i % len(ds.user_ids)]}", "admin", None),
+    ("reports.export.csv",        "GET",   "/api/reports/export?format=csv",                           "admin", None),
+]
+
+
+def _percentile(sorted_values, pct):
+    # nearest-rank
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[k]
+
+
+def _summary(timings, queries, sizes, statuses):
+    timings = sorted(timings)
+    queries = sorted(queries)
+    return {
+        "n": len(timings),
+        "status": {str(s): statuses.count(s) for s in sorted(set(statuses))},
+        "mean_ms": round(sum(timings) / len(timings), 3),
+        "min_ms": round(timings[0], 3),
+        "p50_ms": round(_percentile(timings, 50), 3),
+        "p90_ms": round(_percentile(timings, 90), 3),
+        "p95_ms": round(_percentile(timings, 95), 3),
+        "p99_ms": round(_percentile(timings, 99), 3),
+        "max_ms": round(timings[-1], 3),
+        "queries_p50": _percentile(queries, 50),
+        "queries_max": queries[-1],
+        "response_bytes_p50": _percentile(sorted(sizes), 50)
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def make_app(db_path, config=None):
+    from app import create_app
+
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+        "PASSWORD_HASH_WORKERS": 0,
+        "QUERY_WATCH": "warn",          # X-Query-Budget headers, see app.querywatch
+        "CACHE_SHARED_PATH": f"{db_path}.cache",
+        "RATE_LIMIT_ENABLED": False,    # measure the endpoints, not the limiter
+        **(config or {})
+    })
+    app.minio_client = FakeMinio()
+    return app
+
+
+def _login(client, username):
+    r = client.post("/api/auth/login", json={"username": username, "password": PASSWORD})
+    if r.status_code != 200:
+        raise RuntimeError(f"login as {username} failed: {r.status_code} {r.get_data(as_text=True)}")
+    return r.get_json()
+
+
+def run(users=200, seed=0, repeat=20, warmup=2, only=None, exclude=None, config=None, workdir=None):
+    """Build a fresh dataset and benchmark every scenario; returns the report dict."""
+    from app import db
+
+    workdir = workdir or tempfile.mkdtemp(prefix="docc-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    db_path = os.path.join(workdir, "bench.db")
+    for path in (db_path, f"{db_path}.cache"):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    app = make_app(db_path, config)
+
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        ds = generate(users=users, seed=seed)
+        generate_seconds = time.perf_counter() - started
+
+        counter = {"n": 0}
+
+        @event.listens_for(db.engine, "before_cursor_execute")
+        def _count(conn, cursor, statement, parameters, context, executemany):
+            counter["n"] += 1
+
+    client = app.test_client()
+    tokens = {}
+    for caller in ("admin", "member", "reviewer"):
+        pair = _login(client, getattr(ds, caller))
+        tokens[caller] = pair["access_token"]
+        tokens[f"{caller}:refresh"] = pair["refresh_token"]
+
+    results = {}
+    for name, method, path, caller, body in SCENARIOS:
+        if only and not any(name.startswith(p) for p in only):
+            continue
+        if exclude and any(name.startswith(p) for p in exclude):
+            continue
+        headers = {"Authorization": f"Bearer {tokens[caller]}"} if caller else {}
+        timings, queries, sizes, statuses = [], [], [], []
+        budget = None
+        for i in range(warmup + repeat):
+            url = path(ds, i) if callable(path) else path
+            payload = body(ds, i) if callable(body) else body
+            kwargs = {}
+            if payload is not None:
+                kwargs["data" if name.startswith("uploads.") else "json"] = payload
+            before = counter["n"]
+            t0 = time.perf_counter()
+            resp = client.open(url, method=method, headers=headers, **kwargs)
+            data = resp.get_data()
+            elapsed = (time.perf_counter() - t0) * 1000
+            if i < warmup:
+                continue
+            timings.append(elapsed)
+            queries.append(counter["n"] - before)
+            sizes.append(len(data))
+            statuses.append(resp.status_code)
+            budget = resp.headers.get("X-Query-Budget", type=int)
+        summary = _summary(timings, queries, sizes, statuses)
+        if budget is not None:
+            summary["query_budget"] = budget
+            summary["over_budget"] = sum(q > budget for q in queries)
+        results[name] = {"method": method, "caller": caller, **summary}
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "repeat": repeat,
+            "warmup": warmup,
+            "dataset": ds.counts,
+            "generate_seconds": round(generate_seconds, 2),
+            "database": db_path
+        },
+        "endpoints": results
+    }
+
+
+def compare(base, head, metric="p50_ms"):
+    """Rows of (endpoint, base, head, change %, base queries, head queries)."""
+    rows = []
+    for name in sorted(set(base["endpoints"]) | set(head["endpoints"])):
+        b, h = base["endpoints"].get(name), head["endpoints"].get(name)
+        bv, hv = b and b[metric], h and h[metric]
+        change = round((hv - bv) / bv * 100, 1) if bv and hv is not None else None
+        rows.append((name, bv, hv, change, b and b["queries_p50"], h and h["queries_p50"]))
+    return rows
@@ -0,0 +1,67 @@
+"""event_attendee
+
+Revision ID: 00bca47bf774
+Revises: d259b1c0969a
+Create Date: 2026-10-19 14:21:48.302517
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '00bca47bf774'
+down_revision = 'd259b1c0969a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('event_attendee',
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['event_log.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('event_id', 'user_id')
+    )
+    with op.batch_alter_table('event_attendee', schema=None) as batch_op:
+        batch_op.create_index('ix_event_attendee_user_id', ['user_id'], unique=False)
+
+    # move the JSON id lists into rows; ids of deleted users are dropped
+    bind = op.get_bind()
+    users = {uid for (uid,) in bind.execute(sa.text("SELECT id FROM \"user\""))}
+    rows = set()
+    for eid, attendees in bind.execute(sa.text("SELECT id, attendees FROM event_log WHERE attendees IS NOT NULL")):
+        if isinstance(attendees, str):
+            attendees = json.loads(attendees)
+        for uid in attendees or ():
+            if isinstance(uid, int) and uid in users:
+                rows.add((eid, uid))
+    if rows:
+        op.bulk_insert(
+            sa.table('event_attendee', sa.column('event_id'), sa.column('user_id')),
+            [{"event_id": eid, "user_id": uid} for eid, uid in sorted(rows)]
+        )
+
+    with op.batch_alter_table('event_log', schema=None) as batch_op:
+        batch_op.drop_column('attendees')
+
+
+def downgrade():
+    with op.batch_alter_table('event_log', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('attendees', sa.JSON(), nullable=True))
+
+    bind = op.get_bind()
+    grouped = {}
+    for eid, uid in bind.execute(sa.text("SELECT event_id, user_id FROM event_attendee ORDER BY event_id, user_id")):
+        grouped.setdefault(eid, []).append(uid)
+    event_log = sa.table('event_log', sa.column('id'), sa.column('attendees', sa.JSON()))
+    for eid, uids in grouped.items():
+        bind.execute(event_log.update().where(event_log.c.id == eid).values(attendees=uids))
+
+    with op.batch_alter_table('event_attendee', schema=None) as batch_op:
+        batch_op.drop_index('ix_event_attendee_user_id')
+
+    op.drop_table('event_attendee')
@@ -0,0 +1,38 @@
+"""token_revocation
+
+Revision ID: 112ed98aaf7a
+Revises: 1edbbf3ff7f0
+Create Date: 2026-10-19 12:41:09.377120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '112ed98aaf7a'
+down_revision = '1edbbf3ff7f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('token_revocation',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('jti', sa.String(length=36), nullable=True),
+    sa.Column('scope', sa.String(length=16), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('token_revocation', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_token_revocation_created_at'), ['created_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_token_revocation_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('token_revocation', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_token_revocation_user_id'))
+        batch_op.drop_index(batch_op.f('ix_token_revocation_created_at'))
+
+    op.drop_table('token_revocation')
@@ -0,0 +1,43 @@
+"""media_file.object_name
+
+Revision ID: 26e6a367f665
+Revises: 748c29f49575
+Create Date: 2026-10-19 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '26e6a367f665'
+down_revision = '748c29f49575'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('media_file', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('object_name', sa.String(length=300), nullable=True))
+        batch_op.create_index(batch_op.f('ix_media_file_object_name'), ['object_name'], unique=False)
+
+    # backfill from the public URL: {scheme}://{endpoint}/{bucket}/{object_name}
+    media_file = sa.table('media_file',
+        sa.column('id', sa.Integer),
+        sa.column('url', sa.String),
+        sa.column('object_name', sa.String),
+    )
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(media_file.c.id, media_file.c.url)).fetchall()
+    for row_id, url in rows:
+        conn.execute(
+            media_file.update()
+                      .where(media_file.c.id == row_id)
+                      .values(object_name=url.rsplit('/', 1)[-1])
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('media_file', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_media_file_object_name'))
+        batch_op.drop_column('object_name')
@@ -0,0 +1,58 @@
+"""indexes for hot foreign-key and filter lookups
+
+Revision ID: 7090547e7bc0
+Revises: 00bca47bf774
+Create Date: 2026-10-19 16:05:31.871204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7090547e7bc0'
+down_revision = '00bca47bf774'
+branch_labels = None
+depends_on = None
+
+# table -> [(index name, columns)]; workflow_instance lookups by workflow_id
+# are already served by uq_workflow_instance_unique_per_user
+INDEXES = {
+    'form_entry': [
+        ('ix_form_entry_form_id_user_id', ['form_id', 'user_id']),
+        ('ix_form_entry_user_id', ['user_id']),
+    ],
+    'form_field': [('ix_form_field_form_id', ['form_id'])],
+    'workflow_instance': [('ix_workflow_instance_user_entity', ['user_id', 'entity_type', 'entity_id'])],
+    'notification': [('ix_notification_user_id_is_read', ['user_id', 'is_read'])],
+    'media_file': [('ix_media_file_uploaded_by', ['uploaded_by'])],
+    'award': [('ix_award_recipient_id', ['recipient_id'])],
+    'achievement': [('ix_achievement_owner_id', ['owner_id'])],
+    'research_paper': [
+        ('ix_research_paper_owner_id', ['owner_id']),
+        ('ix_research_paper_file_id', ['file_id']),
+    ],
+    'patent': [
+        ('ix_patent_owner_id', ['owner_id']),
+        ('ix_patent_file_id', ['file_id']),
+    ],
+    'staff_profile': [
+        ('ix_staff_profile_user_id', ['user_id']),
+        ('ix_staff_profile_department_user_id', ['department', 'user_id']),
+    ],
+    'student_profile': [('ix_student_profile_user_id', ['user_id'])],
+}
+
+
+def upgrade():
+    for table, indexes in INDEXES.items():
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for name, columns in indexes:
+                batch_op.create_index(name, columns, unique=False)
+
+
+def downgrade():
+    for table, indexes in reversed(INDEXES.items()):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for name, _ in indexes:
+                batch_op.drop_index(name)
@@ -0,0 +1,55 @@
+"""media_version
+
+Revision ID: 77eff8685065
+Revises: 26e6a367f665
+Create Date: 2026-10-19 10:02:17.553019
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '77eff8685065'
+down_revision = '26e6a367f665'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('media_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('media_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('filename', sa.String(length=256), nullable=False),
+    sa.Column('content_type', sa.String(length=128), nullable=False),
+    sa.Column('url', sa.String(length=512), nullable=False),
+    sa.Column('object_name', sa.String(length=300), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=True),
+    sa.Column('checksum', sa.String(length=64), nullable=True),
+    sa.Column('meta', sa.JSON(), nullable=True),
+    sa.Column('uploaded_by', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['media_id'], ['media_file.id'], ),
+    sa.ForeignKeyConstraint(['uploaded_by'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('media_id', 'version', name='uq_media_version')
+    )
+    with op.batch_alter_table('media_version', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_media_version_object_name'), ['object_name'], unique=False)
+
+    # every existing file becomes version 1 of itself
+    op.execute(
+        "INSERT INTO media_version "
+        "(media_id, version, filename, content_type, url, object_name, size, meta, uploaded_by, created_at) "
+        "SELECT id, 1, filename, content_type, url, object_name, size, meta, uploaded_by, created_at "
+        "FROM media_file WHERE object_name IS NOT NULL"
+    )
+    op.execute("UPDATE media_file SET version = 1")
+
+
+def downgrade():
+    with op.batch_alter_table('media_version', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_media_version_object_name'))
+
+    op.drop_table('media_version')
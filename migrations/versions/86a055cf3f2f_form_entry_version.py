@@ -0,0 +1,26 @@
+"""form_entry version
+
+Revision ID: 86a055cf3f2f
+Revises: 0629e7f2b0ec
+Create Date: 2026-10-19 18:40:03.214577
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '86a055cf3f2f'
+down_revision = '0629e7f2b0ec'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('form_entry', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('form_entry', schema=None) as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,59 @@
+"""unique indexes on research_paper.doi and patent.patent_number
+
+Revision ID: b718c39ea25e
+Revises: e98802a6de25
+Create Date: 2026-10-19 14:52:13.210447
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b718c39ea25e'
+down_revision = 'e98802a6de25'
+branch_labels = None
+depends_on = None
+
+
+def _duplicates(bind, table, column):
+    return bind.execute(sa.text(
+        f"SELECT {column}, count(*) FROM {table} WHERE {column} IS NOT NULL "
+        f"GROUP BY {column} HAVING count(*) > 1 ORDER BY {column} LIMIT 10"
+    )).fetchall()
+
+
+def upgrade():
+    # DOIs are case-insensitive; the catalog stores and looks them up lower-case.
+    # A blank DOI means none. patent_number is NOT NULL, so blank ones stay
+    # and are reported below if there is more than one.
+    op.execute("UPDATE research_paper SET doi = lower(trim(doi)) WHERE doi IS NOT NULL")
+    op.execute("UPDATE research_paper SET doi = NULL WHERE doi = ''")
+    op.execute("UPDATE patent SET patent_number = trim(patent_number)")
+
+    bind = op.get_bind()
+    problems = [
+        f"{label} {value!r} ({count} rows)"
+        for label, table, column in (('DOI', 'research_paper', 'doi'),
+                                     ('patent number', 'patent', 'patent_number'))
+        for value, count in _duplicates(bind, table, column)
+    ]
+    if problems:
+        raise RuntimeError(
+            'Duplicate catalog identifiers must be resolved before this migration '
+            'can add unique indexes: ' + ', '.join(problems)
+        )
+
+    with op.batch_alter_table('research_paper', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_research_paper_doi'), ['doi'], unique=True)
+
+    with op.batch_alter_table('patent', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_patent_patent_number'), ['patent_number'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('patent', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_patent_patent_number'))
+
+    with op.batch_alter_table('research_paper', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_research_paper_doi'))
@@ -0,0 +1,54 @@
+"""time_schedule overlap indexes and exclusion constraint
+
+Revision ID: d259b1c0969a
+Revises: b718c39ea25e
+Create Date: 2026-10-19 15:44:02.781350
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd259b1c0969a'
+down_revision = 'b718c39ea25e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('time_schedule', schema=None) as batch_op:
+        batch_op.create_index('ix_time_schedule_location_start_end', ['location', 'start', 'end'], unique=False)
+        batch_op.create_index('ix_time_schedule_owner_start_end', ['owner_id', 'start', 'end'], unique=False)
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        # no two bookings of one location may overlap, even under concurrent
+        # inserts; courses and events may share rooms, so only bookings
+        overlaps = bind.execute(sa.text(
+            "SELECT a.id, b.id FROM time_schedule a JOIN time_schedule b "
+            "ON a.location = b.location AND a.id < b.id "
+            "AND a.start < b.\"end\" AND a.\"end\" > b.start "
+            "WHERE a.type = 'booking' AND b.type = 'booking' LIMIT 10"
+        )).fetchall()
+        if overlaps:
+            raise RuntimeError(
+                'Overlapping bookings of one location must be resolved before this '
+                'migration can add ex_time_schedule_booking_overlap; e.g. time_schedule ids '
+                + ', '.join(f'{a}/{b}' for a, b in overlaps)
+            )
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        op.execute(
+            'ALTER TABLE time_schedule ADD CONSTRAINT ex_time_schedule_booking_overlap '
+            'EXCLUDE USING gist (location WITH =, tsrange(start, "end") WITH &&) '
+            "WHERE (type = 'booking' AND location IS NOT NULL)"
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('ALTER TABLE time_schedule DROP CONSTRAINT ex_time_schedule_booking_overlap')
+
+    with op.batch_alter_table('time_schedule', schema=None) as batch_op:
+        batch_op.drop_index('ix_time_schedule_owner_start_end')
+        batch_op.drop_index('ix_time_schedule_location_start_end')
@@ -0,0 +1,40 @@
+"""indexes for the user directory
+
+Revision ID: e98802a6de25
+Revises: 112ed98aaf7a
+Create Date: 2026-10-19 13:30:44.601837
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e98802a6de25'
+down_revision = '112ed98aaf7a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('roles_users', schema=None) as batch_op:
+        batch_op.create_index('ix_roles_users_role_id', ['role_id'], unique=False)
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # prefix search (LIKE 'abc%') under a non-C collation
+        op.create_index('ix_user_username_pattern', 'user', ['username'],
+                        postgresql_ops={'username': 'text_pattern_ops'})
+        # substring search (ILIKE '%abc%')
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.create_index('ix_user_username_trgm', 'user', ['username'],
+                        postgresql_using='gin',
+                        postgresql_ops={'username': 'gin_trgm_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_user_username_trgm', table_name='user')
+        op.drop_index('ix_user_username_pattern', table_name='user')
+
+    with op.batch_alter_table('roles_users', schema=None) as batch_op:
+        batch_op.drop_index('ix_roles_users_role_id')
@@ -0,0 +1,43 @@
+import pytest
+
+from benchmarks.runner import make_app
+
+
+@pytest.fixture
+def app(tmp_path):
+    """A fresh app on an empty SQLite file, with FakeMinio as the object store."""
+    from app import db
+    from app.auth import revocation
+
+    # per-process state that would otherwise leak between databases
+    revocation.revocations.__init__()
+    revocation.role_cache.__init__()
+
+    app = make_app(tmp_path / "test.db", {"TESTING": True})
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def login(app):
+    """login(username, roles=...) -> Authorization headers, creating the user on first use."""
+    from app import db
+    from app.auth.passwords import hash_password
+    from app.models import User, Role
+
+    client = app.test_client()
+
+    def login(username, password="test-password", roles=()):
+        if User.query.filter_by(username=username).first() is None:
+            user = User(username=username, password_hash=hash_password(password))
+            for name in roles:
+                user.roles.append(Role.query.filter_by(name=name).first() or Role(name=name))
+            db.session.add(user)
+            db.session.commit()
+        resp = client.post("/api/auth/login", json={"username": username, "password": password})
+        assert resp.status_code == 200, resp.get_data(as_text=True)
+        return {"Authorization": f"Bearer {resp.get_json()['access_token']}"}
+    return login
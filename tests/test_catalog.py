@@ -0,0 +1,67 @@
+import pytest
+
+from app import db
+from app.models import User, MediaFile, ResearchPaper
+
+
+def _upload(username):
+    uid = User.query.filter_by(username=username).one().id
+    mf = MediaFile(filename="a.pdf", content_type="application/pdf", url="http://minio/b/a.pdf",
+                   object_name="a.pdf", uploaded_by=uid)
+    db.session.add(mf)
+    db.session.commit()
+    return mf.id
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def test_only_the_uploader_or_an_admin_may_attach_a_file(client, login):
+    alice, bob = login("alice"), login("bob")
+    admin = login("admin", roles=["Administrator"])
+    private = _upload("alice")
+
+    resp = client.post("/api/catalog/papers", headers=bob, json={"title": "t", "file_id": private})
+    assert resp.status_code == 403
+    resp = client.post("/api/catalog/patents", headers=bob,
+                       json={"title": "t", "patent_number": "US1", "file_id": private})
+    assert resp.status_code == 403
+
+    resp = client.post("/api/catalog/papers", headers=bob, json={"title": "t"})
+    pid = resp.get_json()["id"]
+    assert client.put(f"/api/catalog/papers/{pid}", headers=bob, json={"file_id": private}).status_code == 403
+    assert client.put(f"/api/catalog/papers/{pid}", headers=bob, json={"file_id": 999}).status_code == 400
+    assert db.session.get(ResearchPaper, pid).file_id is None
+
+    assert client.post("/api/catalog/papers", headers=alice,
+                       json={"title": "t", "file_id": private}).status_code == 201
+    assert client.put(f"/api/catalog/papers/{pid}", headers=admin, json={"file_id": private}).status_code == 200
+
+
+def test_blank_dois_are_stored_as_none(client, login):
+    headers = login("alice")
+    for doi in ("", "  ", None):
+        resp = client.post("/api/catalog/papers", headers=headers, json={"title": "t", "doi": doi})
+        assert resp.status_code == 201
+        assert db.session.get(ResearchPaper, resp.get_json()["id"]).doi is None
+
+
+@pytest.mark.parametrize("body", [
+    {"title": "t", "doi": 123},
+    {"title": "t", "doi": ["10.1/x"]},
+])
+def test_non_string_doi_is_400(client, login, body):
+    assert client.post("/api/catalog/papers", headers=login("alice"), json=body).status_code == 400
+
+
+@pytest.mark.parametrize("number", [123, ["US1"], "   "])
+def test_bad_patent_number_is_400(client, login, number):
+    headers = login("alice")
+    resp = client.post("/api/catalog/patents", headers=headers, json={"title": "t", "patent_number": number})
+    assert resp.status_code == 400
+    pid = client.post("/api/catalog/patents", headers=headers,
+                      json={"title": "t", "patent_number": "US1"}).get_json()["id"]
+    resp = client.put(f"/api/catalog/patents/{pid}", headers=headers, json={"patent_number": number})
+    assert resp.status_code == 400
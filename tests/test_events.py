@@ -0,0 +1,29 @@
+from sqlalchemy import event
+
+from app import db
+from app.models import EventLog, User, event_attendee
+
+
+def test_event_dates_are_read_like_schedule_times(app, login):
+    client, admin = app.test_client(), login("admin", roles=["Administrator"])
+    resp = client.post("/api/events", headers=admin,
+                       json={"name": "talk", "date": "2025-09-01T12:00:00+02:00"})
+    assert resp.status_code == 201
+    assert db.session.get(EventLog, resp.get_json()["id"]).date.isoformat() == "2025-09-01T10:00:00"
+
+
+def test_deleting_an_attendee_removes_their_rows(app, login):
+    # enforce foreign keys like PostgreSQL does
+    event.listen(db.engine, "connect", lambda conn, record: conn.execute("PRAGMA foreign_keys=ON"))
+    db.session.remove()
+    db.engine.dispose()
+
+    client, admin = app.test_client(), login("admin", roles=["Administrator"])
+    login("alice")
+    uid = User.query.filter_by(username="alice").one().id
+    resp = client.post("/api/events", headers=admin, json={"name": "talk", "user_ids": [uid]})
+    eid = resp.get_json()["id"]
+
+    assert client.delete(f"/api/users/{uid}", headers=admin).status_code == 200
+    assert db.session.query(event_attendee).filter_by(user_id=uid).count() == 0
+    assert client.get(f"/api/events/{eid}", headers=admin).get_json()["attendee_count"] == 0
@@ -0,0 +1,161 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.forms import patch
+from app.models import FormDefinition, FormEntry, User
+
+DOC = {"title": "t", "tags": ["a", "b"], "a/b": 1, "m~n": 2, "nested": {"x": 1}}
+
+
+def _json_patch(*ops):
+    return patch.json_patch(DOC, list(ops))
+
+
+# --- RFC 6902 ---
+
+def test_add_sets_members_and_inserts_into_arrays():
+    assert _json_patch({"op": "add", "path": "/new", "value": 1})["new"] == 1
+    assert _json_patch({"op": "add", "path": "/tags/1", "value": "x"})["tags"] == ["a", "x", "b"]
+    assert _json_patch({"op": "add", "path": "/tags/-", "value": "z"})["tags"] == ["a", "b", "z"]
+    assert _json_patch({"op": "add", "path": "/tags/2", "value": "z"})["tags"] == ["a", "b", "z"]
+
+
+def test_remove_and_replace():
+    assert "title" not in _json_patch({"op": "remove", "path": "/title"})
+    assert _json_patch({"op": "remove", "path": "/tags/0"})["tags"] == ["b"]
+    assert _json_patch({"op": "replace", "path": "/nested/x", "value": 2})["nested"] == {"x": 2}
+    assert _json_patch({"op": "replace", "path": "/tags/1", "value": "c"})["tags"] == ["a", "c"]
+
+
+def test_move_and_copy():
+    doc = _json_patch({"op": "move", "from": "/title", "path": "/nested/title"})
+    assert "title" not in doc and doc["nested"]["title"] == "t"
+    doc = _json_patch({"op": "copy", "from": "/tags", "path": "/labels"})
+    assert doc["labels"] == doc["tags"] and doc["labels"] is not doc["tags"]
+    assert _json_patch({"op": "move", "from": "/tags/0", "path": "/tags/-"})["tags"] == ["b", "a"]
+    with pytest.raises(patch.PatchError):
+        _json_patch({"op": "move", "from": "/nested", "path": "/nested/inner"})
+
+
+def test_test_operation():
+    assert _json_patch({"op": "test", "path": "/nested/x", "value": 1.0}) == DOC
+    with pytest.raises(patch.PatchConflict):
+        _json_patch({"op": "test", "path": "/nested/x", "value": True})
+    with pytest.raises(patch.PatchConflict):
+        _json_patch({"op": "test", "path": "/title", "value": "other"})
+
+
+def test_pointer_escapes():
+    assert _json_patch({"op": "replace", "path": "/a~1b", "value": 10})["a/b"] == 10
+    assert _json_patch({"op": "replace", "path": "/m~0n", "value": 20})["m~n"] == 20
+    assert _json_patch({"op": "add", "path": "/~01", "value": 3})["~1"] == 3
+
+
+def test_patches_are_all_or_nothing_and_leave_the_input_alone():
+    original = {"title": "t", "tags": ["a"]}
+    with pytest.raises(patch.PatchError):
+        patch.json_patch(original, [
+            {"op": "add", "path": "/tags/-", "value": "b"},
+            {"op": "remove", "path": "/missing"},
+        ])
+    assert original == {"title": "t", "tags": ["a"]}
+
+
+@pytest.mark.parametrize("ops", [
+    {"op": "add", "path": "/x", "value": 1},                    # not a list
+    [{"op": "add", "path": "x", "value": 1}],                   # pointer without "/"
+    [{"op": "add", "path": 5, "value": 1}],
+    [{"op": "add", "path": "/x"}],                              # no value
+    [{"op": "copy", "path": "/x"}],                             # no from
+    [{"op": "remove", "path": "/tags/2"}],                      # index out of range
+    [{"op": "add", "path": "/tags/01", "value": 1}],            # leading zero
+    [{"op": "remove", "path": "/tags/-"}],                      # "-" only appends
+    [{"op": "replace", "path": "/missing", "value": 1}],
+    [{"op": "remove", "path": ""}],
+    [{"op": "frobnicate", "path": "/x"}],
+])
+def test_malformed_patches(ops):
+    with pytest.raises(patch.PatchError):
+        patch.json_patch(DOC, ops)
+
+
+# --- RFC 7396 ---
+
+def test_merge_patch():
+    doc = patch.merge_patch(DOC, {"title": "u", "tags": None, "nested": {"y": 2}})
+    assert doc["title"] == "u" and "tags" not in doc and doc["nested"] == {"x": 1, "y": 2}
+    assert DOC["title"] == "t"
+
+
+def test_same_document_is_strict_about_numbers():
+    assert patch.same_document({"n": 1}, {"n": 1})
+    assert not patch.same_document({"n": 1}, {"n": 1.0})
+    assert not patch.same_document({"n": True}, {"n": 1})
+
+
+# --- PATCH /api/forms/entries/<id> ---
+
+@pytest.fixture
+def entry(app, login):
+    headers = login("alice")
+    uid = User.query.filter_by(username="alice").one().id
+    form = FormDefinition(name="f", created_by=uid)
+    db.session.add(form)
+    db.session.flush()
+    entry = FormEntry(form_id=form.id, user_id=uid, data={"title": "t"}, status="draft")
+    db.session.add(entry)
+    db.session.commit()
+    return app.test_client(), headers, entry.id
+
+
+def _patch(client, headers, eid, body, version, media_type=patch.MERGE_PATCH):
+    return client.patch(f"/api/forms/entries/{eid}", json=body, content_type=media_type,
+                        headers={**headers, "If-Match": f'"{version}"'})
+
+
+def _set(eid, **values):
+    # Core UPDATE: an ORM change would bump the entry's version
+    db.session.execute(FormEntry.__table__.update().where(FormEntry.id == eid).values(**values))
+    db.session.commit()
+
+
+@pytest.mark.parametrize("body, media_type", [
+    ([{"op": "replace", "path": "", "value": [1, 2]}], patch.JSON_PATCH),
+    ([{"op": "replace", "path": "", "value": "text"}], patch.JSON_PATCH),
+    ([1, 2], patch.MERGE_PATCH),
+    ("text", patch.MERGE_PATCH),
+])
+def test_patch_must_leave_an_object(entry, body, media_type):
+    client, headers, eid = entry
+    resp = _patch(client, headers, eid, body, 1, media_type)
+    assert resp.status_code == 400
+    assert db.session.get(FormEntry, eid).data == {"title": "t"}
+
+
+def test_rapid_draft_saves_are_coalesced(entry):
+    client, headers, eid = entry
+    resp = _patch(client, headers, eid, {"title": "one"}, 1)
+    assert resp.status_code == 200 and resp.get_json()["version"] == 2
+
+    resp = _patch(client, headers, eid, {"title": "two"}, 2)
+    assert resp.status_code == 429
+    assert resp.get_json()["version"] == 2 and int(resp.headers["Retry-After"]) >= 1
+    assert db.session.get(FormEntry, eid).data == {"title": "one"}
+
+    # unchanged data is still acknowledged at once
+    assert _patch(client, headers, eid, {"title": "one"}, 2).status_code == 200
+
+    _set(eid, updated_at=datetime.utcnow() - timedelta(seconds=5))
+    resp = _patch(client, headers, eid, {"title": "two", "abstract": "gathered meanwhile"}, 2)
+    assert resp.status_code == 200 and resp.get_json()["version"] == 3
+    db.session.expire_all()
+    assert db.session.get(FormEntry, eid).data == {"title": "two", "abstract": "gathered meanwhile"}
+
+
+def test_submitted_entries_are_not_coalesced(entry):
+    client, headers, eid = entry
+    _set(eid, status="submitted")
+    assert _patch(client, headers, eid, {"title": "one"}, 1).status_code == 200
+    assert _patch(client, headers, eid, {"title": "two"}, 2).status_code == 200
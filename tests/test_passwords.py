@@ -0,0 +1,26 @@
+from werkzeug.security import generate_password_hash
+
+from app.auth import passwords
+
+
+def test_default_method_keeps_werkzeug_hashes(app):
+    assert app.config["PASSWORD_HASH_METHOD"] == "scrypt"
+    assert not passwords.needs_rehash(generate_password_hash("secret"))
+    assert passwords.needs_rehash(generate_password_hash("secret", "pbkdf2:sha256:600000"))
+
+
+def test_broken_pool_is_rebuilt(app):
+    app.config["PASSWORD_HASH_WORKERS"] = 1
+    try:
+        pwhash = passwords.hash_password("secret")
+        broken = passwords._pool
+        for process in list(broken._processes.values()):
+            process.kill()
+            process.join()
+
+        assert passwords.verify_password(pwhash, "secret")
+        assert passwords._pool is not broken
+    finally:
+        app.config["PASSWORD_HASH_WORKERS"] = 0
+        if passwords._pool is not None:
+            passwords._discard(passwords._pool)
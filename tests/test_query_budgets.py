@@ -0,0 +1,54 @@
+"""
+Every benchmarked endpoint stays within its @query_budget.
+
+The app runs with QUERY_WATCH="strict" against the benchmark dataset, so a
+request over its budget (or repeating one statement QUERY_REPEAT_THRESHOLD
+times, a likely N+1) raises QueryBudgetExceeded out of the test client and
+fails the scenario that made it.
+"""
+import pytest
+
+from benchmarks.datagen import generate
+from benchmarks.runner import SCENARIOS, _login, make_app
+
+USERS = 60
+
+
+@pytest.fixture(scope="module")
+def bench(tmp_path_factory):
+    from app import db
+
+    db_path = tmp_path_factory.mktemp("budgets") / "bench.db"
+    app = make_app(db_path, {"QUERY_WATCH": "strict", "TESTING": True})
+    with app.app_context():
+        db.create_all()
+        ds = generate(users=USERS)
+    client = app.test_client()
+    tokens = {}
+    for caller in ("admin", "member", "reviewer"):
+        pair = _login(client, getattr(ds, caller))
+        tokens[caller] = pair["access_token"]
+        tokens[f"{caller}:refresh"] = pair["refresh_token"]
+    yield app, ds, client, tokens
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.mark.parametrize("name, method, path, caller, body", SCENARIOS, ids=[s[0] for s in SCENARIOS])
+def test_within_budget(bench, name, method, path, caller, body):
+    app, ds, client, tokens = bench
+    headers = {"Authorization": f"Bearer {tokens[caller]}"} if caller else {}
+    # cold, then warm: a cache hit must not be what keeps the count down
+    for i in range(2):
+        url = path(ds, i) if callable(path) else path
+        payload = body(ds, i) if callable(body) else body
+        kwargs = {}
+        if payload is not None:
+            kwargs["data" if name.startswith("uploads.") else "json"] = payload
+        resp = client.open(url, method=method, headers=headers, **kwargs)
+        text = resp.get_data(as_text=True)     # runs streamed views to the end
+        resp.close()
+        assert resp.status_code < 400, f"{name}: {resp.status_code} {text[:200]}"
+        budget = resp.headers.get("X-Query-Budget", type=int)
+        if budget is not None:
+            assert resp.headers.get("X-Query-Count", type=int) <= budget
@@ -0,0 +1,32 @@
+import pytest
+
+from benchmarks.runner import make_app
+
+
+def _limited_app(tmp_path, **config):
+    return make_app(tmp_path / "test.db", {
+        "TESTING": True, "RATE_LIMIT_ENABLED": True, "RATE_LIMIT_PATH": "", **config
+    })
+
+
+@pytest.mark.parametrize("name", ["RATE_LIMIT_USER_RATE", "RATE_LIMIT_IP_RATE", "RATE_LIMIT_USER_CAPACITY"])
+@pytest.mark.parametrize("value", [0, -1])
+def test_non_positive_settings_are_rejected_at_startup(tmp_path, name, value):
+    with pytest.raises(ValueError, match=name):
+        _limited_app(tmp_path, **{name: value})
+
+
+def test_login_guesses_from_one_ip_do_not_lock_out_another(tmp_path):
+    from app import db
+
+    app = _limited_app(tmp_path, RATE_LIMIT_USER_CAPACITY=10, RATE_LIMIT_USER_RATE=0.001)
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+
+    def attempt(ip):
+        return client.post("/api/auth/login", json={"username": "victim", "password": "guess"},
+                           environ_base={"REMOTE_ADDR": ip}).status_code
+
+    assert [attempt("10.0.0.1") for _ in range(3)] == [401, 401, 429]
+    assert attempt("10.0.0.2") == 401
@@ -0,0 +1,49 @@
+from sqlalchemy import event
+
+from app import db
+from app.auth.revocation import revocations, revoke_users
+from app.models import User
+
+
+def _tokens(client, username):
+    resp = client.post("/api/auth/login", json={"username": username, "password": "test-password"})
+    return resp.get_json()
+
+
+def test_refresh_does_not_query_revocations_between_syncs(app, login):
+    app.config["TOKEN_REVOCATION_SYNC_SECONDS"] = 60
+    login("alice")
+    client = app.test_client()
+    refresh = _tokens(client, "alice")["refresh_token"]
+    client.post("/api/auth/refresh", headers={"Authorization": f"Bearer {refresh}"})
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        resp = client.post("/api/auth/refresh", headers={"Authorization": f"Bearer {refresh}"})
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+    assert resp.status_code == 200
+    assert statements == []
+
+
+def test_token_minted_from_a_stale_view_is_rejected_after_sync(app, login):
+    app.config["TOKEN_REVOCATION_SYNC_SECONDS"] = 60
+    login("alice")
+    client = app.test_client()
+    refresh = _tokens(client, "alice")["refresh_token"]
+    uid = User.query.filter_by(username="alice").one().id
+
+    # another worker changes alice's roles; this one has not synced yet
+    revoke_users([uid])
+    db.session.commit()
+    resp = client.post("/api/auth/refresh", headers={"Authorization": f"Bearer {refresh}"})
+    stale = {"Authorization": f"Bearer {resp.get_json()['access_token']}"}
+    assert client.get("/api/users/me", headers=stale).status_code == 200
+
+    revocations.sync(force=True)
+    assert client.get("/api/users/me", headers=stale).status_code == 401
+    resp = client.post("/api/auth/refresh", headers={"Authorization": f"Bearer {refresh}"})
+    fresh = {"Authorization": f"Bearer {resp.get_json()['access_token']}"}
+    assert client.get("/api/users/me", headers=fresh).status_code == 200
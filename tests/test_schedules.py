@@ -0,0 +1,39 @@
+from app.models import User
+
+SLOT = {"start": "2025-09-01T10:00", "end": "2025-09-01T11:00", "location": "R101"}
+
+
+def _uid(username):
+    return User.query.filter_by(username=username).one().id
+
+
+def test_other_users_bookings_are_only_busy_intervals(app, login):
+    client = app.test_client()
+    alice, bob = login("alice"), login("bob")
+    admin = login("admin", roles=["Administrator"])
+    assert client.post("/api/schedules", headers=alice, json={**SLOT, "type": "booking"}).status_code == 201
+
+    resp = client.post("/api/schedules", headers=bob, json=SLOT)
+    assert resp.status_code == 409
+    assert resp.get_json()["conflicts"] == [{"start": "2025-09-01T10:00:00", "end": "2025-09-01T11:00:00"}]
+
+    query = f"start={SLOT['start']}&end={SLOT['end']}"
+    for url in (f"/api/schedules/conflicts?owner={_uid('alice')}&{query}",
+                f"/api/schedules/conflicts?location=R101&{query}"):
+        body = client.get(url, headers=bob).get_json()
+        assert body["free"] is False
+        assert body["conflicts"] == [{"start": "2025-09-01T10:00:00", "end": "2025-09-01T11:00:00"}]
+        for caller in (alice, admin):
+            [entry] = client.get(url, headers=caller).get_json()["conflicts"]
+            assert entry["location"] == "R101" and entry["owner_id"] == _uid("alice")
+
+
+def test_admin_booking_for_unknown_owner_is_400(app, login):
+    client = app.test_client()
+    admin = login("admin", roles=["Administrator"])
+    for owner in (9999, "1", None):
+        resp = client.post("/api/schedules", headers=admin, json={**SLOT, "owner_id": owner})
+        assert resp.status_code == 400, owner
+        assert resp.get_json()["msg"] == "owner_id does not exist"
+    assert client.post("/api/schedules", headers=admin,
+                       json={**SLOT, "owner_id": _uid("admin")}).status_code == 201
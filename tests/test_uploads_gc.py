@@ -0,0 +1,134 @@
+"""Which MediaFile rows `flask uploads gc` treats as stale, and what it deletes."""
+import io
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.cache import cache
+from app.models import User, FormDefinition, FormField, FormEntry, MediaFile, MediaVersion
+from app.uploads import gc
+
+OLD = datetime.utcnow() - timedelta(days=7)
+
+
+@pytest.fixture
+def owner(app):
+    user = User(username="owner", password_hash="x")
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def form(app, owner):
+    form = FormDefinition(name="with-file", created_by=owner.id)
+    form.fields.append(FormField(name="attachment", label="Attachment", field_type="file"))
+    db.session.add(form)
+    db.session.commit()
+    return form
+
+
+def _media(app, owner, name):
+    url = f"http://minio/bucket/{name}"
+    mf = MediaFile(filename=name, content_type="text/plain", url=url, object_name=name,
+                   uploaded_by=owner.id, created_at=OLD, version=1)
+    mf.versions.append(MediaVersion(version=1, filename=name, content_type="text/plain", url=url,
+                                    object_name=name, created_at=OLD))
+    db.session.add(mf)
+    db.session.commit()
+    app.minio_client.put_object(app.config["MINIO_BUCKET"], name, io.BytesIO(b"x"), 1)
+    return mf
+
+
+def _reference(form, owner, value):
+    db.session.add(FormEntry(form_id=form.id, user_id=owner.id, data={"attachment": value}))
+    db.session.commit()
+
+
+def _stale_ids():
+    return {mid for mid, _ in gc.iter_stale_media(datetime.utcnow())}
+
+
+def test_entry_reference_by_id_keeps_file(app, owner, form):
+    by_int, by_str = _media(app, owner, "a.txt"), _media(app, owner, "b.txt")
+    _reference(form, owner, by_int.id)
+    _reference(form, owner, [str(by_str.id)])
+    assert _stale_ids() == set()
+
+
+def test_entry_reference_by_current_url_keeps_file(app, owner, form):
+    mf = _media(app, owner, "a.txt")
+    _reference(form, owner, mf.url)
+    assert _stale_ids() == set()
+
+
+def test_entry_reference_by_earlier_version_url_keeps_file(app, owner, form):
+    mf = _media(app, owner, "a.txt")
+    first_url = mf.url
+    mf.versions.append(MediaVersion(version=2, filename="a2.txt", content_type="text/plain",
+                                    url="http://minio/bucket/a2.txt", object_name="a2.txt"))
+    mf.version, mf.url, mf.object_name = 2, "http://minio/bucket/a2.txt", "a2.txt"
+    db.session.commit()
+    _reference(form, owner, first_url)
+    assert _stale_ids() == set()
+
+
+def test_unreferenced_file_is_stale(app, owner, form):
+    kept, stale = _media(app, owner, "a.txt"), _media(app, owner, "b.txt")
+    _reference(form, owner, kept.id)
+    assert _stale_ids() == {stale.id}
+
+
+def test_files_inside_grace_period_are_left_alone(app, owner, form):
+    mf = _media(app, owner, "a.txt")
+    assert _stale_ids() == {mf.id}
+    assert {mid for mid, _ in gc.iter_stale_media(OLD - timedelta(days=1))} == set()
+
+
+def test_collect_deletes_stale_rows_objects_and_cached_portfolio(app, owner, form):
+    kept, stale = _media(app, owner, "a.txt").id, _media(app, owner, "b.txt").id
+    _reference(form, owner, db.session.get(MediaFile, kept).url)
+    uid = owner.id
+    cache.set(f"portfolio:{uid}", {"uploads": [kept, stale]}, tags={f"portfolio:{uid}"})
+
+    report = gc.collect(app.minio_client, app.config["MINIO_BUCKET"], app.logger, dry_run=False, rate=0)
+
+    assert report["stale_rows"] == 1 and report["deleted_objects"] == 1
+    db.session.expire_all()
+    assert db.session.get(MediaFile, stale) is None
+    assert MediaVersion.query.filter_by(media_id=stale).count() == 0
+    assert db.session.get(MediaFile, kept) is not None
+    assert {name for _, name in app.minio_client.objects} == {"a.txt"}
+    # the bulk DELETE bypasses the MediaFile tagger; collect invalidates for it
+    assert cache.get(f"portfolio:{uid}", None) is None
+
+
+def test_dry_run_deletes_nothing(app, owner, form):
+    mf = _media(app, owner, "a.txt")
+    seen = []
+    report = gc.collect(app.minio_client, app.config["MINIO_BUCKET"], app.logger, echo=seen.append)
+    assert report["stale_rows"] == 1
+    assert db.session.get(MediaFile, mf.id) is not None
+    assert len(app.minio_client.objects) == 1
+
+
+def test_replaced_upload_referenced_by_its_first_url_survives_collect(app, owner, form, login):
+    client, headers = app.test_client(), login("uploader")
+    resp = client.post("/api/uploads", headers=headers,
+                       data={"file": (io.BytesIO(b"first"), "report.txt")})
+    assert resp.status_code == 201
+    mid, first_url = resp.get_json()["id"], resp.get_json()["url"]
+    _reference(form, owner, first_url)
+
+    resp = client.put(f"/api/uploads/{mid}", headers=headers,
+                      data={"file": (io.BytesIO(b"second"), "report.txt")})
+    assert resp.status_code == 200 and resp.get_json()["url"] != first_url
+
+    report = gc.collect(app.minio_client, app.config["MINIO_BUCKET"], app.logger,
+                        dry_run=False, grace=timedelta(0), rate=0)
+
+    assert report["stale_rows"] == 0 and report["deleted_objects"] == 0
+    db.session.expire_all()
+    assert MediaVersion.query.filter_by(media_id=mid).count() == 2
+    assert len(app.minio_client.objects) == 2
@@ -0,0 +1,29 @@
+import json
+
+from app.models import User
+
+
+def _import(app, headers, lines):
+    app.config["USER_IMPORT_HASH_WORKERS"] = 0      # the (inline) shared pool
+    body = "\n".join(json.dumps(line) for line in lines) + "\n"
+    resp = app.test_client().post("/api/users/import", headers=headers, data=body,
+                                  content_type="application/x-ndjson")
+    assert resp.status_code == 200
+    return [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+
+
+def test_malformed_roles_are_reported_per_line(app, login):
+    headers = login("admin", roles=["Administrator"])
+    rows = _import(app, headers, [
+        {"username": "a", "password": "pw-a", "roles": ["Administrator"]},
+        {"username": "b", "password": "pw-b", "roles": [{"a": 1}]},
+        {"username": "c", "password": "pw-c", "roles": "Administrator"},
+        {"username": "d", "password": "pw-d", "roles": ["Nope"]},
+        {"username": "e", "password": "pw-e"},
+    ])
+
+    assert [r.get("status") for r in rows[:-1]] == ["created", "error", "error", "error", "created"]
+    assert rows[1]["msg"] == rows[2]["msg"] == "roles must be a list of role names"
+    assert rows[3]["msg"] == "Unknown roles: ['Nope']"
+    assert rows[-1] == {"summary": {"created": 2, "error": 3}}
+    assert {u.username for u in User.query} == {"admin", "a", "e"}